@@ -2,23 +2,252 @@
 TradingView Webhook エンドポイント (Vercel Serverless Function)
 
 TradingViewからのWebhookを受信し、LINE Messaging APIで通知を送信します。
+環境変数 NOTIFY_WEBHOOK_URL を設定すると Slack / Discord 等の Webhook にも並列に送信します。
+
+受信したアラートは直近 RECENT_ALERTS_LIMIT 件をメモリ上のリングバッファに保持し、
+GET /api/tradingview?alerts&ticker=...&since=... で参照できます（要シークレット）。
+TRADINGVIEW_ALERT_LOG を設定すると JSON Lines で追記保存もします。
+
+コールドスタート対策として、HTTP 送信は標準ライブラリの http.client で行い（requests 不要）、
+接続・TLS コンテキスト・環境変数はモジュールスコープに保持してウォーム起動間で再利用します。
+403 / 400 を返す経路で使わないモジュールは送信時まで読み込みません。
 """
 
+import http.client
 import json
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice, takewhile
 from http.server import BaseHTTPRequestHandler
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlsplit
+
+# プロファイル出力先（Vercel では /tmp 以外は書き込み不可）
+PROFILE_DIR_DEFAULT = "/tmp/profiles"
+PROFILE_TOP_N = 30
+
+# 通知チャネルごとのタイムアウト（秒）。遅いチャネルが他の送信やレスポンスを待たせない
+CHANNEL_TIMEOUTS = {"line": 10, "webhook": 5}
+WEBHOOK_PAYLOAD_KEYS = {"slack": "text", "discord": "content", "json": "text"}
+
+LINE_PUSH_URL = "https://api.line.me/v2/bot/message/push"
+
+# 直近アラートの保持件数と、1回の参照で返す最大件数
+RECENT_ALERTS_LIMIT = 500
+RECENT_ALERTS_QUERY_MAX = 100
+
+# タイムゾーンなしの since / until は日本時間として扱う
+JST = timezone(timedelta(hours=9))
+
+
+@lru_cache(maxsize=None)
+def _env(name: str, default: str = "") -> str:
+    """環境変数を読む（Vercel ではデプロイ単位で固定のため、プロセス内でキャッシュ）"""
+    return os.environ.get(name, default)
+
+
+class KeepAliveClient:
+    """
+    送信先ホストごとに接続を保持して再利用する最小限の HTTP クライアント
+
+    モジュールスコープに1つだけ作り、ウォーム起動では前回の接続（TLS セッション確立済み）を
+    そのまま使う。アイドル中にサーバー側で切断された接続は、新しい接続で1回だけ再送する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._ssl_context = None
+
+    def _checkout(self, scheme: str, netloc: str, timeout: float):
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
+            if scheme == "https" and self._ssl_context is None:
+                import ssl
+
+                self._ssl_context = ssl.create_default_context()
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(netloc, timeout=timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(netloc, timeout=timeout)
+        return conn, False
+
+    def _checkin(self, scheme: str, netloc: str, conn) -> None:
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(conn)
+
+    def post_json(self, url: str, payload: dict, headers: dict = None, timeout: float = 10):
+        """
+        JSON を POST し (ステータスコード, 本文) を返す
+
+        Raises:
+            OSError, http.client.HTTPException: 接続・通信に失敗した場合
+        """
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        body = json.dumps(payload).encode("utf-8")
+        request_headers = {"Content-Type": "application/json"}
+        request_headers.update(headers or {})
+
+        while True:
+            conn, reused = self._checkout(parts.scheme, parts.netloc, timeout)
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request("POST", path, body=body, headers=request_headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.BadStatusLine):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(parts.scheme, parts.netloc, conn)
+            return response.status, data
+
+
+# ウォーム起動間で再利用する HTTP クライアント
+HTTP_CLIENT = KeepAliveClient()
+
 
-import requests
+class RecentAlerts:
+    """
+    直近アラートのリングバッファ（銘柄・戦略別の索引付き）
+
+    各索引は全体バッファと同じ受信順の deque で、全体から押し出された最古のアラートは
+    索引側でも先頭にあるため O(1) で取り除ける。参照は新しい順に辿り、
+    since より古いものに達した時点で打ち切るため、返す件数 k に比例した時間で済む。
+    """
+
+    def __init__(self, limit: int = RECENT_ALERTS_LIMIT):
+        self._lock = threading.Lock()
+        self._alerts = deque()
+        self._by_ticker = {}
+        self._by_strategy = {}
+        self._limit = limit
+        self._seq = 0
+
+    def add(self, data: dict, delivered: bool) -> dict:
+        """アラートを記録し、記録した内容を返す"""
+        now = datetime.now(JST)
+        with self._lock:
+            self._seq += 1
+            record = {
+                "seq": self._seq,
+                "received_at": now.isoformat(timespec="seconds"),
+                "ts": now.timestamp(),
+                "ticker": str(data.get("ticker", data.get("symbol", ""))),
+                "strategy": str(data.get("strategy", "")),
+                "action": str(data.get("action", data.get("order_action", ""))),
+                "delivered": delivered,
+                "data": data,
+            }
+            self._alerts.append(record)
+            self._by_ticker.setdefault(record["ticker"].upper(), deque()).append(record)
+            self._by_strategy.setdefault(record["strategy"], deque()).append(record)
+            if len(self._alerts) > self._limit:
+                self._evict(self._alerts.popleft())
+        return record
+
+    def _evict(self, record: dict) -> None:
+        for index, key in (
+            (self._by_ticker, record["ticker"].upper()),
+            (self._by_strategy, record["strategy"]),
+        ):
+            bucket = index[key]
+            bucket.popleft()
+            if not bucket:
+                del index[key]
+
+    def query(
+        self,
+        ticker: str = None,
+        strategy: str = None,
+        since: float = None,
+        until: float = None,
+        limit: int = RECENT_ALERTS_QUERY_MAX,
+    ) -> list:
+        """条件に合うアラートを新しい順に最大 limit 件返す"""
+        # バケットを複製せず新しい順に遅延評価で辿る（deque は走査中の変更を許さないためロック内で取り出す）
+        with self._lock:
+            if ticker is not None:
+                source = self._by_ticker.get(ticker.upper(), ())
+            elif strategy is not None:
+                source = self._by_strategy.get(strategy, ())
+            else:
+                source = self._alerts
+            newest_first = reversed(source)
+            if since is not None:
+                newest_first = takewhile(lambda record: record["ts"] >= since, newest_first)
+            matches = (
+                record
+                for record in newest_first
+                if (until is None or record["ts"] <= until)
+                and (strategy is None or record["strategy"] == strategy)
+            )
+            return list(islice(matches, limit))
+
+
+# ウォーム起動間で保持する直近アラート
+RECENT_ALERTS = RecentAlerts()
+_ALERT_LOG_LOCK = threading.Lock()
+
+
+def spill_alert(record: dict) -> None:
+    """TRADINGVIEW_ALERT_LOG 設定時、アラートを JSON Lines で追記する（Vercel では /tmp 配下）"""
+    path = _env("TRADINGVIEW_ALERT_LOG")
+    if not path:
+        return
+    try:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with _ALERT_LOG_LOCK, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        print(f"Failed to write alert log: {e}")
+
+
+def _parse_time(value: str) -> float:
+    """since / until（UNIX 秒または ISO 8601）を UNIX 秒に変換する"""
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=JST)
+        return parsed.timestamp()
 
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
         """TradingViewからのPOSTリクエストを処理"""
 
+        # 環境変数 TRADINGVIEW_PROFILE=cpu,mem 指定時のみプロファイルを取得
+        modes = _profile_modes()
+        if not modes:
+            self._handle_post()
+            return
+        with _profiled_request("tradingview_post", modes):
+            self._handle_post()
+
+    def _handle_post(self):
+        """POSTリクエスト本体（シークレット検証 → パース → LINE通知）"""
+
         # セキュリティ: シークレットトークン検証
         secret = self.headers.get("X-TradingView-Secret")
-        expected_secret = os.environ.get("TRADINGVIEW_SECRET")
+        expected_secret = _env("TRADINGVIEW_SECRET")
 
         if not expected_secret:
             self.send_error(500, "Server configuration error")
@@ -44,8 +273,9 @@ class handler(BaseHTTPRequestHandler):
         # LINE通知メッセージを作成
         message = format_trading_alert(data)
 
-        # LINE Messaging APIで通知
-        success = send_line_message(message)
+        # 設定済みの全チャネル（LINE / Webhook）へ並列に通知
+        success = send_notifications(message)
+        spill_alert(RECENT_ALERTS.add(data, success))
 
         if success:
             self.send_response(200)
@@ -57,12 +287,58 @@ class handler(BaseHTTPRequestHandler):
             self.wfile.write(b"Failed to send LINE notification")
 
     def do_GET(self):
-        """ヘルスチェック用"""
+        """ヘルスチェック用（?alerts 指定時は直近アラートの参照）"""
+        query = parse_qs(urlsplit(self.path).query, keep_blank_values=True)
+        if "alerts" in query:
+            self._handle_alerts_query(query)
+            return
+
         self.send_response(200)
         self.send_header("Content-type", "text/plain")
         self.end_headers()
         self.wfile.write(b"TradingView Webhook is running")
 
+    def _handle_alerts_query(self, query: dict):
+        """
+        直近アラートを JSON で返す
+
+        パラメータ: ticker / strategy / since / until（UNIX 秒または ISO 8601）/ limit
+        """
+        expected_secret = _env("TRADINGVIEW_SECRET")
+        if not expected_secret or self.headers.get("X-TradingView-Secret") != expected_secret:
+            self.send_response(403)
+            self.end_headers()
+            self.wfile.write(b"Forbidden: Invalid secret")
+            return
+
+        def param(name):
+            values = query.get(name)
+            return values[0] if values and values[0] != "" else None
+
+        try:
+            since = param("since")
+            until = param("until")
+            limit = param("limit")
+            alerts = RECENT_ALERTS.query(
+                ticker=param("ticker"),
+                strategy=param("strategy"),
+                since=_parse_time(since) if since else None,
+                until=_parse_time(until) if until else None,
+                limit=min(int(limit), RECENT_ALERTS_QUERY_MAX) if limit else RECENT_ALERTS_QUERY_MAX,
+            )
+        except ValueError as e:
+            self.send_response(400)
+            self.end_headers()
+            self.wfile.write(f"Bad Request: {str(e)}".encode())
+            return
+
+        body = json.dumps({"count": len(alerts), "alerts": alerts}, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
 
 def format_trading_alert(data: dict) -> str:
     """
@@ -131,17 +407,19 @@ def send_line_message(message: str) -> bool:
     Returns:
         bool: 送信成功時True
     """
-    access_token = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN")
-    user_id = os.environ.get("LINE_TARGET_USER_ID")
+    access_token = _env("LINE_CHANNEL_ACCESS_TOKEN")
+    user_id = _env("LINE_TARGET_USER_ID")
 
     if not access_token or not user_id:
         print("ERROR: LINE credentials not configured")
         return False
 
-    url = "https://api.line.me/v2/bot/message/push"
+    import uuid
+
     headers = {
-        "Content-Type": "application/json",
         "Authorization": f"Bearer {access_token}",
+        # 切断された接続で再送した場合も LINE 側で重複配信されないようにする
+        "X-Line-Retry-Key": str(uuid.uuid4()),
     }
     payload = {
         "to": user_id,
@@ -154,10 +432,163 @@ def send_line_message(message: str) -> bool:
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        print(f"LINE notification sent successfully: {response.status_code}")
-        return True
-    except requests.exceptions.RequestException as e:
+        status, body = HTTP_CLIENT.post_json(
+            LINE_PUSH_URL, payload, headers=headers, timeout=CHANNEL_TIMEOUTS["line"]
+        )
+    except (OSError, http.client.HTTPException) as e:
         print(f"Failed to send LINE notification: {e}")
         return False
+    if not 200 <= status < 300:
+        print(f"Failed to send LINE notification: {status} {body[:200]!r}")
+        return False
+    print(f"LINE notification sent successfully: {status}")
+    return True
+
+
+def send_webhook_message(message: str) -> bool:
+    """
+    Slack / Discord 等の Incoming Webhook にメッセージを送信
+
+    NOTIFY_WEBHOOK_FORMAT: slack（既定）/ discord / json
+
+    Returns:
+        bool: 送信成功時True
+    """
+    url = _env("NOTIFY_WEBHOOK_URL")
+    key = WEBHOOK_PAYLOAD_KEYS.get(_env("NOTIFY_WEBHOOK_FORMAT", "slack").lower())
+    if not url or key is None:
+        print("ERROR: Webhook is not configured correctly")
+        return False
+
+    try:
+        status, body = HTTP_CLIENT.post_json(
+            url, {key: message}, timeout=CHANNEL_TIMEOUTS["webhook"]
+        )
+    except (OSError, http.client.HTTPException) as e:
+        print(f"Failed to send webhook notification: {e}")
+        return False
+    if not 200 <= status < 300:
+        print(f"Failed to send webhook notification: {status} {body[:200]!r}")
+        return False
+    print(f"Webhook notification sent successfully: {status}")
+    return True
+
+
+def send_notifications(message: str) -> bool:
+    """
+    設定済みの全チャネルへ並列に送信する
+
+    各チャネルは独立したスレッドで送信し、チャネルごとのタイムアウトで打ち切るため、
+    全体の所要時間は最も遅いチャネルの時間で頭打ちになる。
+
+    Returns:
+        bool: いずれかのチャネルで送信に成功した場合True
+    """
+    # 送信時のみ必要なため遅延インポート（403 / 400 の経路では読み込まない）
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+
+    senders = {"line": send_line_message}
+    if _env("NOTIFY_WEBHOOK_URL"):
+        senders["webhook"] = send_webhook_message
+
+    # タイムアウトしたスレッドを待たずに応答するため with 文は使わない
+    executor = ThreadPoolExecutor(max_workers=len(senders))
+    try:
+        futures = {name: executor.submit(send, message) for name, send in senders.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=CHANNEL_TIMEOUTS[name])
+            except FutureTimeoutError:
+                print(f"Notification channel timed out: {name}")
+                results[name] = False
+            except Exception as e:
+                print(f"Notification channel failed: {name}: {e}")
+                results[name] = False
+    finally:
+        executor.shutdown(wait=False)
+
+    return any(results.values())
+
+
+def _profile_modes() -> set:
+    """環境変数 TRADINGVIEW_PROFILE から有効なプロファイルモードを返す"""
+    value = _env("TRADINGVIEW_PROFILE").strip().lower()
+    modes = set()
+    for token in value.split(","):
+        token = token.strip()
+        if token in ("1", "true", "yes", "all"):
+            modes |= {"cpu", "mem"}
+        elif token in ("cpu", "mem"):
+            modes.add(token)
+    return modes
+
+
+def _collapsed_stacks(stats) -> list:
+    """
+    pstats の呼び出し元情報から collapsed stack（flamegraph 形式）を組み立てる
+
+    Webhook 1回分は数ミリ秒で終わりサンプリングでは標本が集まらないため、
+    各関数の自己時間を「最も累積時間の長い呼び出し元」を辿ったスタックに割り当てる。
+    """
+    lines = []
+    for func, (_, _, tottime, _, _) in stats.stats.items():
+        weight = int(tottime * 1_000_000)  # マイクロ秒
+        if weight <= 0:
+            continue
+        chain = []
+        current = func
+        visited = set()
+        while current is not None and current not in visited and len(chain) < 64:
+            visited.add(current)
+            filename, _, name = current
+            chain.append(f"{os.path.basename(filename)}:{name}")
+            callers = stats.stats.get(current, (0, 0, 0, 0, {}))[4]
+            current = max(callers, key=lambda c: callers[c][3]) if callers else None
+        lines.append(f"{';'.join(reversed(chain))} {weight}")
+    return lines
+
+
+@contextmanager
+def _profiled_request(name: str, modes: set):
+    """
+    リクエスト処理を cProfile / tracemalloc で計測し、結果をファイルに出力する
+
+    出力先は TRADINGVIEW_PROFILE_DIR（既定: /tmp/profiles）。
+    """
+    # プロファイル時のみ必要なモジュールは遅延インポート
+    import cProfile
+    import io
+    import pstats
+    import tracemalloc
+
+    output_dir = _env("TRADINGVIEW_PROFILE_DIR", PROFILE_DIR_DEFAULT)
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+
+    profiler = cProfile.Profile() if "cpu" in modes else None
+    if "mem" in modes:
+        tracemalloc.start(25)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(prefix + ".pstats")
+            buffer = io.StringIO()
+            stats = pstats.Stats(profiler, stream=buffer)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+            with open(prefix + ".pstats.txt", "w", encoding="utf-8") as f:
+                f.write(buffer.getvalue())
+            with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+                f.write("\n".join(_collapsed_stacks(stats)) + "\n")
+        if "mem" in modes:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            with open(prefix + ".alloc.txt", "w", encoding="utf-8") as f:
+                for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]:
+                    f.write(f"{stat}\n")
+        print(f"Profile written: {prefix}.*")
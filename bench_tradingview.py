@@ -0,0 +1,164 @@
+"""
+TradingView Webhook（api/tradingview.py）のコールド / ウォーム応答時間を計測するスクリプト
+
+ローカルに LINE API の代わりの HTTP サーバーを立て、ハンドラを直接呼び出して計測します。
+    - コールド: 新しいプロセスで「モジュール読み込み + 1リクエスト」（Vercel の初回起動相当）
+    - ウォーム: 同一プロセスでの2回目以降のリクエスト（接続を再利用）
+
+使い方:
+    python bench_tradingview.py
+    python bench_tradingview.py --cold 20 --warm 500
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api")
+SECRET = "bench-secret"
+ALERT = json.dumps({"ticker": "7203", "action": "buy", "close": "3000", "strategy": "bench"}).encode()
+
+# ハンドラを直接呼び出す関数（子プロセスと本プロセスの両方で使う）
+INVOKE_SOURCE = '''
+import io
+from http.client import HTTPMessage
+
+def invoke(module, body, secret):
+    request = module.handler.__new__(module.handler)
+    headers = HTTPMessage()
+    headers["X-TradingView-Secret"] = secret
+    headers["Content-Length"] = str(len(body))
+    request.headers = headers
+    request.rfile = io.BytesIO(body)
+    request.wfile = io.BytesIO()
+    request.request_version = "HTTP/1.1"
+    request.requestline = "POST /api/tradingview HTTP/1.1"
+    request.command = "POST"
+    request.client_address = ("127.0.0.1", 0)
+    request.log_message = lambda *args: None
+    request.do_POST()
+    return int(request.wfile.getvalue().split(b" ", 2)[1])
+'''
+
+COLD_SOURCE = INVOKE_SOURCE + '''
+import contextlib, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {api_dir!r})
+import tradingview
+tradingview.LINE_PUSH_URL = {line_url!r}
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    status = invoke(tradingview, {body!r}, {secret!r})
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "request": done - imported, "status": status}}))
+'''
+
+
+class FakeLineHandler(BaseHTTPRequestHandler):
+    """LINE push API の代わりに 200 を返すだけのハンドラ（keep-alive 対応）"""
+
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に書き込むため、Nagle と遅延 ACK で 40ms 待たされないようにする
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def summarize(label, samples):
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    print(
+        f"{label:<28} n={len(samples_ms):<4} "
+        f"p50={statistics.median(samples_ms):8.2f}ms  p95={p95:8.2f}ms  max={samples_ms[-1]:8.2f}ms"
+    )
+
+
+def run_cold(runs, line_url, body, secret, env):
+    imports, requests_ = [], []
+    for _ in range(runs):
+        source = COLD_SOURCE.format(api_dir=API_DIR, line_url=line_url, body=body, secret=secret)
+        output = subprocess.run(
+            [sys.executable, "-c", source], env=env, capture_output=True, text=True, check=True
+        )
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        imports.append(result["import"])
+        requests_.append(result["request"])
+    return imports, requests_
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TradingView Webhook のコールド / ウォーム計測")
+    parser.add_argument("--cold", type=int, default=10, help="コールド計測の回数")
+    parser.add_argument("--warm", type=int, default=200, help="ウォーム計測の回数")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLineHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    line_url = f"http://127.0.0.1:{server.server_port}/v2/bot/message/push"
+
+    env = dict(os.environ)
+    env.update(
+        {
+            "TRADINGVIEW_SECRET": SECRET,
+            "LINE_CHANNEL_ACCESS_TOKEN": "bench-token",
+            "LINE_TARGET_USER_ID": "Ubench",
+        }
+    )
+    env.pop("NOTIFY_WEBHOOK_URL", None)
+    env.pop("TRADINGVIEW_PROFILE", None)
+
+    print("== コールド（新規プロセス）==")
+    imports, posts = run_cold(args.cold, line_url, ALERT, SECRET, env)
+    summarize("import", imports)
+    summarize("first POST (200)", posts)
+    imports, forbidden = run_cold(args.cold, line_url, ALERT, "wrong", env)
+    summarize("first POST (403)", forbidden)
+
+    print("== ウォーム（同一プロセス）==")
+    os.environ.update(env)
+    os.environ.pop("NOTIFY_WEBHOOK_URL", None)
+    os.environ.pop("TRADINGVIEW_PROFILE", None)
+    sys.path.insert(0, API_DIR)
+    import tradingview
+
+    tradingview.LINE_PUSH_URL = line_url
+    namespace = {}
+    exec(INVOKE_SOURCE, namespace)
+    invoke = namespace["invoke"]
+
+    samples = {"POST (200)": (ALERT, SECRET), "POST (403)": (ALERT, "wrong"), "POST (400)": (b"{", SECRET)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        invoke(tradingview, ALERT, SECRET)
+    for label, (body, secret) in samples.items():
+        timings = []
+        for _ in range(args.warm):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                invoke(tradingview, body, secret)
+            timings.append(time.perf_counter() - start)
+        summarize(label, timings)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
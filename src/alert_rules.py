@@ -0,0 +1,441 @@
+"""
+アラートルールエンジン
+
+ルール定義ファイル（``ALERT_RULES_FILE``）のルールを起動時に1回だけ述語（クロージャ）へ
+コンパイルし、スナップショットごとに前回状態と合わせて1パスで評価します。
+一致したルールはアラート通知として通知アウトボックスへ登録します。
+
+ルールは銘柄コード・業種名ごとの索引に振り分けられるため、1スナップショットの評価は
+「行数 ×（その行に該当するルール数＋ワイルドカードルール数）」で済み、
+数百ルールでも数ミリ秒で終わります。
+
+ルール定義ファイルの形式:
+    {
+      "rules": [
+        {"name": "6920 TOP3入り", "type": "enters_top", "code": "6920", "top": 3},
+        {"name": "業種 ±3%", "type": "move", "sector": "*", "threshold": 3.0},
+        {"name": "TOP10 3回連続", "type": "streak", "code": "*", "top": 10, "count": 3,
+         "targets": ["morning", "afternoon"]}
+      ]
+    }
+
+ルール種別:
+    - ``enters_top``: 前回 ``top`` 位圏外（または未ランクイン）→ 今回 ``top`` 位以内
+    - ``move``      : 騰落率の絶対値が ``threshold``（%）以上（``direction``: up / down / both）
+    - ``streak``    : ``top`` 位以内が今回でちょうど ``count`` 回連続になった
+    - ``rank_jump`` : 前回から ``min_change`` 位以上の順位上昇
+
+共通項目: ``name``（通知に表示）、``code`` または ``sector``（``"*"`` で全件）、
+``targets``（morning / afternoon / sector、省略時は全対象）
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple
+
+from config import ALERT_RULES_FILE, ALERT_STATE_DEPTH, ALERT_STATE_FILE
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ALERT_RULES_ENV = "SCRAPER_ALERT_RULES"
+ALERT_STATE_PATH = BASE_DIR / ALERT_STATE_FILE
+
+WILDCARD = "*"
+_PERCENT_PATTERN = re.compile(r"[-+]?\d+(?:\.\d+)?")
+# 業種行の ``change``（"+48.07(+1.38％)"）の括弧内の騰落率
+_PAREN_PERCENT_PATTERN = re.compile(r"\(([-+]?\d+(?:\.\d+)?)[%％]\)")
+
+
+@dataclass(frozen=True)
+class RowState:
+    """正規化したランキング1行と、その銘柄・業種の前回までの状態。"""
+
+    key: str  # 銘柄コードまたは業種名
+    label: str  # 通知表示用（"[9984] ソフトバンクグループ" / "鉱業"）
+    rank: int
+    change: Optional[float]  # 騰落率（%）
+    history: Tuple[Optional[int], ...]  # 前回から遡った順位（未ランクインは None）
+
+    @property
+    def previous_rank(self) -> Optional[int]:
+        return self.history[0] if self.history else None
+
+
+Predicate = Callable[[RowState], Optional[str]]
+
+
+@dataclass(frozen=True)
+class Rule:
+    """コンパイル済みルール。``predicate`` は一致時に詳細文、不一致時に None を返す。"""
+
+    name: str
+    key: Optional[str]  # None はワイルドカード
+    targets: Optional[FrozenSet[str]]
+    predicate: Predicate
+
+
+@dataclass(frozen=True)
+class Alert:
+    """ルール一致1件。"""
+
+    rule: str
+    target: str
+    key: str
+    detail: str
+
+
+# ===========================
+# 正規化
+# ===========================
+
+
+def parse_percent(text: Any) -> Optional[float]:
+    """
+    "株価変動率：+5.00%" / "-1.23%" などから数値を取り出す。
+
+    Examples:
+        >>> parse_percent("株価変動率：+5.00%")
+        5.0
+        >>> parse_percent("N/A") is None
+        True
+    """
+    match = _PERCENT_PATTERN.search(str(text or "").replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def row_percent(row: Mapping[str, Any]) -> Optional[float]:
+    """
+    行の騰落率（%）を返す。業種行は ``change``（"+48.07(+1.38％)"）の括弧内から読む。
+
+    Examples:
+        >>> row_percent({"change_percent": "株価変動率：+5.00%"})
+        5.0
+        >>> row_percent({"change": "+48.07(+1.38％)"})
+        1.38
+        >>> row_percent({"change": "-"}) is None
+        True
+    """
+    if row.get("change_percent"):
+        return parse_percent(row["change_percent"])
+    match = _PAREN_PERCENT_PATTERN.search(str(row.get("change") or "").replace(",", ""))
+    return float(match.group(1)) if match else None
+
+
+def normalize_rows(rows: Sequence[Mapping[str, Any]]) -> List[Tuple[str, str, int, Optional[float]]]:
+    """ランキング行を (キー, 表示名, 順位, 騰落率) に正規化する。順位が読めない行は除外。"""
+
+    normalized = []
+    for row in rows:
+        try:
+            rank = int(str(row.get("rank", "")).strip())
+        except ValueError:
+            continue
+        code = str(row.get("code") or "").strip()
+        if code:
+            key, label = code, f"[{code}] {row.get('name', '')}".rstrip()
+        else:
+            key = str(row.get("sector") or "").strip()
+            label = key
+        if not key:
+            continue
+        normalized.append((key, label, rank, row_percent(row)))
+    return normalized
+
+
+# ===========================
+# コンパイル
+# ===========================
+
+
+def _enters_top(spec: Mapping[str, Any]) -> Predicate:
+    top = int(spec["top"])
+
+    def predicate(row: RowState) -> Optional[str]:
+        previous = row.previous_rank
+        if row.rank <= top and (previous is None or previous > top):
+            before = f"前回{previous}位" if previous is not None else "前回圏外"
+            return f"{row.label} が TOP{top} 入り（{before} → {row.rank}位）"
+        return None
+
+    return predicate
+
+
+def _move(spec: Mapping[str, Any]) -> Predicate:
+    threshold = float(spec["threshold"])
+    direction = spec.get("direction", "both")
+    if direction not in ("up", "down", "both"):
+        raise ValueError(f"direction は up / down / both のいずれかです: {direction}")
+
+    def predicate(row: RowState) -> Optional[str]:
+        change = row.change
+        if change is None:
+            return None
+        if direction == "up":
+            hit = change >= threshold
+        elif direction == "down":
+            hit = change <= -threshold
+        else:
+            hit = abs(change) >= threshold
+        return f"{row.label} が {change:+.2f}%（閾値 ±{threshold:g}%）" if hit else None
+
+    return predicate
+
+
+def _streak(spec: Mapping[str, Any]) -> Predicate:
+    top = int(spec["top"])
+    count = int(spec["count"])
+    if count < 1:
+        raise ValueError("count は1以上を指定してください")
+
+    def predicate(row: RowState) -> Optional[str]:
+        if row.rank > top:
+            return None
+        streak = 1
+        for rank in row.history:
+            if rank is None or rank > top:
+                break
+            streak += 1
+            if streak > count:
+                return None  # 既に通知済み（ちょうど count 回目のみ通知）
+        return f"{row.label} が {count}回連続で TOP{top}（今回{row.rank}位）" if streak == count else None
+
+    return predicate
+
+
+def _rank_jump(spec: Mapping[str, Any]) -> Predicate:
+    min_change = int(spec["min_change"])
+
+    def predicate(row: RowState) -> Optional[str]:
+        previous = row.previous_rank
+        if previous is not None and previous - row.rank >= min_change:
+            return f"{row.label} が {previous}位 → {row.rank}位（↑{previous - row.rank}）"
+        return None
+
+    return predicate
+
+
+# ルール種別 → 述語ファクトリ
+RULE_TYPES: Dict[str, Callable[[Mapping[str, Any]], Predicate]] = {
+    "enters_top": _enters_top,
+    "move": _move,
+    "streak": _streak,
+    "rank_jump": _rank_jump,
+}
+
+
+def compile_rule(spec: Mapping[str, Any]) -> Rule:
+    """
+    ルール定義1件をコンパイルする。
+
+    Raises:
+        ValueError: 種別が不明、または必須項目が不足・不正な場合
+    """
+    rule_type = spec.get("type")
+    factory = RULE_TYPES.get(str(rule_type))
+    if factory is None:
+        raise ValueError(f"未知のルール種別です: {rule_type}")
+
+    if "code" in spec:
+        key = str(spec["code"]).strip().upper()
+    else:
+        key = str(spec.get("sector", WILDCARD)).strip()
+    targets = spec.get("targets")
+    try:
+        predicate = factory(spec)
+    except KeyError as exc:
+        raise ValueError(f"ルール {rule_type} に必須項目 {exc} がありません") from exc
+
+    return Rule(
+        name=str(spec.get("name") or rule_type),
+        key=None if key == WILDCARD else key,
+        targets=frozenset(targets) if targets else None,
+        predicate=predicate,
+    )
+
+
+class RuleSet:
+    """コンパイル済みルールを対象・キーごとに索引化したもの。"""
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self.rules = list(rules)
+        self._cache: Dict[str, Tuple[Dict[str, List[Rule]], List[Rule]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _for_target(self, target: str) -> Tuple[Dict[str, List[Rule]], List[Rule]]:
+        cached = self._cache.get(target)
+        if cached is None:
+            by_key: Dict[str, List[Rule]] = {}
+            wildcard: List[Rule] = []
+            for rule in self.rules:
+                if rule.targets is not None and target not in rule.targets:
+                    continue
+                if rule.key is None:
+                    wildcard.append(rule)
+                else:
+                    by_key.setdefault(rule.key, []).append(rule)
+            cached = (by_key, wildcard)
+            self._cache[target] = cached
+        return cached
+
+    def evaluate(
+        self,
+        target: str,
+        rows: Sequence[Mapping[str, Any]],
+        recent: Sequence[Mapping[str, int]] = (),
+    ) -> List[Alert]:
+        """
+        スナップショット1件を評価する。
+
+        Args:
+            target: 取得対象（morning / afternoon / sector）
+            rows: ランキング行（スクレイパーの出力そのまま）
+            recent: 前回から遡った各スナップショットのキー → 順位（新しい順）
+
+        Examples:
+            >>> rules = RuleSet([compile_rule({"type": "enters_top", "code": "6920", "top": 3})])
+            >>> [a.detail for a in rules.evaluate("morning",
+            ...     [{"rank": "2", "code": "6920", "name": "レーザーテック"}], [{"6920": 5}])]
+            ['[6920] レーザーテック が TOP3 入り（前回5位 → 2位）']
+        """
+        by_key, wildcard = self._for_target(target)
+        if not by_key and not wildcard:
+            return []
+
+        alerts = []
+        for key, label, rank, change in normalize_rows(rows):
+            rules = by_key.get(key)
+            if rules is None and not wildcard:
+                continue
+            row = RowState(
+                key=key,
+                label=label,
+                rank=rank,
+                change=change,
+                history=tuple(ranks.get(key) for ranks in recent),
+            )
+            for rule in (rules or []) + wildcard:
+                detail = rule.predicate(row)
+                if detail is not None:
+                    alerts.append(Alert(rule=rule.name, target=target, key=key, detail=detail))
+        return alerts
+
+
+def rules_path() -> Path:
+    """ルール定義ファイルのパスを返す（環境変数 SCRAPER_ALERT_RULES 優先）。"""
+
+    value = os.environ.get(ALERT_RULES_ENV, "").strip()
+    return Path(value) if value else BASE_DIR / ALERT_RULES_FILE
+
+
+def load_rules(path: Optional[Path] = None) -> RuleSet:
+    """ルール定義ファイルを読み込んでコンパイルする。ファイルがなければ空のルールセット。"""
+
+    path = path or rules_path()
+    if not path.exists():
+        return RuleSet([])
+
+    with path.open("r", encoding="utf-8") as file:
+        specs = json.load(file).get("rules", [])
+
+    rules = []
+    for index, spec in enumerate(specs):
+        try:
+            rules.append(compile_rule(spec))
+        except ValueError as exc:
+            raise ValueError(f"ルール #{index} が不正です: {exc}") from exc
+    logger.info("アラートルールを読み込みました: %d件 (%s)", len(rules), path)
+    return RuleSet(rules)
+
+
+# ===========================
+# 前回状態
+# ===========================
+
+
+def load_state(path: Path = ALERT_STATE_PATH) -> Dict[str, Any]:
+    """対象ごとの直近順位履歴を読み込む。"""
+
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as file:
+            return json.load(file)
+    except (json.JSONDecodeError, OSError) as exc:
+        logger.warning("アラート状態の読み込みに失敗したため初期化します: %s", exc)
+        return {}
+
+
+def save_state(state: Mapping[str, Any], path: Path = ALERT_STATE_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as file:
+        json.dump(state, file, ensure_ascii=False, indent=2)
+
+
+def format_alert_message(datetime_str: str, alerts: Sequence[Alert]) -> str:
+    """一致したルールを1通の通知文にまとめる。"""
+
+    lines = [f"🔔 アラート {datetime_str}"]
+    for alert in alerts:
+        lines.append(f"・{alert.rule}: {alert.detail}")
+    return "\n".join(lines)
+
+
+_default_rules: Optional[RuleSet] = None
+
+
+def get_rules() -> RuleSet:
+    """ルール定義ファイルからコンパイルしたルールセットを返す（プロセス内でキャッシュ）。"""
+
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = load_rules()
+    return _default_rules
+
+
+def evaluate_snapshot(
+    target: str,
+    datetime_str: str,
+    rows: Sequence[Mapping[str, Any]],
+    rules: Optional[RuleSet] = None,
+    state_path: Path = ALERT_STATE_PATH,
+) -> List[Alert]:
+    """
+    新しいスナップショットをルール評価し、前回状態を更新する。
+
+    同じスナップショット（``datetime_str`` が前回と同じ）の再評価では状態を更新しない。
+    ルールが1つもなければ状態ファイルを読み書きせず、内容が変わらない場合は書き込まない
+    （data/ の不要なコミットを増やさない）。
+    """
+    rules = get_rules() if rules is None else rules
+    if not len(rules):
+        return []
+
+    state = load_state(state_path)
+    entry = state.get(target, {})
+    recent: List[Dict[str, int]] = entry.get("recent", [])
+    if entry.get("datetime") == datetime_str:
+        recent = recent[1:]  # 再実行: 今回分を除いた履歴で評価する
+
+    alerts = rules.evaluate(target, rows, recent)
+
+    current = {key: rank for key, _, rank, _ in normalize_rows(rows)}
+    updated = {
+        "datetime": datetime_str,
+        "recent": [current] + recent[: ALERT_STATE_DEPTH - 1],
+    }
+    if updated != entry:
+        state[target] = updated
+        save_state(state, state_path)
+
+    if alerts:
+        logger.info("アラートルール一致: %d件 (%s %s)", len(alerts), target, datetime_str)
+    return alerts
@@ -0,0 +1,451 @@
+"""
+ランキング銘柄を買う戦略のバックテスト
+
+朝（morning）・午後（afternoon）のランキングには取得時点の株価が記録されているため、
+「朝の上位 N 銘柄を買い、午後のランキングで売る（または翌営業日に現れた時点で売る）」
+といった単純なルールを検証できます。
+
+保存済みスナップショットを 日付 × スロット × 銘柄 の NumPy 行列（順位・株価・出来高・売買代金）に
+まとめ、パラメータの組（上位 N・買いのスロット・売りのタイミング・出来高 / 売買代金の下限）を
+まとめて行列演算で評価します。組が多い場合は ``--processes`` でプロセスに分担できます。
+
+売りのタイミング:
+    afternoon   同じ日の午後のランキング（買いが morning の場合のみ）
+    next_day    翌営業日（データのある次の日）に最初に現れたスナップショット
+
+ランキング外の銘柄は株価が記録されないため、売りの時点でランキングに現れなかった銘柄は
+取引に数えません（件数は ``unpriced`` として出力します）。
+同じ日・スロットに複数のスナップショットがある場合は最後のものを使います。
+
+評価指標:
+    trades        取引数
+    hit_rate      勝率（リターンが正の取引の割合）
+    mean_return   1取引あたりの平均リターン（%）
+    total_return  日ごとに等金額で買った場合の累積リターン（%）
+    max_drawdown  同じく累積資産の最大下落率（%）
+
+使い方:
+    python backtest.py                                          # 既定のグリッドを評価
+    python backtest.py --top 1 3 5 10 --min-volume 0 1000000 --min-value 0 1e9
+    python backtest.py --processes 4 --sort hit_rate --limit 20
+    python backtest.py --bench                                  # 合成データで数千通りを計測
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import itertools
+import json
+import logging
+import math
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from snapshot_store import Snapshot, iter_snapshots
+
+logger = logging.getLogger(__name__)
+
+# 行列のスロット軸（TIME_SLOTS の識別子の順）
+SLOTS: Tuple[str, ...] = ("morning", "afternoon")
+EXITS: Tuple[str, ...] = ("afternoon", "next_day")
+
+DEFAULT_TOPS = (1, 3, 5, 10)
+
+# 1回の評価で扱うパラメータの組 × 日付の上限（プロセスへの分担もこの単位）
+MAX_CELLS_PER_BATCH = 2_000_000
+
+_NUMBER_PATTERN = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+
+@dataclass
+class RankingPanel:
+    """ランキングの行列。ランキング外は NaN。"""
+
+    dates: List[datetime.date]
+    codes: List[str]
+    names: Dict[str, str]
+    rank: np.ndarray  # (日付, スロット, 銘柄)
+    price: np.ndarray
+    volume: np.ndarray
+    value: np.ndarray
+
+
+@dataclass(frozen=True)
+class Params:
+    """パラメータの組1つ。"""
+
+    top: int
+    entry: str
+    exit: str
+    min_volume: float = 0.0
+    min_value: float = 0.0
+
+
+@dataclass(frozen=True)
+class Result:
+    """パラメータの組1つの評価結果。"""
+
+    params: Params
+    trades: int
+    unpriced: int
+    hit_rate: float
+    mean_return: float
+    total_return: float
+    max_drawdown: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        values = asdict(self)
+        values.update(values.pop("params"))
+        return {
+            name: None if isinstance(value, float) and math.isnan(value) else value
+            for name, value in values.items()
+        }
+
+
+# ===========================
+# 読み込み
+# ===========================
+
+
+def parse_number(text: Any) -> float:
+    """
+    "出来高：1,090,300" / "26,545.0" などから数値を取り出す。読めない場合は NaN。
+
+    Examples:
+        >>> parse_number("概算売買代金：28,990,335,000")
+        28990335000.0
+        >>> parse_number("-")
+        nan
+    """
+    match = _NUMBER_PATTERN.search(str(text or "").replace(",", ""))
+    return float(match.group()) if match else float("nan")
+
+
+def build_panel(snapshots: Sequence[Tuple[str, str, Snapshot]]) -> RankingPanel:
+    """
+    (対象, キー, スナップショット) の列から行列を作る。
+
+    Examples:
+        >>> panel = build_panel([
+        ...     ("morning", "20251104_0920", {"rankings": [
+        ...         {"rank": "1", "code": "9984", "name": "SBG", "price": "100", "volume": "出来高：10"}]}),
+        ...     ("afternoon", "20251104_1300", {"rankings": [
+        ...         {"rank": "3", "code": "9984", "price": "110"}]}),
+        ... ])
+        >>> panel.rank.shape, panel.price[0, :, 0].tolist()
+        ((1, 2, 1), [100.0, 110.0])
+    """
+    cells: Dict[Tuple[datetime.date, int], List[Dict[str, Any]]] = {}
+    names: Dict[str, str] = {}
+    for target, key, data in snapshots:
+        if target not in SLOTS:
+            continue
+        try:
+            date = datetime.datetime.strptime(key[:8], "%Y%m%d").date()
+        except ValueError:
+            continue
+        rows = [row for row in data.get("rankings") or [] if str(row.get("code") or "").strip()]
+        if rows:
+            cells[(date, SLOTS.index(target))] = rows
+            names.update((str(row["code"]).strip(), str(row.get("name") or "")) for row in rows)
+
+    dates = sorted({date for date, _ in cells})
+    codes = sorted(names)
+    date_index = {date: number for number, date in enumerate(dates)}
+    code_index = {code: number for number, code in enumerate(codes)}
+
+    entries = [
+        (
+            date_index[date],
+            slot,
+            code_index[str(row["code"]).strip()],
+            parse_number(row.get("rank")),
+            parse_number(row.get("price")),
+            parse_number(row.get("volume")),
+            parse_number(row.get("value")),
+        )
+        for (date, slot), rows in cells.items()
+        for row in rows
+    ]
+    shape = (len(dates), len(SLOTS), len(codes))
+    matrices = [np.full(shape, np.nan) for _ in range(4)]
+    if entries:
+        day, slot, code, *values = (np.array(column) for column in zip(*entries))
+        for matrix, column in zip(matrices, values):
+            matrix[day.astype(int), slot.astype(int), code.astype(int)] = column
+    rank, price, volume, value = matrices
+    return RankingPanel(dates, codes, names, rank, price, volume, value)
+
+
+def load_panel() -> RankingPanel:
+    """保存済み（アーカイブ分を含む）の朝・午後のランキングを読み込む。"""
+
+    return build_panel([(ref.target, ref.key, data) for ref, data in iter_snapshots(SLOTS)])
+
+
+def synthetic_panel(days: int = 245, codes: int = 300, ranked: int = 50, seed: int = 0) -> RankingPanel:
+    """計測用の合成データ（各スロットで ``ranked`` 銘柄がランクイン）を作る。"""
+
+    generator = np.random.default_rng(seed)
+    shape = (days, len(SLOTS), codes)
+    price = 1000 * np.exp(np.cumsum(generator.normal(0, 0.02, size=shape).reshape(-1, codes), axis=0)).reshape(shape)
+    scores = generator.random(shape)
+    order = np.argsort(-scores, axis=-1)
+    rank = np.full(shape, np.nan)
+    np.put_along_axis(rank, order[..., :ranked], np.arange(1, ranked + 1, dtype=float), axis=-1)
+    listed = ~np.isnan(rank)
+    start = datetime.date(2025, 1, 6)
+    return RankingPanel(
+        dates=[start + datetime.timedelta(days=offset) for offset in range(days)],
+        codes=[f"{number:04d}" for number in range(codes)],
+        names={},
+        rank=rank,
+        price=np.where(listed, price, np.nan),
+        volume=np.where(listed, generator.lognormal(13, 1.5, size=shape), np.nan),
+        value=np.where(listed, generator.lognormal(21, 1.5, size=shape), np.nan),
+    )
+
+
+# ===========================
+# 評価（行列演算）
+# ===========================
+
+
+def exit_prices(panel: RankingPanel, entry: str, exit: str) -> Optional[np.ndarray]:
+    """
+    買い（日付, 銘柄）ごとの売値を返す。組み合わせが成り立たない場合は None。
+
+    next_day は翌日（行列上の次の日付）の朝、なければ午後の株価。
+    """
+    if exit == "afternoon":
+        return panel.price[:, SLOTS.index("afternoon")] if entry == "morning" else None
+    if exit != "next_day":
+        raise ValueError(f"未知の売りタイミングです: {exit}")
+    following = np.full(panel.price.shape[::2], np.nan)
+    later = panel.price[1:]
+    following[:-1] = np.where(np.isnan(later[:, 0]), later[:, 1], later[:, 0])
+    return following
+
+
+def _max_drawdown(daily: np.ndarray) -> np.ndarray:
+    """日次リターン（(組, 日付)、比率）から累積資産の最大下落率（%）を返す。"""
+
+    equity = np.cumprod(1 + daily, axis=-1)
+    peak = np.maximum.accumulate(np.maximum(equity, 1.0), axis=-1)
+    return (equity / peak - 1).min(axis=-1) * 100
+
+
+def _by_rank(panel: RankingPanel, slot: int, values: np.ndarray) -> np.ndarray:
+    """(日付, 銘柄) の値を (日付, 順位) に並べ替える。その順位の銘柄がなければ NaN。"""
+
+    rank = panel.rank[:, slot]
+    positions = int(np.nanmax(rank)) if np.isfinite(rank).any() else 0
+    arranged = np.full((len(panel.dates), positions), np.nan)
+    day, code = np.nonzero(np.isfinite(rank) & (rank >= 1))
+    arranged[day, rank[day, code].astype(int) - 1] = values[day, code]
+    return arranged
+
+
+def evaluate(panel: RankingPanel, params: Sequence[Params]) -> List[Result]:
+    """
+    買い・売りのタイミングが同じパラメータの組をまとめて評価する。
+
+    上位 N 銘柄は N が大きいほど前の N を含むため、出来高・売買代金の下限ごとに
+    (日付, 順位) の取引数・リターンを順位方向に累積しておけば、各組の日次成績は
+    累積値から1回の索引で取り出せる。
+    """
+    if not params:
+        return []
+    entry, exit = params[0].entry, params[0].exit
+    if any((item.entry, item.exit) != (entry, exit) for item in params):
+        raise ValueError("evaluate() には買い・売りのタイミングが同じ組を渡してください")
+
+    sell = exit_prices(panel, entry, exit)
+    slot = SLOTS.index(entry)
+    buy = panel.price[:, slot]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = sell / buy - 1 if sell is not None else np.full(buy.shape, np.nan)
+    returns = _by_rank(panel, slot, returns)
+    listed = ~np.isnan(_by_rank(panel, slot, np.ones(buy.shape)))
+    volume = _by_rank(panel, slot, panel.volume[:, slot])
+    value = _by_rank(panel, slot, panel.value[:, slot])
+    priced = ~np.isnan(returns)
+
+    # 出来高・売買代金の下限の組ごとに (下限, 日付, 順位) の条件を作る（下限 0 は値が読めない行も対象）
+    limits = sorted({(item.min_volume, item.min_value) for item in params})
+    min_volume = np.array([limit[0] for limit in limits])[:, None, None]
+    min_value = np.array([limit[1] for limit in limits])[:, None, None]
+    eligible = (
+        listed[None]
+        & ((min_volume <= 0) | (volume[None] >= min_volume))
+        & ((min_value <= 0) | (value[None] >= min_value))
+    )
+    trades = eligible & priced[None]
+    cumulative_count = np.cumsum(trades, axis=2)
+    cumulative_gain = np.cumsum(np.where(trades, returns[None], 0.0), axis=2)
+    cumulative_wins = np.cumsum(trades & (returns[None] > 0), axis=2)
+    cumulative_unpriced = np.cumsum(eligible & ~priced[None], axis=2)
+
+    positions = returns.shape[1]
+    if positions == 0:
+        return [Result(item, 0, 0, float("nan"), float("nan"), 0.0, 0.0) for item in params]
+
+    # 各組の (下限の番号, 上位 N の位置) で (組, 日付) の日次成績を取り出す
+    limit_index = np.array([limits.index((item.min_volume, item.min_value)) for item in params])
+    top_index = np.clip(np.array([item.top for item in params]), 1, positions) - 1
+    daily_count = cumulative_count[limit_index, :, top_index]
+    daily_gain = cumulative_gain[limit_index, :, top_index]
+    count = daily_count.sum(axis=1)
+    wins = cumulative_wins[limit_index, :, top_index].sum(axis=1)
+    unpriced = cumulative_unpriced[limit_index, :, top_index].sum(axis=1)
+    daily = np.divide(daily_gain, daily_count, out=np.zeros(daily_count.shape), where=daily_count > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hit_rate = wins / count
+        mean_return = daily_gain.sum(axis=1) / count * 100
+    total_return = (np.prod(1 + daily, axis=-1) - 1) * 100
+    drawdown = _max_drawdown(daily)
+
+    return [
+        Result(
+            params=item,
+            trades=int(count[number]),
+            unpriced=int(unpriced[number]),
+            hit_rate=float(hit_rate[number]),
+            mean_return=float(mean_return[number]),
+            total_return=float(total_return[number]),
+            max_drawdown=float(drawdown[number]),
+        )
+        for number, item in enumerate(params)
+    ]
+
+
+def expand_grid(
+    tops: Sequence[int] = DEFAULT_TOPS,
+    entries: Sequence[str] = SLOTS,
+    exits: Sequence[str] = EXITS,
+    min_volumes: Sequence[float] = (0.0,),
+    min_values: Sequence[float] = (0.0,),
+) -> List[Params]:
+    """
+    パラメータの全組み合わせを返す（成り立たない買い・売りの組は除く）。
+
+    Examples:
+        >>> [(p.entry, p.exit) for p in expand_grid(tops=[3])]
+        [('morning', 'afternoon'), ('morning', 'next_day'), ('afternoon', 'next_day')]
+    """
+    return [
+        Params(top, entry, exit, float(min_volume), float(min_value))
+        for entry, exit in itertools.product(entries, exits)
+        if not (exit == "afternoon" and entry != "morning")
+        for top, min_volume, min_value in itertools.product(tops, min_volumes, min_values)
+    ]
+
+
+def _batches(panel: RankingPanel, grid: Sequence[Params]) -> Iterator[List[Params]]:
+    """買い・売りのタイミングごとに、行列が大きくなりすぎない大きさに分ける。"""
+
+    size = max(1, MAX_CELLS_PER_BATCH // max(1, len(panel.dates)))
+    by_timing: Dict[Tuple[str, str], List[Params]] = {}
+    for item in grid:
+        by_timing.setdefault((item.entry, item.exit), []).append(item)
+    for items in by_timing.values():
+        for start in range(0, len(items), size):
+            yield items[start : start + size]
+
+
+def run_grid(panel: RankingPanel, grid: Sequence[Params], processes: int = 1) -> List[Result]:
+    """グリッド全体を評価する。``processes`` > 1 の場合はバッチをプロセスに分担する。"""
+
+    batches = list(_batches(panel, grid))
+    if processes <= 1 or len(batches) <= 1:
+        return [result for batch in batches for result in evaluate(panel, batch)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(evaluate, panel, batch) for batch in batches]
+        return [result for future in futures for result in future.result()]
+
+
+# ===========================
+# 出力
+# ===========================
+
+
+SORT_KEYS = ("mean_return", "hit_rate", "total_return", "max_drawdown", "trades")
+
+
+def format_results(results: Sequence[Result], sort: str, limit: int) -> str:
+    ranked = sorted(
+        (result for result in results if result.trades),
+        key=lambda result: getattr(result, sort),
+        reverse=True,
+    )
+    lines = [
+        f"{'top':>4} {'entry':<10}{'exit':<10}{'min_vol':>10} {'min_value':>12} "
+        f"{'trades':>7} {'hit':>6} {'mean%':>7} {'total%':>8} {'maxDD%':>8}"
+    ]
+    for result in ranked[:limit]:
+        params = result.params
+        lines.append(
+            f"{params.top:>4} {params.entry:<10}{params.exit:<10}{params.min_volume:>10.3g} "
+            f"{params.min_value:>12.3g} {result.trades:>7} {result.hit_rate:>6.1%} "
+            f"{result.mean_return:>+7.2f} {result.total_return:>+8.2f} {result.max_drawdown:>8.2f}"
+        )
+    if not ranked:
+        lines.append("（売値が記録された取引がありません）")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ランキング銘柄を買う戦略のバックテスト")
+    parser.add_argument("--top", type=int, nargs="+", default=list(DEFAULT_TOPS), help="上位 N 銘柄")
+    parser.add_argument("--entry", nargs="+", choices=SLOTS, default=list(SLOTS))
+    parser.add_argument("--exit", nargs="+", choices=EXITS, default=list(EXITS))
+    parser.add_argument("--min-volume", type=float, nargs="+", default=[0.0], help="出来高の下限")
+    parser.add_argument("--min-value", type=float, nargs="+", default=[0.0], help="売買代金の下限（円）")
+    parser.add_argument("--processes", type=int, default=1, help="評価を分担するプロセス数")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="mean_return")
+    parser.add_argument("--limit", type=int, default=20, help="表示する組の数")
+    parser.add_argument("--json", action="store_true", help="全組の結果を JSON で出力")
+    parser.add_argument("--bench", action="store_true", help="合成データ（1年 × 300銘柄）と大きなグリッドで計測")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if args.bench:
+        panel = synthetic_panel()
+        grid = expand_grid(
+            tops=range(1, 51),
+            min_volumes=[0.0, 1e5, 3e5, 1e6, 3e6],
+            min_values=[0.0, 1e8, 1e9, 3e9, 1e10],
+        )
+    else:
+        panel = load_panel()
+        grid = expand_grid(args.top, args.entry, args.exit, args.min_volume, args.min_value)
+    if not panel.dates:
+        raise SystemExit("ランキングのスナップショットがありません")
+
+    started = time.perf_counter()
+    results = run_grid(panel, grid, args.processes)
+    logger.info(
+        "%d 組を評価しました（%d 日 × %d 銘柄、%.3f 秒）",
+        len(results),
+        len(panel.dates),
+        len(panel.codes),
+        time.perf_counter() - started,
+    )
+    if args.json:
+        print(json.dumps([result.to_dict() for result in results], ensure_ascii=False, indent=2))
+        return
+    print(format_results(results, args.sort, args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+ランキング変更ストリーム（Server-Sent Events）
+
+スクレイパーが新しいランキングを解析した直後に前回との差分（新規ランクイン・圏外・
+順位変動・価格/騰落率の変化）を小さなイベントにまとめ、購読中のクライアントへ
+SSE で即時配信します。常駐スケジューラ（``scheduler.py --stream-port``）で有効になります。
+
+クライアントごとに上限付きバッファ（``CHANGE_STREAM_CLIENT_BUFFER``）を持ち、
+読み出しが遅いクライアントは古いイベントから破棄されます（``overflow`` イベントで通知）。
+他のクライアントや配信元が遅いクライアントに引きずられることはありません。
+
+使い方:
+    curl -N "http://127.0.0.1:8766/events?target=morning"
+
+イベント例（``event: diff``）:
+    {"id": 3, "target": "morning", "key": "20251104_0920",
+     "new": [{"key": "285A", "name": "キオクシアホールディングス", "rank": 4}],
+     "out": ["7203"], "moved": [{"key": "9984", "from": 3, "to": 1}],
+     "changed": [{"key": "9984", "from": "10,000", "to": "10,100"}]}
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, FrozenSet, List, Mapping, Optional, Sequence, Set
+from urllib.parse import parse_qs, urlsplit
+
+from config import (
+    CHANGE_STREAM_CLIENT_BUFFER,
+    CHANGE_STREAM_HEARTBEAT,
+    CHANGE_STREAM_HISTORY,
+    CHANGE_STREAM_PORT,
+)
+
+logger = logging.getLogger(__name__)
+
+Row = Mapping[str, Any]
+Event = Dict[str, Any]
+
+
+def _row_key(row: Row) -> str:
+    return str(row.get("code") or row.get("sector") or "")
+
+
+def _rank(row: Row) -> Optional[int]:
+    try:
+        return int(str(row.get("rank", "")).strip())
+    except ValueError:
+        return None
+
+
+def diff_rankings(
+    previous: Optional[Sequence[Row]], current: Sequence[Row]
+) -> Dict[str, List[Any]]:
+    """
+    前回と今回のランキングの差分を返す。
+
+    銘柄は ``code``、業種は ``sector`` をキーに照合し、値の変化は銘柄なら ``price``、
+    業種なら前日比（``change``）を比較する。
+
+    Examples:
+        >>> diff_rankings(
+        ...     [{"rank": "1", "code": "1111", "price": "100"}, {"rank": "2", "code": "2222"}],
+        ...     [{"rank": "1", "code": "2222"}, {"rank": "2", "code": "3333", "name": "新"}],
+        ... )["moved"]
+        [{'key': '2222', 'from': 2, 'to': 1}]
+    """
+    before = {_row_key(row): row for row in previous or () if _row_key(row)}
+    new: List[Dict[str, Any]] = []
+    moved: List[Dict[str, Any]] = []
+    changed: List[Dict[str, Any]] = []
+    seen: Set[str] = set()
+
+    for row in current:
+        key = _row_key(row)
+        if not key:
+            continue
+        seen.add(key)
+        old = before.get(key)
+        if old is None:
+            new.append({"key": key, "name": row.get("name", ""), "rank": _rank(row)})
+            continue
+        old_rank, new_rank = _rank(old), _rank(row)
+        if old_rank != new_rank:
+            moved.append({"key": key, "from": old_rank, "to": new_rank})
+        field = "price" if "code" in row else "change"
+        if old.get(field) != row.get(field):
+            changed.append({"key": key, "from": old.get(field), "to": row.get(field)})
+
+    out = [key for key in before if key not in seen]
+    return {"new": new, "out": out, "moved": moved, "changed": changed}
+
+
+class Subscription:
+    """クライアント1件分の上限付きイベントバッファ。"""
+
+    def __init__(self, targets: Optional[FrozenSet[str]], size: int) -> None:
+        self.targets = targets
+        self._events: Deque[Event] = deque(maxlen=size)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, event: Event) -> None:
+        if self.targets is not None and event.get("target") not in self.targets:
+            return
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout: float) -> List[Event]:
+        """イベントが届くまで最大 ``timeout`` 秒待ち、溜まっている分をすべて返す。"""
+
+        with self._condition:
+            if not self._events:
+                self._condition.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            if self.dropped:
+                events.insert(0, {"type": "overflow", "dropped": self.dropped})
+                self.dropped = 0
+            return events
+
+
+class EventBroker:
+    """差分イベントを全購読者へ配る。配信元はバッファへの追加だけで戻る。"""
+
+    def __init__(
+        self,
+        client_buffer: int = CHANGE_STREAM_CLIENT_BUFFER,
+        history: int = CHANGE_STREAM_HISTORY,
+    ) -> None:
+        self._client_buffer = client_buffer
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def publish(self, event: Event) -> Event:
+        """イベントに連番 ID を付けて配信する。"""
+
+        with self._lock:
+            event = {"id": next(self._ids), **event}
+            self._history.append(event)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.put(event)
+        return event
+
+    def subscribe(
+        self, targets: Optional[FrozenSet[str]] = None, last_event_id: Optional[int] = None
+    ) -> Subscription:
+        """購読を開始する。``last_event_id`` 以降の直近イベントがあれば先に積む。"""
+
+        subscription = Subscription(targets, self._client_buffer)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event["id"] > last_event_id:
+                        subscription.put(event)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+
+BROKER = EventBroker()
+
+# start_stream_server() で True になる。False の間（GitHub Actions の単発実行など）は
+# 差分計算も行わない
+_streaming = False
+
+# 対象ごとの直近配信時のランキング（次回の差分の基準）
+_last_rows: Dict[str, Sequence[Row]] = {}
+
+
+def _previous_rows(target: str, key: str) -> Optional[Sequence[Row]]:
+    rows = _last_rows.get(target)
+    if rows is not None:
+        return rows
+
+    # 起動直後は保存済みの最新スナップショットを基準にする
+    from snapshot_store import list_snapshots, load_snapshot
+
+    for ref in reversed(list_snapshots(target)):
+        if ref.key < key:
+            data = load_snapshot(ref)
+            return data.get("rankings") if data else None
+    return None
+
+
+def publish_diff(
+    target: str,
+    key: str,
+    current: Sequence[Row],
+    previous: Optional[Sequence[Row]] = None,
+    broker: EventBroker = BROKER,
+    skip_unchanged: bool = False,
+) -> Optional[Event]:
+    """
+    前回との差分を計算して配信する（スクレイパーからの入口）。
+
+    ``previous`` を省略した場合は同じ対象の直近配信分（なければ保存済みの
+    最新スナップショット）と比較する。ストリーム未起動時、および ``skip_unchanged``
+    指定で差分がない場合は何もせず ``None`` を返す。
+    """
+    if not _streaming and broker is BROKER:
+        return None
+
+    if previous is None:
+        previous = _previous_rows(target, key)
+    diff = diff_rankings(previous, current)
+    if skip_unchanged and not any(diff.values()):
+        return None
+    _last_rows[target] = current
+
+    event = broker.publish({"type": "diff", "target": target, "key": key, **diff})
+    logger.info(
+        "差分イベントを配信しました: %s %s (新規 %d / 圏外 %d / 順位変動 %d, 購読 %d)",
+        target,
+        key,
+        len(event["new"]),
+        len(event["out"]),
+        len(event["moved"]),
+        broker.client_count,
+    )
+    return event
+
+
+class ChangeStreamHandler(BaseHTTPRequestHandler):
+    """``GET /events?target=...`` を SSE で配信するハンドラ。"""
+
+    server_version = "StockMarketStream/1.0"
+    broker: EventBroker = BROKER
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/events":
+            self.send_error(404)
+            return
+
+        targets = frozenset(parse_qs(url.query).get("target", [])) or None
+        last_event_id = self.headers.get("Last-Event-ID")
+        subscription = self.broker.subscribe(
+            targets, int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+        )
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "keep-alive")
+            self.end_headers()
+            self.wfile.write(b": connected\n\n")
+            self.wfile.flush()
+
+            while True:
+                events = subscription.get(CHANGE_STREAM_HEARTBEAT)
+                if not events:
+                    self.wfile.write(b": keepalive\n\n")
+                for event in events:
+                    data = json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+                    lines = [f"event: {event.get('type', 'diff')}"]
+                    if "id" in event:
+                        lines.insert(0, f"id: {event['id']}")
+                    lines.append(f"data: {data}")
+                    self.wfile.write(("\n".join(lines) + "\n\n").encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.broker.unsubscribe(subscription)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 親クラスの引数名
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def start_stream_server(
+    port: int = CHANGE_STREAM_PORT, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """SSE サーバーをバックグラウンドで起動し、スクレイパーからの差分配信を有効にする。"""
+
+    global _streaming
+    server = ThreadingHTTPServer((host, port), ChangeStreamHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _streaming = True
+    logger.info("変更ストリームを公開しました: http://%s:%d/events", host, server.server_port)
+    return server
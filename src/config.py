@@ -33,6 +33,41 @@ SECTOR_TIME_SLOTS = {
     "16:00": "close"
 }
 
+# ===========================
+# ライブポーリング設定（scheduler.py --live）
+# ===========================
+
+# 東証の立会時間（JST）。前場・後場でそれぞれ取得するランキング（URLS のキー）
+TSE_SESSIONS = {
+    "morning": ("09:00", "11:30"),
+    "afternoon": ("12:30", "15:30"),
+}
+
+# 取得間隔の計画: (開始, 終了, 間隔秒, 取得対象)。範囲外（昼休み・引け後）は取得しない
+# 寄り付き直後と引け間際は細かく、ザラ場中盤は粗く取得する
+POLL_CADENCE = [
+    ("08:59", "09:05", 5, "morning"),
+    ("09:05", "09:30", 15, "morning"),
+    ("09:30", "11:20", 60, "morning"),
+    ("11:20", "11:31", 15, "morning"),
+    ("12:29", "12:35", 5, "afternoon"),
+    ("12:35", "13:00", 15, "afternoon"),
+    ("13:00", "15:20", 60, "afternoon"),
+    ("15:20", "15:31", 15, "afternoon"),
+]
+
+# 祝日以外の東証休場日（MM-DD）: 年末年始
+MARKET_CLOSED_DAYS = ["12-31", "01-02", "01-03"]
+
+# 前場のみの半日立会日（YYYY-MM-DD）。臨時の短縮取引があれば追加する
+MARKET_HALF_DAYS = []
+
+# ライブ取得の結果を日中ログ（キーフレーム＋デルタ、delta_store.py）へ保存するか
+INTRADAY_STORAGE = True
+
+# 日中ログの保存先（プロジェクトルートからの相対パス）: <対象>/YYYYMMDD.jsonl
+INTRADAY_DATA_DIR = "data/intraday"
+
 # ===========================
 # HTTP設定
 # ===========================
@@ -59,6 +94,47 @@ RETRY_COUNT = 3
 #       要素数が足りない場合は最後の値が使われますが、意図した遅延時間にならない可能性があります
 RETRY_DELAYS = [5, 10, 20]
 
+# ===========================
+# ヘッジリクエスト設定
+# ===========================
+
+# 応答が閾値までに返らない場合、同一リクエストをもう1本送り先着を採用する
+# 環境変数 SCRAPER_HEDGE=1 でも有効化できます
+HEDGE_ENABLED = False
+
+# ヘッジ発火閾値に使うパーセンタイル（ホストごとの直近レイテンシから算出）
+HEDGE_PERCENTILE = 0.95
+
+# パーセンタイル算出に使う直近サンプル数（ホストごと）
+HEDGE_WINDOW_SIZE = 50
+
+# サンプル数がこれ未満の間は HEDGE_DEFAULT_DELAY を閾値として使う
+HEDGE_MIN_SAMPLES = 5
+
+# サンプル不足時のヘッジ発火閾値（秒）
+HEDGE_DEFAULT_DELAY = 3.0
+
+# ヘッジ発火閾値の下限（秒）: 極端に短い閾値で二重送信が常態化するのを防ぐ
+HEDGE_MIN_DELAY = 0.5
+
+# ===========================
+# プリウォーム設定（常駐スケジューラ）
+# ===========================
+
+# スロット時刻の何秒前に DNS 解決・接続確立・パーサ初期化を済ませておくか
+# （長すぎるとサーバ側の keep-alive タイムアウトで確立した接続が切られるため数秒にする）
+PREWARM_SECONDS = 5
+
+# プリウォーム時に解決した DNS 結果の保持時間（秒）
+DNS_CACHE_TTL = 300
+
+# プリウォーム対象（接続を張っておくホストの代表URL）
+PREWARM_URLS = [
+    "https://finance.matsui.co.jp/",
+    "https://www.sbisec.co.jp/",
+    "https://api.line.me/",
+]
+
 # ===========================
 # データ保存設定
 # ===========================
@@ -69,6 +145,91 @@ DATA_DIR = "data"
 # セクター別ランキングデータ保存ディレクトリ
 SECTOR_DATA_DIR = "data/sector"
 
+# スロット実行権（claim）ファイルの保存ディレクトリ。data/ と一緒にコミットされ、
+# チェックアウト後の再実行や並行実行でも同じスロットを二重に取得しない
+SLOT_CLAIM_DIR = "data/claims"
+
+# 実行中（running）の claim を保持できる時間（秒）。ジョブのタイムアウト（15分）で終了して
+# running のまま残った claim は、この時間を過ぎると次の実行が引き継ぐ
+SLOT_CLAIM_LEASE_SECONDS = 1200
+
+# 個別の JSON ファイルのまま残す直近の取引日数（当日＋前取引日）。
+# それより古いものは data_tiering.py で日単位の圧縮アーカイブへ移す（一度書いたアーカイブは書き換えない）
+HOT_TRADING_DAYS = 2
+
+# 日単位アーカイブ（<対象>/YYYYMMDD.zip。同じ日の追加分は YYYYMMDD-2.zip）と索引（index.json）の保存ディレクトリ
+ARCHIVE_DIR = "data/archive"
+
+# スナップショットの保存形式: "json"（既定）/ "zstd"（辞書付き zstd 圧縮、zstandard が必要）
+# 環境変数 SNAPSHOT_CODEC=zstd で上書き可能。zstd の場合は *.json.zst で保存し、
+# アーカイブにも圧縮済みのまま格納する。読み込みは設定に関係なく両形式に対応
+SNAPSHOT_CODEC = "json"
+
+# zstd 辞書の保存ディレクトリ（プロジェクトルートからの相対パス）と書き込みに使う版
+# 辞書は snapshot_codec.py train で data/ から学習し、版ごとに snapshot_v<版>.zdict としてコミットする
+ZSTD_DICT_DIR = "dicts"
+ZSTD_DICT_VERSION = 1
+
+# zstd の圧縮レベル（スナップショットは小さいため高レベルでも数ミリ秒）
+ZSTD_LEVEL = 19
+
+# ===========================
+# 読み取り API 設定
+# ===========================
+
+# スナップショット読み取り API（src/read_api.py）の待ち受けアドレス・ポート
+READ_API_HOST = "127.0.0.1"
+READ_API_PORT = 8765
+
+# メモリに保持するレスポンス（JSON 本文と gzip 済み本文）の最大件数
+READ_API_CACHE_SIZE = 256
+
+# 範囲検索で1回に返す最大件数
+READ_API_MAX_RANGE = 500
+
+# ===========================
+# 変更ストリーム（SSE）設定
+# ===========================
+
+# ランキング差分の Server-Sent Events 配信（scheduler.py --stream-port）の既定ポート
+CHANGE_STREAM_PORT = 8766
+
+# クライアントごとの未送信イベント上限（超えた分は古いものから破棄し overflow を通知）
+CHANGE_STREAM_CLIENT_BUFFER = 100
+
+# Last-Event-ID による再接続時の再送用に保持する直近イベント数
+CHANGE_STREAM_HISTORY = 50
+
+# 無通信時に送るキープアライブの間隔（秒）
+CHANGE_STREAM_HEARTBEAT = 15
+
+# ===========================
+# スロット遅延 SLO 設定
+# ===========================
+
+# 予定スロット時刻からスナップショット取得までの許容遅延（秒）
+SLOT_LAG_SLO_SECONDS = 600
+
+# スロット個別の SLO（秒）。キーは "対象 HH:MM"（例: "morning 09:20"）
+SLOT_LAG_SLO_OVERRIDES = {}
+
+# p50 / p95 / max の算出に使う直近サンプル数（スロットごと）
+SLOT_LAG_WINDOW = 20
+
+# ===========================
+# プロファイリング設定
+# ===========================
+
+# プロファイル出力ディレクトリ（プロジェクトルートからの相対パス）
+# 環境変数 SCRAPER_PROFILE=cpu,mem または --profile 指定時のみ出力されます
+PROFILE_DIR = "profiles"
+
+# フレームグラフ用スタックサンプリング間隔（秒）
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+# pstats / tracemalloc レポートに出力する上位件数
+PROFILE_TOP_N = 30
+
 # ===========================
 # LINE 通知設定
 # ===========================
@@ -77,5 +238,159 @@ SECTOR_DATA_DIR = "data/sector"
 # 注意: LINE Notifyは2025年3月31日にサービス終了
 LINE_MESSAGING_API_PUSH = "https://api.line.me/v2/bot/message/push"
 
+# LINE Messaging API エンドポイント (multicast: 同一メッセージを複数ユーザーへ)
+LINE_MESSAGING_API_MULTICAST = "https://api.line.me/v2/bot/message/multicast"
+
+# multicast 1回あたりの最大宛先数（LINE の上限）
+LINE_MULTICAST_LIMIT = 500
+
+# ===========================
+# ウォッチリスト（購読者別通知）設定
+# ===========================
+
+# 購読者定義ファイル（プロジェクトルートからの相対パス）
+# LINE ユーザーIDを含むためリポジトリには含めない。環境変数 SCRAPER_SUBSCRIPTIONS で上書き可能
+# ファイルがない場合は従来どおり LINE_TARGET_USER_ID へ全文を通知する
+SUBSCRIPTIONS_FILE = "subscriptions.json"
+
+# 購読者向け通知に含める全体サマリーの上位件数
+SUBSCRIPTION_SUMMARY_TOP = 3
+
+# ===========================
+# アラートルール設定
+# ===========================
+
+# アラートルール定義ファイル（プロジェクトルートからの相対パス）
+# 環境変数 SCRAPER_ALERT_RULES で上書き可能。ファイルがない場合はルール評価を行わない
+ALERT_RULES_FILE = "alert_rules.json"
+
+# ルール評価用の前回状態（対象ごとの直近スナップショットの順位履歴）
+ALERT_STATE_FILE = "data/alert_state.json"
+
+# 状態として保持する直近スナップショット数（連続ランクイン判定の上限）
+ALERT_STATE_DEPTH = 10
+
+# ===========================
+# 通知チャネル設定
+# ===========================
+
+# 通知を配信するチャネル（環境変数 NOTIFY_CHANNELS=line,webhook,email,file で上書き可能）
+#   line    : LINE Messaging API（LINE_CHANNEL_ACCESS_TOKEN / LINE_TARGET_USER_ID）
+#   webhook : Slack / Discord 等の Incoming Webhook（NOTIFY_WEBHOOK_URL / NOTIFY_WEBHOOK_FORMAT）
+#   email   : SMTP メール（NOTIFY_SMTP_HOST / NOTIFY_SMTP_PORT / NOTIFY_SMTP_USER /
+#             NOTIFY_SMTP_PASSWORD / NOTIFY_EMAIL_FROM / NOTIFY_EMAIL_TO）
+#   file    : ローカルファイルへの JSON Lines 追記（動作確認用、NOTIFY_FILE_SINK）
+NOTIFY_CHANNELS = ["line"]
+
+# チャネルごとの送信タイムアウト（秒）: 超えたものは失敗として再送待ちにする
+# LINE は notify_line.py 内のリトライ待ちを含むため長めに設定
+NOTIFY_CHANNEL_TIMEOUTS = {
+    "line": 60,
+    "webhook": 10,
+    "email": 20,
+    "file": 5,
+}
+
+# file チャネルの既定出力先（プロジェクトルートからの相対パス）
+NOTIFY_FILE_SINK = "notifications.jsonl"
+
+# ===========================
+# 通知アウトボックス設定
+# ===========================
+
+# 未送信通知を保持する SQLite ファイル（プロジェクトルートからの相対パス）
+# リポジトリには含めず、GitHub Actions では Actions のキャッシュで実行間に引き継ぐ
+OUTBOX_DB = "data/outbox.sqlite3"
+
+# 1通あたりの最大送信試行回数（超えたものは dead として残し再送しない）
+OUTBOX_MAX_ATTEMPTS = 8
+
+# 送信失敗後の再送待ち時間（秒）: 試行回数に応じて使用、範囲外は最後の値
+OUTBOX_RETRY_BACKOFF = [60, 300, 900, 3600]
+
+# 送信中（sending）として確保する時間（秒）: 送信プロセスが落ちた場合はこの後に再送対象へ戻る
+OUTBOX_LEASE_SECONDS = 120
+
+# 同時に送信する通知数（チャネルをまたいで並列に送るため、遅いチャネルが他を待たせない）
+OUTBOX_CONCURRENCY = 8
+
+# タイムアウト後も応答待ちのまま残せる送信スレッド数。超えている間は新しい送信を始めず、次回の送信処理に回す
+OUTBOX_MAX_ABANDONED = 16
+
+# 常駐スケジューラでの送信ループ間隔（秒）
+OUTBOX_POLL_SECONDS = 15
+
+# ===========================
+# ジョブキュー設定
+# ===========================
+
+# スロット実行ジョブを保持する SQLite ファイル（プロジェクトルートからの相対パス）
+# 複数ノードで共有する場合は POSIX ロックが機能する共有ストレージに置く
+JOB_QUEUE_DB = "data/jobs.sqlite3"
+
+# 1ジョブあたりの最大実行回数（超えたものは dead として残す）
+JOB_MAX_ATTEMPTS = 3
+
+# 失敗後の再実行待ち時間（秒）: 実行回数に応じて使用、範囲外は最後の値
+JOB_RETRY_BACKOFF = [30, 120]
+
+# 実行中（running）として確保する時間（秒）: ワーカーが落ちた場合はこの後に再実行対象へ戻る
+JOB_LEASE_SECONDS = 600
+
+# ワーカーが空のキューを確認する間隔（秒）
+JOB_POLL_SECONDS = 2
+
+# job_queue.py worker の既定プロセス数
+JOB_WORKERS = 2
+
+# ===========================
+# 取得パイプライン設定（pipeline.py）
+# ===========================
+
+# 複数スロットをまとめて実行する場合の同時取得数（同一セッションの接続プールを共有）
+PIPELINE_FETCH_WORKERS = 4
+
+# ===========================
+# データのコミット設定（git_batch.py）
+# ===========================
+
+# 常駐スケジューラでデータをまとめてコミット・push する間隔（秒）
+# push 回数は取得間隔に関係なく「稼働時間 / この間隔 + 停止時の1回」以下に収まる
+GIT_BATCH_INTERVAL_SECONDS = 600
+
+# コミット対象（プロジェクトルートからの相対パス）
+GIT_BATCH_PATHS = ["data"]
+
+# push 先のリモート（ブランチは現在のブランチ）
+GIT_BATCH_REMOTE = "origin"
+
+# push が先行コミットで拒否された（non-fast-forward）場合に取り込み直して再試行する回数
+GIT_PUSH_RETRIES = 3
+
+# ===========================
+# 銘柄マスタ設定（symbol_master.py）
+# ===========================
+
+# 銘柄マスタのキャッシュ（pickle）。取得結果と CSV から作り直せるためリポジトリには含めない
+# （GitHub Actions では actions/cache で実行間に引き継ぐ）
+SYMBOL_MASTER_FILE = "data/symbol_master.pickle"
+
+# 一括取り込み用の CSV。コード・銘柄名・市場区分・33業種区分を含むもの。33業種区分の唯一の取得元のため、
+# 業種動向の付与（sector_attribution.py）を使う場合はリポジトリにコミットしておく
+# （JPX の上場銘柄一覧を CSV に変換したものをそのまま使える）。更新されると次回の読み込みで取り込み直す
+SYMBOL_MASTER_CSV = "data/symbols.csv"
+
+# 銘柄マスタの有効期間（日）: 取り込みから経過したら CSV を取り込み直し、
+# 取得結果で確認した銘柄は確認日時を更新する
+SYMBOL_MASTER_TTL_DAYS = 7
+
+# ===========================
+# 業種動向の付与設定（sector_attribution.py）
+# ===========================
+
+# ランキングの銘柄に業種別ランキング（騰落率・順位）を付けるとき、この秒数以内に取得・解析した
+# 業種別ランキングは取得し直さずに使う（同じスロットの対象どうしは経過時間にかかわらず共有する）
+SECTOR_ATTRIBUTION_MAX_AGE_SECONDS = 300
+
 # 廃止予定: LINE Notify API (2025年3月31日終了)
 # LINE_NOTIFY_API = "https://notify-api.line.me/api/notify"
@@ -0,0 +1,277 @@
+"""
+データディレクトリのホット / コールド階層化と保持
+
+直近 ``HOT_TRADING_DAYS`` 取引日（当日＋前取引日）のスナップショットは個別の JSON ファイル
+（ホット）のまま残し、それより古いものを対象・日ごとの圧縮アーカイブ
+``data/archive/<対象>/YYYYMMDD.zip``（コールド）へ移して元のファイルを削除します。
+アーカイブの中身は ``data/archive/index.json`` に記録し、読み込み側（snapshot_store.py）は
+索引とホットのディレクトリから一覧を作るため、どちらの階層にあっても同じように読めます。
+
+アーカイブは一度書いたら書き換えません（data/ は git にコミットされるため、既存の zip を
+書き直すと実行のたびに zip 全体が履歴に積み上がる）。同じ日のファイルが後から見つかった場合は
+``YYYYMMDD-2.zip`` のように別のアーカイブへ書きます。以前の月単位のアーカイブ（``YYYYMM.zip``）も
+索引に載っていればそのまま読めます。
+
+対象:
+    morning / afternoon / sector          スナップショット（snapshot_store.SNAPSHOT_SOURCES）
+    <対象>/reports                         実行レポート（run_report_*.json）
+    intraday/<対象>                        日中ログ（delta_store.py）
+    data/claims/YYYYMMDD                   スロット実行権（アーカイブせず削除）
+
+アーカイブは一時ファイルに書いてから置き換え、索引を更新した後に元のファイルを削除します。
+途中で中断しても、ホットとコールドの両方に残ったファイルはホットが優先され、
+次回の実行では索引に載っているものはアーカイブ側を残して削除されます。
+
+使い方:
+    python data_tiering.py                       # 今日を基準に階層化
+    python data_tiering.py --dry-run             # 移す件数だけ表示
+    python data_tiering.py --today 2025-11-10
+    python data_tiering.py --rebuild-index       # アーカイブから索引を作り直す
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import shutil
+import zipfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import snapshot_store
+from check_workday import is_trading_day
+from config import HOT_TRADING_DAYS
+from delta_store import INTRADAY_ROOT
+from metrics import REPORT_PREFIX
+from slot_claim import CLAIM_ROOT
+from snapshot_codec import encode_member
+from snapshot_store import SNAPSHOT_SOURCES, archive_path, snapshot_key
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+INDEX_VERSION = 1
+
+# ホットの開始日を探す最大日数（年末年始の連休を考慮）
+MAX_LOOKBACK_DAYS = 14
+
+Index = Dict[str, Dict[str, List[str]]]
+
+
+def tier_sources() -> Dict[str, Tuple[Path, str]]:
+    """階層化の対象（アーカイブ名 → (ディレクトリ, ファイル名 glob)）を返す。"""
+
+    sources = dict(SNAPSHOT_SOURCES)
+    for name, (directory, _) in SNAPSHOT_SOURCES.items():
+        sources[f"{name}/reports"] = (directory, f"{REPORT_PREFIX}*.json")
+    if INTRADAY_ROOT.exists():
+        for directory in sorted(path for path in INTRADAY_ROOT.iterdir() if path.is_dir()):
+            sources[f"intraday/{directory.name}"] = (directory, "*.jsonl")
+    return sources
+
+
+def hot_since(today: datetime.date, days: int = HOT_TRADING_DAYS) -> datetime.date:
+    """
+    ホットに残す最初の日付（``today`` 以前の直近 ``days`` 取引日の最初の日）を返す。
+
+    Examples:
+        >>> hot_since(datetime.date(2025, 11, 10))  # 月曜 → 前取引日は金曜
+        datetime.date(2025, 11, 7)
+        >>> hot_since(datetime.date(2025, 11, 9))   # 日曜 → 木・金
+        datetime.date(2025, 11, 6)
+    """
+    day = today
+    found = 0
+    for _ in range(MAX_LOOKBACK_DAYS):
+        if is_trading_day(day):
+            found += 1
+            if found == days:
+                return day
+        day -= datetime.timedelta(days=1)
+    return day
+
+
+def _file_date(path: Path) -> Optional[datetime.date]:
+    try:
+        return datetime.datetime.strptime(snapshot_key(path)[:8], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def _zip_info(name: str) -> zipfile.ZipInfo:
+    # 内容が同じならアーカイブも同じバイト列になるよう、時刻はファイル名のキーから決める
+    key = snapshot_key(Path(name))
+    try:
+        stamp = datetime.datetime.strptime(key, "%Y%m%d_%H%M")
+    except ValueError:
+        stamp = datetime.datetime.strptime(key[:8], "%Y%m%d")
+    info = zipfile.ZipInfo(name, date_time=stamp.timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _new_part(name: str, day: str, parts: Dict[str, List[str]]) -> str:
+    """まだ使われていないアーカイブ名（``YYYYMMDD``、使用済みなら ``YYYYMMDD-2`` ...）を返す。"""
+
+    part, number = day, 1
+    while part in parts or archive_path(name, part).exists():
+        number += 1
+        part = f"{day}-{number}"
+    return part
+
+
+def _write_archive(archive: Path, paths: List[Path], archived: Set[str]) -> List[str]:
+    """
+    アーカイブ済み（``archived``）でないファイルを新しいアーカイブに書き、格納したファイル名一覧を返す。
+
+    既存のアーカイブは書き換えない。格納するものがなければアーカイブを作らず空のリストを返す。
+    """
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = archive.with_suffix(".zip.tmp")
+    names = []
+    with zipfile.ZipFile(temp_path, "w", compresslevel=9) as bundle:
+        for path in sorted(paths):
+            # zstd 有効時は JSON も辞書付きで圧縮し、圧縮済みの内容はそのまま格納する
+            name, data, compressed = encode_member(path.name, path.read_bytes())
+            if name in archived:
+                logger.info("アーカイブ済みのためアーカイブ側を残します: %s", path)
+                continue
+            info = _zip_info(name)
+            if compressed:
+                info.compress_type = zipfile.ZIP_STORED
+            bundle.writestr(info, data)
+            names.append(name)
+    if not names:
+        temp_path.unlink()
+        return []
+    os.replace(temp_path, archive)
+    return sorted(names)
+
+
+def write_index(index: Index) -> None:
+    """索引を一時ファイル経由で書き込む。"""
+
+    path = snapshot_store.ARCHIVE_INDEX
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    with temp_path.open("w", encoding="utf-8") as file:
+        json.dump(
+            {"version": INDEX_VERSION, "targets": index},
+            file,
+            ensure_ascii=False,
+            indent=2,
+            sort_keys=True,
+        )
+        file.write("\n")
+    os.replace(temp_path, path)
+
+
+def rebuild_index() -> Index:
+    """アーカイブの中身から索引を作り直す。"""
+
+    index: Index = defaultdict(dict)
+    root = snapshot_store.ARCHIVE_ROOT
+    for archive in sorted(root.rglob("*.zip")) if root.exists() else []:
+        name = archive.parent.relative_to(root).as_posix()
+        with zipfile.ZipFile(archive) as bundle:
+            index[name][archive.stem] = sorted(bundle.namelist())
+    write_index(dict(index))
+    return dict(index)
+
+
+def prune_claims(cutoff: datetime.date, dry_run: bool = False) -> int:
+    """``cutoff`` より前のスロット実行権ディレクトリを削除し、件数を返す。"""
+
+    removed = 0
+    for directory in sorted(CLAIM_ROOT.iterdir()) if CLAIM_ROOT.exists() else []:
+        try:
+            date = datetime.datetime.strptime(directory.name, "%Y%m%d").date()
+        except ValueError:
+            continue
+        if date < cutoff:
+            removed += 1
+            if not dry_run:
+                shutil.rmtree(directory)
+    return removed
+
+
+def roll(today: Optional[datetime.date] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    ホットの期間より古いファイルを日単位のアーカイブへ移す（既存のアーカイブは書き換えない）。
+
+    Returns:
+        Dict[str, int]: アーカイブ名 → 移したファイル数（``claims`` は削除した日数）
+    """
+    today = today or datetime.datetime.now(JST).date()
+    cutoff = hot_since(today)
+    logger.info("ホットの期間: %s 以降（それより前をアーカイブします）", cutoff)
+
+    index: Index = {
+        name: dict(parts) for name, parts in snapshot_store.load_archive_index().items()
+    }
+    moved: Dict[str, int] = {}
+    archived: List[Path] = []
+    for name, (directory, pattern) in tier_sources().items():
+        by_day: Dict[str, List[Path]] = defaultdict(list)
+        for path in directory.glob(pattern) if directory.exists() else []:
+            date = _file_date(path)
+            if date is not None and date < cutoff:
+                by_day[date.strftime("%Y%m%d")].append(path)
+        if not by_day:
+            continue
+        moved[name] = sum(len(paths) for paths in by_day.values())
+        if dry_run:
+            continue
+        parts = index.setdefault(name, {})
+        members = {member for names in parts.values() for member in names}
+        for day, paths in sorted(by_day.items()):
+            part = _new_part(name, day, parts)
+            names = _write_archive(archive_path(name, part), paths, members)
+            if names:
+                parts[part] = names
+            archived.extend(paths)
+        logger.info("アーカイブしました: %s %d 件", name, moved[name])
+
+    if archived:
+        # 索引を更新してから削除する（中断してもファイルが見えなくなることはない）
+        write_index(index)
+        for path in archived:
+            path.unlink()
+
+    claims = prune_claims(cutoff, dry_run)
+    if claims:
+        moved["claims"] = claims
+    return moved
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="データディレクトリのホット / コールド階層化")
+    parser.add_argument("--today", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="移す件数を表示するだけで変更しない")
+    parser.add_argument("--rebuild-index", action="store_true", help="アーカイブから索引を作り直す")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if args.rebuild_index:
+        index = rebuild_index()
+        print(f"索引を作り直しました: {sum(len(m) for parts in index.values() for m in parts.values())} 件")
+        return
+
+    moved = roll(args.today, args.dry_run)
+    if not moved:
+        print("アーカイブ対象はありません")
+    for name, count in moved.items():
+        print(f"{name:<24} {count:>5} {'（未実行）' if args.dry_run else ''}")
+
+
+if __name__ == "__main__":
+    main()
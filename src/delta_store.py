@@ -0,0 +1,339 @@
+"""
+日中スナップショットの差分保存（キーフレーム＋デルタ）
+
+ライブ取得（``scheduler.py --live``）のように数秒〜数分おきに取得するランキングは、
+連続するスナップショットの銘柄・名称・URL がほとんど変わりません。そこで対象・日ごとに
+1つの JSON Lines ファイルへ、その日最初の1件だけを全体（キーフレーム）で書き、
+以降は前回から変わった行・項目だけ（デルタ）を1行ずつ追記します。
+追記のみのため、git の差分も追加された行だけになります。
+
+ファイル: ``data/intraday/<対象>/YYYYMMDD.jsonl``
+    {"type": "key", "key": "20251104_090000", "data": {...スナップショット全体...}}
+    {"type": "delta", "key": "20251104_090005", "meta": {"datetime": ..., "scraped_at": ...},
+     "rows": {"9984": {"price": "10,100"}}, "order": ["9984", "285A", ...],
+     "removed": {"rows": {"9984": ["volume"]}}}
+
+デルタの各項目:
+    meta     ``rankings`` 以外で変わった最上位の項目
+    rows     行キー（銘柄コード / 業種名）ごとの変わった項目。新規の行は全項目
+    order    行の並び（順位の入れ替え・ランクイン / 圏外があった場合のみ）
+    removed  なくなった項目名（``meta`` は一覧、``rows`` は行キーごとの一覧）。
+             値の ``null`` は削除ではなくそのまま ``null`` として復元する
+
+任意のスナップショットはキーフレームからデルタを順に適用して復元できます。
+行キーが空・重複している場合はデルタにできないため、その時点でキーフレームを書きます。
+
+使い方:
+    python delta_store.py show morning 2025-11-04                     # 保存件数と最終キー
+    python delta_store.py show morning 2025-11-04 --at 20251104_093000 # 復元して表示
+    python delta_store.py compare morning 2025-11-04                  # 全体保存との容量比較
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import datetime
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from config import INTRADAY_DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+BASE_DIR = Path(__file__).resolve().parent.parent
+INTRADAY_ROOT = BASE_DIR / INTRADAY_DATA_DIR
+
+Snapshot = Dict[str, Any]
+Record = Dict[str, Any]
+
+# 比較用: 通常の保存（save_to_json）と同じ書式
+FULL_JSON_INDENT = 2
+
+
+def _row_key(row: Dict[str, Any]) -> str:
+    return str(row.get("code") or row.get("sector") or "")
+
+
+def _row_keys(rows: List[Dict[str, Any]]) -> Optional[List[str]]:
+    """行キーの並びを返す。空・重複がありデルタにできない場合は None。"""
+
+    keys = [_row_key(row) for row in rows]
+    if "" in keys or len(set(keys)) != len(keys):
+        return None
+    return keys
+
+
+def _changed_fields(
+    old: Dict[str, Any], new: Dict[str, Any]
+) -> Tuple[Dict[str, Any], List[str]]:
+    """(変わった・増えた項目, なくなった項目名) を返す。"""
+
+    changes = {name: value for name, value in new.items() if name not in old or old[name] != value}
+    removed = [name for name in old if name not in new]
+    return changes, removed
+
+
+def encode_delta(previous: Snapshot, current: Snapshot, key: str) -> Optional[Record]:
+    """
+    ``previous`` から ``current`` へのデルタを返す。デルタにできない場合は None。
+
+    Examples:
+        >>> before = {"url": "u", "rankings": [{"rank": "1", "code": "1111", "price": "100"},
+        ...                                     {"rank": "2", "code": "2222", "price": "50"}]}
+        >>> after = {"url": "u", "rankings": [{"rank": "1", "code": "2222", "price": "55"},
+        ...                                    {"rank": "2", "code": "1111", "price": "100"}]}
+        >>> delta = encode_delta(before, after, "k")
+        >>> delta["rows"], delta["order"]
+        ({'2222': {'rank': '1', 'price': '55'}, '1111': {'rank': '2'}}, ['2222', '1111'])
+        >>> apply_delta(before, delta) == after
+        True
+
+        値の ``None`` と項目の削除は区別して復元する。
+
+        >>> nulled = {"url": None, "rankings": [{"code": "1111", "price": None}]}
+        >>> delta = encode_delta({"url": "u", "rankings": [{"code": "1111", "price": "1", "x": 1}]}, nulled, "k")
+        >>> delta["meta"], delta["rows"], delta["removed"]
+        ({'url': None}, {'1111': {'price': None}}, {'rows': {'1111': ['x']}})
+        >>> apply_delta({"url": "u", "rankings": [{"code": "1111", "price": "1", "x": 1}]}, delta) == nulled
+        True
+    """
+    previous_rows = previous.get("rankings") or []
+    current_rows = current.get("rankings") or []
+    previous_keys = _row_keys(previous_rows)
+    current_keys = _row_keys(current_rows)
+    if previous_keys is None or current_keys is None:
+        return None
+
+    meta, meta_removed = _changed_fields(
+        {name: value for name, value in previous.items() if name != "rankings"},
+        {name: value for name, value in current.items() if name != "rankings"},
+    )
+    before = dict(zip(previous_keys, previous_rows))
+    rows: Dict[str, Dict[str, Any]] = {}
+    rows_removed: Dict[str, List[str]] = {}
+    for row_key, row in zip(current_keys, current_rows):
+        changes, removed = _changed_fields(before.get(row_key, {}), row)
+        if changes:
+            rows[row_key] = changes
+        if removed:
+            rows_removed[row_key] = removed
+
+    delta: Record = {"type": "delta", "key": key}
+    if meta:
+        delta["meta"] = meta
+    if rows:
+        delta["rows"] = rows
+    if current_keys != previous_keys:
+        delta["order"] = current_keys
+    removed_fields: Dict[str, Any] = {}
+    if meta_removed:
+        removed_fields["meta"] = meta_removed
+    if rows_removed:
+        removed_fields["rows"] = rows_removed
+    if removed_fields:
+        delta["removed"] = removed_fields
+    return delta
+
+
+def _apply_fields(
+    base: Dict[str, Any], changes: Dict[str, Any], removed: Iterable[str] = ()
+) -> Dict[str, Any]:
+    merged = dict(base)
+    for name in removed:
+        merged.pop(name, None)
+    merged.update(changes)
+    return merged
+
+
+def apply_delta(previous: Snapshot, delta: Record) -> Snapshot:
+    """``previous`` にデルタを適用したスナップショットを返す（``previous`` は変更しない）。"""
+
+    previous_rows = previous.get("rankings") or []
+    before = {_row_key(row): row for row in previous_rows}
+    order = delta["order"] if "order" in delta else [_row_key(row) for row in previous_rows]
+    changes = delta.get("rows", {})
+    removed = delta.get("removed", {})
+    rows_removed = removed.get("rows", {})
+
+    snapshot = _apply_fields(
+        {name: value for name, value in previous.items() if name != "rankings"},
+        delta.get("meta", {}),
+        removed.get("meta", ()),
+    )
+    snapshot["rankings"] = [
+        _apply_fields(
+            before.get(row_key, {}), changes.get(row_key, {}), rows_removed.get(row_key, ())
+        )
+        for row_key in order
+    ]
+    return snapshot
+
+
+def log_path(target: str, date: datetime.date, root: Optional[Path] = None) -> Path:
+    """
+    日中ログのパスを返す。
+
+    Examples:
+        >>> log_path("morning", datetime.date(2025, 11, 4), Path("intraday")).as_posix()
+        'intraday/morning/20251104.jsonl'
+    """
+    root = INTRADAY_ROOT if root is None else root
+    return root / target / f"{date.strftime('%Y%m%d')}.jsonl"
+
+
+def _replay_lines(lines: Iterable[str], source: str) -> Iterator[Tuple[str, Snapshot]]:
+    current: Optional[Snapshot] = None
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # 書き込み途中で止まった末尾行は読み飛ばす
+            logger.warning("日中ログの壊れた行を読み飛ばしました: %s:%d", source, number)
+            continue
+        if record.get("type") == "key":
+            current = record["data"]
+        elif current is None:
+            logger.warning("キーフレームより前のデルタを読み飛ばしました: %s:%d", source, number)
+            continue
+        else:
+            current = apply_delta(current, record)
+        yield record["key"], current
+
+
+def replay(path: Path) -> Iterator[Tuple[str, Snapshot]]:
+    """ログを先頭から再生し、(キー, 復元したスナップショット) を順に返す。"""
+
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as file:
+        yield from _replay_lines(file, str(path))
+
+
+def replay_day(
+    target: str, date: datetime.date, root: Optional[Path] = None
+) -> Iterator[Tuple[str, Snapshot]]:
+    """指定日のログを再生する。ホットにない日はアーカイブ（data_tiering.py）から読む。"""
+
+    path = log_path(target, date, root)
+    if path.exists() or root is not None:
+        yield from replay(path)
+        return
+
+    from snapshot_store import find_archived, read_archived
+
+    archive = find_archived(f"intraday/{target}", path.name)
+    if archive is None:
+        return
+    try:
+        text = read_archived(archive, path.name).decode("utf-8")
+    except (OSError, KeyError):
+        return
+    yield from _replay_lines(text.splitlines(), f"{archive}!{path.name}")
+
+
+def load_at(target: str, key: str, root: Optional[Path] = None) -> Optional[Snapshot]:
+    """キー（``YYYYMMDD_HHMMSS``）時点のスナップショットを復元する。なければ None。"""
+
+    date = datetime.datetime.strptime(key[:8], "%Y%m%d").date()
+    for record_key, snapshot in replay_day(target, date, root):
+        if record_key == key:
+            return snapshot
+    return None
+
+
+class IntradayStore:
+    """対象・日ごとの日中ログへ追記する。直前の状態はメモリに保持して再生を省く。"""
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        self.root = INTRADAY_ROOT if root is None else root
+        self._last: Dict[str, Tuple[Path, Snapshot]] = {}
+        self._lock = threading.Lock()
+
+    def _previous(self, target: str, path: Path) -> Optional[Snapshot]:
+        last_path, previous = self._last.get(target, (None, None))
+        if last_path != path:
+            previous = None
+        if previous is None and path.exists():
+            # 再起動後は既存ログを再生して直前の状態を復元する
+            for _, previous in replay(path):
+                pass
+        return previous
+
+    def append(self, target: str, key: str, snapshot: Snapshot, date: datetime.date) -> str:
+        """
+        スナップショットを追記し、書いた種類（``"key"`` / ``"delta"``）を返す。
+
+        その日の最初の1件と、デルタにできない場合はキーフレームを書く。
+        """
+        path = log_path(target, date, self.root)
+        with self._lock:
+            previous = self._previous(target, path)
+            record = encode_delta(previous, snapshot, key) if previous is not None else None
+            if record is None:
+                record = {"type": "key", "key": key, "data": snapshot}
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as file:
+                file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            # 他の呼び出し元が snapshot を書き換えても基準がずれないよう複製を保持する
+            self._last[target] = (path, copy.deepcopy(snapshot))
+        return record["type"]
+
+
+STORE = IntradayStore()
+
+
+def compare(path: Path) -> Tuple[int, int, int]:
+    """(件数, ログのバイト数, 同じ内容を1件ずつ通常保存した場合のバイト数) を返す。"""
+
+    count = full_bytes = 0
+    for _, snapshot in replay(path):
+        count += 1
+        full_bytes += len(
+            json.dumps(snapshot, ensure_ascii=False, indent=FULL_JSON_INDENT).encode("utf-8")
+        )
+    return count, path.stat().st_size if path.exists() else 0, full_bytes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日中スナップショット（キーフレーム＋デルタ）の確認")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("show", "compare"):
+        command = subparsers.add_parser(name)
+        command.add_argument("target")
+        command.add_argument("date", type=datetime.date.fromisoformat)
+    subparsers.choices["show"].add_argument("--at", default=None, help="復元するキー（YYYYMMDD_HHMMSS）")
+    args = parser.parse_args()
+
+    path = log_path(args.target, args.date)
+    if args.command == "compare":
+        count, log_bytes, full_bytes = compare(path)
+        if not count:
+            print(f"{path}: 保存なし")
+            return
+        print(
+            f"{path}: {count} 件 / 差分保存 {log_bytes:,} bytes / 全体保存 {full_bytes:,} bytes"
+            f"（{full_bytes / log_bytes:.1f} 倍）"
+        )
+        return
+
+    if args.at:
+        snapshot = load_at(args.target, args.at)
+        if snapshot is None:
+            raise SystemExit(f"{args.at} のスナップショットはありません")
+        print(json.dumps(snapshot, ensure_ascii=False, indent=FULL_JSON_INDENT))
+        return
+
+    keys = [key for key, _ in replay_day(args.target, args.date)]
+    print(f"{path}: {len(keys)} 件" + (f"（{keys[0]} 〜 {keys[-1]}）" if keys else ""))
+
+
+if __name__ == "__main__":
+    main()
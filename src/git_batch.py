@@ -0,0 +1,344 @@
+"""
+データのまとめコミット・push
+
+GitHub Actions ではスロットごとに ``git add data/ && git commit && git push`` を実行しますが、
+常駐スケジューラ（``scheduler.py --git-batch``）でライブ取得まで行うと取得のたびに
+コミットと push（ネットワーク往復）が発生し、別の実行の push とも競合します。
+
+常駐時は保存したファイルを ``record()`` で記録しておき、バックグラウンドスレッドが
+``GIT_BATCH_INTERVAL_SECONDS`` ごとと停止時にだけ ``GIT_BATCH_PATHS`` をまとめてコミットし、
+1回だけ push します。push の回数は取得間隔に関係なく「稼働時間 / 間隔 + 1」以下です。
+
+push が先行コミットで拒否された（non-fast-forward）場合は、リモートを取得して自分の
+コミットを載せ直し（rebase）、``GIT_PUSH_RETRIES`` 回まで再試行します。競合したテキストの状態ファイル
+（JSON など）は自分の内容を優先しますが、バイナリファイルが競合した場合は片方を黙って捨てないよう
+載せ直しを中止します。失敗した場合はコミットをローカルに残し、次回の push でまとめて送ります。
+
+使い方:
+    python git_batch.py flush                     # 変更をコミットして push（GitHub Actions から使用）
+    python git_batch.py selftest                  # 一時的なベアリポジトリで動作確認
+    python git_batch.py selftest --polls 1000 --interval 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import logging
+import math
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+from config import GIT_BATCH_INTERVAL_SECONDS, GIT_BATCH_PATHS, GIT_BATCH_REMOTE, GIT_PUSH_RETRIES
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# git push の出力に含まれる、先行コミットによる拒否を示す文言
+REJECTED_MARKERS = ("non-fast-forward", "fetch first", "[rejected]")
+
+
+class GitError(RuntimeError):
+    """git コマンドの失敗。"""
+
+
+class GitBatcher:
+    """記録されたデータの変更をまとめてコミットし、push する。"""
+
+    def __init__(
+        self,
+        repo: Path = BASE_DIR,
+        remote: str = GIT_BATCH_REMOTE,
+        paths: Sequence[str] = tuple(GIT_BATCH_PATHS),
+        retries: int = GIT_PUSH_RETRIES,
+    ) -> None:
+        self.repo = Path(repo)
+        self.remote = remote
+        self.paths = list(paths)
+        self.retries = retries
+        self.commits = 0
+        self.pushes = 0
+        self.rejections = 0
+        self._pending: List[datetime.datetime] = []
+        # 前回の実行で push できなかったコミットがあり得るため、最初の1回は push する
+        self._unpushed = True
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _git(self, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+        result = subprocess.run(
+            ["git", *args], cwd=self.repo, capture_output=True, text=True, check=False
+        )
+        if check and result.returncode != 0:
+            raise GitError(f"git {' '.join(args)}: {result.stderr.strip() or result.stdout.strip()}")
+        return result
+
+    def record(self, path: object) -> None:
+        """保存したファイルを記録する（コミットは次回の ``flush()`` で行う）。"""
+
+        with self._pending_lock:
+            self._pending.append(datetime.datetime.now(JST))
+        logger.debug("コミット待ちに追加しました: %s", path)
+
+    @property
+    def pending(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+    def commit(self, message: Optional[str] = None) -> bool:
+        """対象パスの変更をステージしてコミットする。変更がなければ False。"""
+
+        with self._pending_lock:
+            recorded, self._pending = self._pending, []
+        self._git("add", "-A", "--", *self.paths)
+        if self._git("diff", "--cached", "--quiet", "--", *self.paths, check=False).returncode == 0:
+            return False
+        if message is None:
+            message = _commit_message(recorded)
+        self._git("commit", "-q", "-m", message, "--", *self.paths)
+        self.commits += 1
+        self._unpushed = True
+        logger.info("データをコミットしました: %s", message)
+        return True
+
+    def _branch(self) -> str:
+        return self._git("rev-parse", "--abbrev-ref", "HEAD").stdout.strip()
+
+    def _rebase_onto_remote(self, branch: str) -> bool:
+        """リモートの先行コミットを取り込み、自分のコミットを載せ直す。"""
+
+        try:
+            self._git("fetch", "-q", self.remote, branch)
+        except GitError as exc:
+            logger.warning("リモートの取得に失敗しました: %s", exc)
+            return False
+        result = self._git("rebase", "-q", "--autostash", "FETCH_HEAD", check=False)
+        while result.returncode != 0:
+            conflicted = self._git("diff", "--name-only", "--diff-filter=U").stdout.split()
+            binary = [path for path in conflicted if self._is_binary(path)]
+            if binary:
+                self._git("rebase", "--abort", check=False)
+                logger.error(
+                    "バイナリファイルが競合したため載せ直しを中止しました（手動で統合してください）: %s",
+                    ", ".join(binary),
+                )
+                return False
+            # rebase では "theirs" が載せ直す側（自分のコミット）。状態ファイルの競合は新しい内容を優先する
+            # （片方で削除されたファイルなど、自分の内容を取り出せない競合は checkout が失敗する）
+            if conflicted:
+                resolved = self._git("checkout", "--theirs", "--", *conflicted, check=False)
+                if resolved.returncode == 0:
+                    self._git("add", "--", *conflicted)
+                    result = self._git("-c", "core.editor=true", "rebase", "--continue", check=False)
+                    continue
+                result = resolved
+            self._git("rebase", "--abort", check=False)
+            logger.error("リモートへの載せ直しに失敗しました: %s", result.stderr.strip())
+            return False
+        return True
+
+    def _is_binary(self, path: str) -> bool:
+        """競合中のファイルがバイナリか（git と同じく先頭 8000 バイトの NUL で判定）。"""
+
+        for stage in (":2:", ":3:"):
+            blob = subprocess.run(
+                ["git", "cat-file", "blob", f"{stage}{path}"], cwd=self.repo, capture_output=True, check=False
+            )
+            if blob.returncode == 0 and b"\0" in blob.stdout[:8000]:
+                return True
+        return False
+
+    def push(self) -> bool:
+        """
+        未 push のコミットを1回の push で送る。拒否された場合は載せ直して再試行する。
+
+        ネットワークエラーなどで送れなかったコミットはローカルに残り、次回の push で送る。
+        """
+        if not self._unpushed:
+            return False
+        branch = self._branch()
+        for attempt in range(self.retries + 1):
+            result = self._git("push", "-q", self.remote, f"HEAD:{branch}", check=False)
+            if result.returncode == 0:
+                self.pushes += 1
+                self._unpushed = False
+                logger.info("push しました: %s %s", self.remote, branch)
+                return True
+            if not any(marker in result.stderr for marker in REJECTED_MARKERS):
+                logger.warning("push に失敗しました（次回再試行）: %s", result.stderr.strip())
+                return False
+            self.rejections += 1
+            if attempt == self.retries:
+                break
+            logger.info("push が拒否されました。リモートを取り込んで再試行します（%d回目）", attempt + 1)
+            if not self._rebase_onto_remote(branch):
+                return False
+        logger.error("push を %d 回再試行しましたが拒否されました（次回再試行）", self.retries)
+        return False
+
+    def flush(self, message: Optional[str] = None) -> bool:
+        """コミット待ちの変更をコミットして push する。push したら True。"""
+
+        with self._flush_lock:
+            try:
+                self.commit(message)
+                return self.push()
+            except GitError as exc:
+                logger.error("データのコミットに失敗しました: %s", exc)
+                return False
+
+
+def _commit_message(recorded: List[datetime.datetime]) -> str:
+    """
+    まとめコミットのメッセージを返す（GitHub Actions のコミットと同じ書式で始める）。
+
+    Examples:
+        >>> at = datetime.datetime(2025, 11, 4, 9, 0, tzinfo=JST)
+        >>> _commit_message([at, at + datetime.timedelta(minutes=10)])
+        'Add ranking data: 2025-11-04 09:00-09:10 (2 snapshots)'
+    """
+    if not recorded:
+        return f"Add ranking data: {datetime.datetime.now(JST):%Y-%m-%d %H:%M}"
+    first, last = min(recorded), max(recorded)
+    return f"Add ranking data: {first:%Y-%m-%d %H:%M}-{last:%H:%M} ({len(recorded)} snapshots)"
+
+
+BATCHER: Optional[GitBatcher] = None
+
+
+def record(path: object) -> None:
+    """まとめコミットが有効な場合（``start_batcher`` 後）に保存したファイルを記録する。"""
+
+    if BATCHER is not None:
+        BATCHER.record(path)
+
+
+def start_batcher(
+    stop: threading.Event,
+    interval: float = GIT_BATCH_INTERVAL_SECONDS,
+    batcher: Optional[GitBatcher] = None,
+) -> threading.Thread:
+    """
+    ``interval`` 秒ごとと停止時にまとめてコミット・push するスレッドを起動する。
+
+    停止時の最後のコミットを待つため、呼び出し側は停止後にスレッドを join する。
+    """
+    global BATCHER
+    BATCHER = batcher or GitBatcher()
+    active = BATCHER
+
+    def _loop() -> None:
+        while not stop.wait(interval):
+            active.flush()
+        active.flush()
+        logger.info(
+            "まとめコミットを終了しました（コミット %d 回 / push %d 回）", active.commits, active.pushes
+        )
+
+    thread = threading.Thread(target=_loop, name="git-batcher", daemon=True)
+    thread.start()
+    logger.info("まとめコミットを開始しました（%.0f秒ごと）", interval)
+    return thread
+
+
+# ===========================
+# ベアリポジトリでの動作確認
+# ===========================
+
+
+def _run(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=repo, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def _init_clone(bare: Path, path: Path) -> Path:
+    _run(bare.parent, "clone", "-q", str(bare), str(path))
+    _run(path, "config", "user.name", "git-batch-selftest")
+    _run(path, "config", "user.email", "git-batch-selftest@localhost")
+    _run(path, "config", "commit.gpgsign", "false")
+    return path
+
+
+def selftest(polls: int, interval: float, duration: float) -> bool:
+    """
+    一時ディレクトリのベアリポジトリを push 先にして、高頻度の保存・競合する push・
+    停止時の最終コミットを再現する。全ファイルが届き、push 回数が上限内なら True。
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        bare = root / "remote.git"
+        _run(root, "init", "-q", "--bare", "-b", "main", str(bare))
+        seed = _init_clone(bare, root / "seed")
+        (seed / "README.md").write_text("selftest\n", encoding="utf-8")
+        _run(seed, "add", "README.md")
+        _run(seed, "commit", "-q", "-m", "init")
+        _run(seed, "push", "-q", "origin", "HEAD:main")
+        work = _init_clone(bare, root / "work")
+        other = _init_clone(bare, root / "other")
+
+        batcher = GitBatcher(repo=work, remote="origin", paths=["data"])
+        stop = threading.Event()
+        thread = start_batcher(stop, interval, batcher)
+        started = time.monotonic()
+        for number in range(polls):
+            path = work / "data" / "live" / f"poll_{number:05d}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f'{{"poll": {number}}}\n', encoding="utf-8")
+            batcher.record(path)
+            if number == polls // 2:
+                # 別の実行（GitHub Actions など）が先に push した状況を作る
+                (other / "data").mkdir(exist_ok=True)
+                (other / "data" / "other.json").write_text("{}\n", encoding="utf-8")
+                _run(other, "add", "data")
+                _run(other, "commit", "-q", "-m", "concurrent run")
+                _run(other, "pull", "-q", "--rebase", "origin", "main")
+                _run(other, "push", "-q", "origin", "HEAD:main")
+            time.sleep(max(0.0, started + duration * (number + 1) / polls - time.monotonic()))
+        stop.set()
+        thread.join()
+        elapsed = time.monotonic() - started
+
+        files = _run(bare, "ls-tree", "-r", "--name-only", "main", "data").split()
+        received = sum(1 for name in files if name.startswith("data/live/"))
+        bound = math.ceil(elapsed / interval) + 1
+        print(f"保存 {polls} 件 / {elapsed:.1f}秒 / 間隔 {interval}秒")
+        print(f"コミット {batcher.commits} 回 / push {batcher.pushes} 回（上限 {bound}）/ 拒否 {batcher.rejections} 回")
+        print(f"リモートに届いたファイル {received} 件 / 競合コミットの保持: {'data/other.json' in files}")
+        return received == polls and "data/other.json" in files and batcher.pushes <= bound
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="データのまとめコミット・push")
+    commands = parser.add_subparsers(dest="command", required=True)
+    flush = commands.add_parser("flush", help="変更をコミットして push する")
+    flush.add_argument("--message", default=None)
+    check = commands.add_parser("selftest", help="一時的なベアリポジトリで動作を確認する")
+    check.add_argument("--polls", type=int, default=300, help="保存するファイル数")
+    check.add_argument("--interval", type=float, default=1.0, help="まとめコミットの間隔（秒）")
+    check.add_argument("--duration", type=float, default=5.0, help="保存を続ける秒数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if args.command == "selftest":
+        return 0 if selftest(args.polls, args.interval, args.duration) else 1
+
+    batcher = GitBatcher()
+    if not batcher.commit(args.message):
+        print("コミットする変更はありません")
+    return 0 if batcher.push() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
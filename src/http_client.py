@@ -0,0 +1,401 @@
+"""
+HTTP取得モジュール
+
+スクレイパー共通のHTTP GET処理（コネクションプール・リトライ・ヘッジリクエスト）を提供します。
+
+常駐スケジューラからは ``prewarm()`` でスロット直前に DNS 解決と接続確立を済ませ、
+本番リクエストがハンドシェイク待ちを含まないようにします。
+
+ヘッジモードでは、最初のリクエストがホストごとの p95 レイテンシ（適応的閾値）までに
+応答しない場合に同一リクエストをもう1本送信し、先に完了した方を採用します。
+負けた側は勝者が決まった時点の経過時間をレイテンシとして記録して（遅い側を閾値の算出から
+落とさない）、ボディの受信中であれば次のチャンクで接続を閉じます。
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from config import (
+    DNS_CACHE_TTL,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_ENABLED,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HEDGE_WINDOW_SIZE,
+    PREWARM_URLS,
+    REQUEST_TIMEOUT,
+    RETRY_COUNT,
+    RETRY_DELAYS,
+    USER_AGENT,
+)
+
+if TYPE_CHECKING:  # pragma: no cover - 型ヒント専用
+    from metrics import StageRecord
+
+logger = logging.getLogger(__name__)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """プロセス内で共有する ``requests.Session`` を返す（初回のみ生成）。"""
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update({"User-Agent": USER_AGENT})
+            _session = session
+        return _session
+
+
+def is_hedging_enabled() -> bool:
+    """ヘッジモードが有効かどうかを返す（config または環境変数 SCRAPER_HEDGE）。"""
+
+    env_value = os.environ.get("SCRAPER_HEDGE", "").strip().lower()
+    return HEDGE_ENABLED or env_value in ("1", "true", "yes", "on")
+
+
+class LatencyTracker:
+    """ホストごとの直近レイテンシを保持し、ヘッジ発火閾値を算出する。"""
+
+    def __init__(
+        self,
+        window_size: int = HEDGE_WINDOW_SIZE,
+        percentile: float = HEDGE_PERCENTILE,
+    ) -> None:
+        self._window_size = window_size
+        self._percentile = percentile
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, seconds: float) -> None:
+        """完了したリクエストの所要時間を記録する。"""
+
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = deque(maxlen=self._window_size)
+                self._samples[host] = samples
+            samples.append(seconds)
+
+    def threshold(self, host: str) -> float:
+        """ヘッジを発火するまでの待ち時間（秒）を返す。
+
+        サンプルが ``HEDGE_MIN_SAMPLES`` 未満の間は ``HEDGE_DEFAULT_DELAY`` を返す。
+        """
+
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+
+        index = min(len(samples) - 1, max(0, math.ceil(self._percentile * len(samples)) - 1))
+        return max(HEDGE_MIN_DELAY, samples[index])
+
+
+class HedgeStats:
+    """ヘッジの発火回数・勝利回数をホストごとに集計するカウンタ。"""
+
+    KEYS = ("requests", "hedged", "hedge_won")
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, host: str, key: str) -> None:
+        """指定カウンタを1増やす。"""
+
+        with self._lock:
+            counters = self._counters.setdefault(host, dict.fromkeys(self.KEYS, 0))
+            counters[key] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """現在のカウンタのコピーを返す。"""
+
+        with self._lock:
+            return {host: dict(counters) for host, counters in self._counters.items()}
+
+
+_latency = LatencyTracker()
+_hedge_stats = HedgeStats()
+
+
+def get_hedge_stats() -> Dict[str, Dict[str, int]]:
+    """ホストごとのヘッジ統計（requests / hedged / hedge_won）を返す。"""
+
+    return _hedge_stats.snapshot()
+
+
+def _timed_get(url: str, allow_redirects: bool) -> requests.Response:
+    """通常の GET を実行し、所要時間をレイテンシとして記録する。"""
+
+    host = urlsplit(url).hostname or ""
+    started = time.perf_counter()
+    response = get_session().get(
+        url, timeout=REQUEST_TIMEOUT, allow_redirects=allow_redirects
+    )
+    _latency.record(host, time.perf_counter() - started)
+    return response
+
+
+HedgeResult = Tuple[str, Optional[requests.Response], Optional[Exception], float]
+
+_HEDGE_CHUNK_SIZE = 64 * 1024
+
+
+def _hedge_worker(
+    url: str,
+    label: str,
+    allow_redirects: bool,
+    cancel: threading.Event,
+    results: "queue.Queue[HedgeResult]",
+) -> None:
+    """ヘッジ用の1リクエストを実行し、結果と所要時間をキューに積む。
+
+    他方が勝った時点（``cancel``）で、ヘッダ受信前なら受信直後に、ボディ受信中なら
+    次のチャンクで接続を閉じる（所要時間の記録は呼び出し側が行う）。
+    """
+
+    started = time.perf_counter()
+    try:
+        response = get_session().get(
+            url,
+            timeout=REQUEST_TIMEOUT,
+            allow_redirects=allow_redirects,
+            stream=True,
+        )
+        chunks = []
+        for chunk in response.iter_content(_HEDGE_CHUNK_SIZE):
+            if cancel.is_set():
+                break
+            chunks.append(chunk)
+        if cancel.is_set():
+            response.close()
+            return
+        # ボディを読み切って接続をプールへ返却済み。以降は通常のレスポンスとして扱えるようにする
+        response._content = b"".join(chunks)
+    except requests.exceptions.RequestException as exc:
+        results.put((label, None, exc, time.perf_counter() - started))
+        return
+
+    results.put((label, response, None, time.perf_counter() - started))
+
+
+def _hedged_get(url: str, allow_redirects: bool) -> requests.Response:
+    """
+    p95 閾値を超えたらヘッジリクエストを送り、先着のレスポンスを返す。
+
+    勝者の所要時間に加え、未完了の側も勝者が決まった時点の経過時間（実際のレイテンシの
+    下限）を記録する。敗者を記録しないと遅い側が常に抜け落ち、p95 が下振れする。
+    """
+
+    host = urlsplit(url).hostname or ""
+    delay = _latency.threshold(host)
+    cancel = threading.Event()
+    results: "queue.Queue[HedgeResult]" = queue.Queue()
+    started: Dict[str, float] = {}
+
+    def start(label: str) -> None:
+        started[label] = time.perf_counter()
+        # 敗者スレッドがタイムアウトまで残ってもプロセス終了を妨げないよう daemon で起動
+        threading.Thread(
+            target=_hedge_worker,
+            args=(url, label, allow_redirects, cancel, results),
+            daemon=True,
+        ).start()
+
+    _hedge_stats.increment(host, "requests")
+    start("primary")
+    outstanding = 1
+    hedged = False
+    last_error: Optional[Exception] = None
+
+    while outstanding:
+        try:
+            label, response, error, elapsed = results.get(timeout=None if hedged else delay)
+        except queue.Empty:
+            hedged = True
+            _hedge_stats.increment(host, "hedged")
+            logger.info(
+                "応答が %.2f 秒を超えたためヘッジリクエストを送信します: %s", delay, host
+            )
+            start("hedge")
+            outstanding += 1
+            continue
+
+        outstanding -= 1
+        del started[label]
+        if error is not None:
+            last_error = error
+            continue
+
+        cancel.set()
+        now = time.perf_counter()
+        _latency.record(host, elapsed)
+        for pending in started.values():
+            _latency.record(host, now - pending)
+        if label == "hedge":
+            _hedge_stats.increment(host, "hedge_won")
+        if hedged:
+            logger.info(
+                "ヘッジ結果: %s が先着 (統計 %s: %s)",
+                label,
+                host,
+                _hedge_stats.snapshot().get(host),
+            )
+        assert response is not None
+        return response
+
+    assert last_error is not None
+    raise last_error
+
+
+def fetch(
+    url: str,
+    *,
+    encoding: Optional[str] = None,
+    allow_redirects: bool = True,
+    hedge: Optional[bool] = None,
+    stage: Optional["StageRecord"] = None,
+    attempts: int = RETRY_COUNT,
+) -> requests.Response:
+    """
+    リトライ付きで URL を GET し、成功したレスポンスを返す。
+
+    Args:
+        url: 取得対象URL
+        encoding: レスポンスの文字コードを明示する場合に指定（例: "shift_jis"）
+        allow_redirects: リダイレクトを追跡するかどうか
+        hedge: ヘッジモードの有効/無効（省略時は ``is_hedging_enabled()`` に従う）
+        stage: 指定時はリトライ回数と受信バイト数を記録する（metrics.StageRecord）
+        attempts: 最大試行回数（省略時は ``RETRY_COUNT``。1 ならリトライしない）
+
+    Returns:
+        requests.Response: ステータス 2xx のレスポンス
+
+    Raises:
+        requests.exceptions.RequestException: 最大リトライ回数に達した場合
+    """
+    if hedge is None:
+        hedge = is_hedging_enabled()
+
+    response: Optional[requests.Response] = None
+    for attempt in range(1, attempts + 1):
+        if stage is not None:
+            stage.retries = attempt - 1
+        try:
+            logger.info("HTTP GET: %s (試行 %d/%d)", url, attempt, attempts)
+            if hedge:
+                response = _hedged_get(url, allow_redirects)
+            else:
+                response = _timed_get(url, allow_redirects)
+            response.raise_for_status()
+            logger.info("HTTP GET 成功: status=%s", response.status_code)
+            break
+        except requests.exceptions.RequestException as exc:
+            logger.warning("HTTP通信エラー (試行 %d/%d): %s", attempt, attempts, exc)
+            if attempt == attempts:
+                logger.error("最大リトライ回数に達しました。取得を中断します。")
+                raise
+            delay_index = min(attempt - 1, len(RETRY_DELAYS) - 1)
+            delay = RETRY_DELAYS[delay_index]
+            logger.info("%s 秒後にリトライします。", delay)
+            time.sleep(delay)
+
+    if response is None:
+        raise requests.exceptions.RequestException("HTTPレスポンスを取得できませんでした。")
+
+    if stage is not None:
+        stage.bytes = len(response.content)
+    if encoding:
+        response.encoding = encoding
+    return response
+
+
+# ===========================
+# プリウォーム（DNS キャッシュ・接続確立）
+# ===========================
+
+_original_getaddrinfo = socket.getaddrinfo
+_dns_cache: Dict[Tuple[Any, ...], Tuple[float, List[Any]]] = {}
+_dns_lock = threading.Lock()
+
+
+def _cached_getaddrinfo(*args: Any, **kwargs: Any) -> List[Any]:
+    """``socket.getaddrinfo`` の結果を ``DNS_CACHE_TTL`` 秒だけ保持するラッパー。"""
+
+    key = (args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    result = _original_getaddrinfo(*args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL, result)
+    return result
+
+
+def enable_dns_cache() -> None:
+    """プロセス全体の名前解決に TTL 付きキャッシュを有効化する（冪等）。"""
+
+    if socket.getaddrinfo is not _cached_getaddrinfo:
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+def prewarm(urls: Optional[Iterable[str]] = None) -> Dict[str, Optional[float]]:
+    """
+    共有セッションで各ホストへ HEAD を送り、DNS 解決と TLS 接続を事前に確立する。
+
+    確立した接続は ``get_session()`` のコネクションプールに残り、直後の ``fetch()`` や
+    LINE 通知で再利用される。失敗しても本番処理には影響させず警告ログのみ出力する。
+
+    Args:
+        urls: 対象URL（省略時は ``PREWARM_URLS``）。同一ホストは1回だけ接続する。
+
+    Returns:
+        Dict[str, Optional[float]]: ホスト → 所要秒数（失敗時は ``None``）
+    """
+    enable_dns_cache()
+    session = get_session()
+
+    results: Dict[str, Optional[float]] = {}
+    for url in urls or PREWARM_URLS:
+        parts = urlsplit(url)
+        host = parts.netloc
+        if host in results:
+            continue
+        started = time.perf_counter()
+        try:
+            response = session.head(
+                f"{parts.scheme}://{host}/", timeout=REQUEST_TIMEOUT, allow_redirects=False
+            )
+            response.close()
+            results[host] = time.perf_counter() - started
+            logger.info(
+                "プリウォーム完了: %s (status=%s, %.3f秒)",
+                host,
+                response.status_code,
+                results[host],
+            )
+        except requests.exceptions.RequestException as exc:
+            results[host] = None
+            logger.warning("プリウォームに失敗しました: %s (%s)", host, exc)
+    return results
@@ -0,0 +1,385 @@
+"""
+スロット実行ジョブキュー
+
+常駐スケジューラ（``scheduler.py --queue``）はスロット時刻にジョブ
+``(source, variant, slot_time)`` を SQLite に登録するだけで、取得は任意数のワーカー
+プロセスが確保して実行します。外部のブローカーは不要で、同じ DB ファイルを共有すれば
+複数マシンのワーカーでも分担できます。取得対象や購読者が増えてもワーカーを足すだけで
+処理量を伸ばせます。
+
+- 登録は ``job_key``（source:variant:日付:スロット）で冪等
+- 確保は ``BEGIN IMMEDIATE`` で排他し、1ジョブは1ワーカーだけが実行
+- 失敗したジョブは ``JOB_RETRY_BACKOFF`` 後に再実行し、``JOB_MAX_ATTEMPTS`` 回で dead
+- ワーカーが落ちた場合は ``JOB_LEASE_SECONDS`` 後に他のワーカーが拾い直す
+
+source はスロット実行関数の種別（ranking / sector）、variant はその対象
+（morning / afternoon / midday / close）です。
+
+使い方:
+    python job_queue.py worker                  # JOB_WORKERS 個のワーカープロセスで実行
+    python job_queue.py worker --processes 4
+    python job_queue.py enqueue ranking morning 09:20
+    python job_queue.py status
+    python job_queue.py requeue-dead            # dead のジョブを再実行待ちに戻す
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+from config import (
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_SECONDS,
+    JOB_QUEUE_DB,
+    JOB_RETRY_BACKOFF,
+    JOB_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+BASE_DIR = Path(__file__).resolve().parent.parent
+JOB_QUEUE_PATH = BASE_DIR / JOB_QUEUE_DB
+
+# 状態: queued（実行待ち・再実行待ち）/ running（実行中）/ done（完了）/ dead（再実行打ち切り）
+STATUSES = ("queued", "running", "done", "dead")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT NOT NULL UNIQUE,
+    source TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    slot_time TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    result TEXT,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, next_attempt_at);
+"""
+
+
+@dataclass(frozen=True)
+class Job:
+    """確保したジョブ1件。"""
+
+    id: int
+    job_key: str
+    source: str
+    variant: str
+    slot_time: str
+    attempts: int  # 今回の実行を含む実行回数
+
+
+# (variant, slot_time) を受け取り結果（保存したファイル等）を返す実行関数
+Runner = Callable[[str, str], object]
+
+
+def job_key(source: str, variant: str, slot_time: str, date: datetime.date) -> str:
+    """
+    ジョブの重複登録防止キーを返す。
+
+    Examples:
+        >>> job_key("ranking", "morning", "09:20", datetime.date(2025, 11, 4))
+        'ranking:morning:20251104:0920'
+    """
+    return f"{source}:{variant}:{date.strftime('%Y%m%d')}:{slot_time.replace(':', '')}"
+
+
+class JobQueue:
+    """SQLite に永続化されたジョブキュー。"""
+
+    def __init__(self, path: Path = JOB_QUEUE_PATH) -> None:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: トランザクションは BEGIN IMMEDIATE で明示的に制御する
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(
+        self,
+        source: str,
+        variant: str,
+        slot_time: str,
+        date: Optional[datetime.date] = None,
+    ) -> bool:
+        """
+        ジョブを登録する。
+
+        Returns:
+            bool: 新規登録した場合 True、同じスロットが登録済みの場合 False
+        """
+        now = datetime.datetime.now(JST)
+        key = job_key(source, variant, slot_time, date or now.date())
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs "
+                "(job_key, source, variant, slot_time, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, source, variant, slot_time, now.timestamp(), now.isoformat()),
+            )
+        created = cursor.rowcount > 0
+        if created:
+            logger.info("ジョブを登録しました: %s", key)
+        else:
+            logger.info("ジョブは登録済みのためスキップします: %s", key)
+        return created
+
+    def claim(self, worker: str, now: Optional[float] = None) -> Optional[Job]:
+        """
+        実行可能なジョブを1件確保（running に変更）して返す。
+
+        リース切れの running は落ちたワーカーのジョブとして拾い直す。
+        その時点で実行回数が上限に達していれば dead にする。
+        """
+        now = time.time() if now is None else now
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        "SELECT * FROM jobs "
+                        "WHERE (status = 'queued' AND next_attempt_at <= ?) "
+                        "   OR (status = 'running' AND lease_until < ?) "
+                        "ORDER BY next_attempt_at, id LIMIT 1",
+                        (now, now),
+                    ).fetchone()
+                    if row is None or row["attempts"] < JOB_MAX_ATTEMPTS:
+                        break
+                    conn.execute(
+                        "UPDATE jobs SET status = 'dead', lease_until = NULL, "
+                        "last_error = COALESCE(last_error, 'リース切れ') WHERE id = ?",
+                        (row["id"],),
+                    )
+                    logger.error("ジョブの再実行を打ち切りました: %s（リース切れ）", row["job_key"])
+
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                        "lease_until = ?, worker = ?, started_at = ? WHERE id = ?",
+                        (
+                            now + JOB_LEASE_SECONDS,
+                            worker,
+                            datetime.datetime.now(JST).isoformat(),
+                            row["id"],
+                        ),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return Job(
+            id=row["id"],
+            job_key=row["job_key"],
+            source=row["source"],
+            variant=row["variant"],
+            slot_time=row["slot_time"],
+            attempts=row["attempts"] + 1,
+        )
+
+    def mark_done(self, job: Job, result: Optional[object] = None) -> None:
+        """完了として記録する。"""
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', lease_until = NULL, last_error = NULL, "
+                "result = ?, finished_at = ? WHERE id = ?",
+                (
+                    str(result) if result is not None else None,
+                    datetime.datetime.now(JST).isoformat(),
+                    job.id,
+                ),
+            )
+
+    def mark_failed(self, job: Job, error: str) -> str:
+        """失敗を記録し、新しい状態（queued / dead）を返す。"""
+
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            status = "dead"
+            next_attempt_at = time.time()
+        else:
+            status = "queued"
+            delay_index = min(job.attempts - 1, len(JOB_RETRY_BACKOFF) - 1)
+            next_attempt_at = time.time() + JOB_RETRY_BACKOFF[delay_index]
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, next_attempt_at = ?, lease_until = NULL, "
+                "last_error = ?, finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    next_attempt_at,
+                    error,
+                    datetime.datetime.now(JST).isoformat(),
+                    job.id,
+                ),
+            )
+        return status
+
+    def requeue_dead(self) -> int:
+        """dead のジョブを実行回数をリセットして再実行待ちに戻し、件数を返す。"""
+
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, next_attempt_at = ? "
+                "WHERE status = 'dead'",
+                (time.time(),),
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとの件数を返す。"""
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+def default_runners() -> Dict[str, Runner]:
+    """source → スロット実行関数（ワーカー起動時のみスクレイパーを読み込む）。"""
+
+    import scrape_rankings
+    import scrape_sector_rankings
+
+    return {
+        "ranking": scrape_rankings.run_slot,
+        "sector": scrape_sector_rankings.run_slot,
+    }
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_job(queue: JobQueue, job: Job, runners: Dict[str, Runner]) -> str:
+    """確保したジョブを実行して結果を記録し、新しい状態を返す。"""
+
+    runner = runners.get(job.source)
+    try:
+        if runner is None:
+            raise KeyError(f"未知のジョブ種別です: {job.source}")
+        result = runner(job.variant, job.slot_time)
+    except Exception as exc:  # 1件の失敗でワーカーを止めない
+        error = f"{type(exc).__name__}: {exc}"
+        status = queue.mark_failed(job, error)
+        if status == "dead":
+            logger.error("ジョブの再実行を打ち切りました: %s (%s)", job.job_key, error)
+        else:
+            logger.warning("ジョブが失敗しました（再実行予定）: %s (%s)", job.job_key, error)
+        return status
+
+    # None はスロット実行権を他の実行が保持していた（重複のためスキップ）
+    queue.mark_done(job, result if result is not None else "skipped")
+    logger.info("ジョブが完了しました: %s (%d回目)", job.job_key, job.attempts)
+    return "done"
+
+
+def run_worker(
+    stop: threading.Event,
+    queue: Optional[JobQueue] = None,
+    runners: Optional[Dict[str, Runner]] = None,
+    poll_seconds: float = JOB_POLL_SECONDS,
+    name: Optional[str] = None,
+) -> None:
+    """停止要求があるまでジョブの確保と実行を繰り返す。"""
+
+    queue = queue or JobQueue()
+    runners = runners or default_runners()
+    name = name or worker_name()
+    logger.info("ワーカーを起動しました: %s", name)
+    while not stop.is_set():
+        job = queue.claim(name)
+        if job is None:
+            stop.wait(poll_seconds)
+            continue
+        run_job(queue, job, runners)
+    logger.info("ワーカーを停止しました: %s", name)
+
+
+def _worker_process(path: str) -> None:
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_worker(stop, JobQueue(Path(path)))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="スロット実行ジョブキュー")
+    parser.add_argument("--db", type=Path, default=JOB_QUEUE_PATH, help="ジョブキューの SQLite ファイル")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker = commands.add_parser("worker", help="ワーカーを起動する")
+    worker.add_argument("--processes", type=int, default=JOB_WORKERS)
+
+    enqueue = commands.add_parser("enqueue", help="ジョブを登録する")
+    enqueue.add_argument("source", choices=("ranking", "sector"))
+    enqueue.add_argument("variant")
+    enqueue.add_argument("slot_time", help="HH:MM")
+
+    commands.add_parser("status", help="状態ごとの件数を表示する")
+    commands.add_parser("requeue-dead", help="dead のジョブを再実行待ちに戻す")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db)
+    if args.command == "enqueue":
+        queue.enqueue(args.source, args.variant, args.slot_time)
+    elif args.command == "status":
+        for status, count in queue.counts().items():
+            print(f"{status:<8} {count:>5}")
+    elif args.command == "requeue-dead":
+        print(f"{queue.requeue_dead()} 件を再実行待ちに戻しました")
+    elif args.processes <= 1:
+        _worker_process(str(args.db))
+    else:
+        processes = [
+            multiprocessing.Process(target=_worker_process, args=(str(args.db),), daemon=False)
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    # scrape_rankings と同じ JST 形式のログをワーカーでも使う
+    import scrape_rankings  # noqa: F401
+
+    raise SystemExit(main())
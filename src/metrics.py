@@ -0,0 +1,290 @@
+"""
+実行メトリクスモジュール
+
+各エントリポイント（scrape_rankings / scrape_sector_rankings など）の
+ステージ別所要時間・バイト数・件数・リトライ回数・スロット遅延を記録し、
+JSON の実行レポートおよび Prometheus テキスト形式で出力します。
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+DATETIME_FORMAT = "%Y%m%d_%H%M"
+JSON_INDENT = 2
+
+# 実行レポートのファイル名プレフィックス（スナップショットの glob と衝突しない名前にする）
+REPORT_PREFIX = "run_report_"
+
+
+@dataclass
+class StageRecord:
+    """1ステージ分の計測結果。"""
+
+    name: str
+    started_at: str
+    duration_seconds: float = 0.0
+    status: str = "ok"
+    bytes: int = 0
+    rows: int = 0
+    retries: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class RunMetrics:
+    """1回の実行（1スロット分）のメトリクス。"""
+
+    entry_point: str
+    target: Optional[str] = None
+    slot_time: Optional[str] = None
+    slot_lag_seconds: Optional[float] = None
+    snapshot: Optional[str] = None
+    started_at: str = field(
+        default_factory=lambda: datetime.datetime.now(JST).isoformat()
+    )
+    duration_seconds: float = 0.0
+    status: str = "ok"
+    stages: List[StageRecord] = field(default_factory=list)
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageRecord]:
+        """
+        ステージの所要時間を計測するコンテキストマネージャ。
+
+        例外発生時はステージと実行全体を ``error`` とし、例外はそのまま再送出する。
+
+        Examples:
+            >>> metrics = RunMetrics("scrape_rankings")
+            >>> with metrics.stage("parse") as stage:
+            ...     stage.rows = 10
+        """
+        record = StageRecord(
+            name=name, started_at=datetime.datetime.now(JST).isoformat()
+        )
+        self.stages.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as exc:
+            record.status = "error"
+            record.error = str(exc)
+            self.status = "error"
+            raise
+        finally:
+            record.duration_seconds = round(time.perf_counter() - started, 6)
+
+    def set_slot(
+        self,
+        target: str,
+        slot_time: Optional[str],
+        now: Optional[datetime.datetime] = None,
+    ) -> None:
+        """対象とスロットを設定し、予定時刻からの遅延（秒）を算出する。"""
+
+        self.target = target
+        self.slot_time = slot_time
+        if not slot_time:
+            return
+
+        now = now or datetime.datetime.now(JST)
+        try:
+            hour, minute = map(int, slot_time.split(":"))
+        except ValueError:
+            logger.warning("スロット時刻の形式が不正です: %s", slot_time)
+            return
+        scheduled = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        self.slot_lag_seconds = round((now - scheduled).total_seconds(), 3)
+
+    def finish(self) -> None:
+        """全体の所要時間を確定し、レジストリへ登録する。"""
+
+        self.duration_seconds = round(time.perf_counter() - self._started, 6)
+        REGISTRY.publish(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON 出力用の辞書を返す。"""
+
+        data = asdict(self)
+        data.pop("_started", None)
+        return data
+
+    def write_report(
+        self, directory: Path, datetime_str: Optional[str] = None
+    ) -> Path:
+        """
+        実行レポートをスナップショットと同じディレクトリに保存する。
+
+        Args:
+            directory: スナップショットの保存ディレクトリ
+            datetime_str: レポート名に使う日時文字列（省略時はスナップショット名、
+                スナップショットがなければ現在時刻）
+
+        Returns:
+            Path: 保存したレポートのパス
+        """
+        if not datetime_str and self.snapshot:
+            # 例: ranking_20251104_1117.json → 20251104_1117
+            datetime_str = "_".join(Path(self.snapshot).stem.split("_")[-2:])
+        if not datetime_str:
+            datetime_str = datetime.datetime.now(JST).strftime(DATETIME_FORMAT)
+
+        directory.mkdir(parents=True, exist_ok=True)
+        filepath = directory / f"{REPORT_PREFIX}{datetime_str}.json"
+        with filepath.open("w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=JSON_INDENT)
+
+        logger.info("実行レポート保存: %s", filepath)
+        return filepath
+
+
+def _escape_label(value: Any) -> str:
+    """Prometheus ラベル値のエスケープ。"""
+
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    pairs = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+class MetricsRegistry:
+    """エントリポイント・対象ごとに直近の実行メトリクスを保持する。"""
+
+    def __init__(self) -> None:
+        self._latest: Dict[Tuple[str, str], RunMetrics] = {}
+        self._run_counts: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, metrics: RunMetrics) -> None:
+        """実行結果を登録する。"""
+
+        key = (metrics.entry_point, metrics.target or "")
+        with self._lock:
+            self._latest[key] = metrics
+            count_key = key + (metrics.status,)
+            self._run_counts[count_key] = self._run_counts.get(count_key, 0) + 1
+
+    def to_prometheus(self) -> str:
+        """登録済みメトリクスを Prometheus テキスト形式で返す。"""
+
+        with self._lock:
+            latest = list(self._latest.values())
+            run_counts = dict(self._run_counts)
+
+        lines: List[str] = []
+
+        def family(name: str, metric_type: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        family("scraper_runs_total", "counter", "Number of finished runs.")
+        for (entry_point, target, status), count in sorted(run_counts.items()):
+            labels = {"entry_point": entry_point, "target": target, "status": status}
+            lines.append(f"scraper_runs_total{_format_labels(labels)} {count}")
+
+        family("scraper_run_duration_seconds", "gauge", "Duration of the latest run.")
+        for metrics in latest:
+            labels = {"entry_point": metrics.entry_point, "target": metrics.target or ""}
+            lines.append(
+                f"scraper_run_duration_seconds{_format_labels(labels)} {metrics.duration_seconds}"
+            )
+
+        family("scraper_slot_lag_seconds", "gauge", "Scheduled slot to run start lag.")
+        for metrics in latest:
+            if metrics.slot_lag_seconds is None:
+                continue
+            labels = {
+                "entry_point": metrics.entry_point,
+                "target": metrics.target or "",
+                "slot": metrics.slot_time or "",
+            }
+            lines.append(
+                f"scraper_slot_lag_seconds{_format_labels(labels)} {metrics.slot_lag_seconds}"
+            )
+
+        stage_fields = (
+            ("scraper_stage_duration_seconds", "duration_seconds", "Stage duration."),
+            ("scraper_stage_bytes", "bytes", "Bytes handled by the stage."),
+            ("scraper_stage_rows", "rows", "Rows handled by the stage."),
+            ("scraper_stage_retries", "retries", "Retries performed by the stage."),
+        )
+        for name, attribute, help_text in stage_fields:
+            family(name, "gauge", help_text)
+            for metrics in latest:
+                for stage in metrics.stages:
+                    labels = {
+                        "entry_point": metrics.entry_point,
+                        "target": metrics.target or "",
+                        "stage": stage.name,
+                    }
+                    lines.append(f"{name}{_format_labels(labels)} {getattr(stage, attribute)}")
+
+        # ヘッジリクエスト統計（http_client 未使用のプロセスでは空）
+        try:
+            from http_client import get_hedge_stats
+        except ImportError:  # pragma: no cover - requests 未導入環境
+            hedge_stats: Dict[str, Dict[str, int]] = {}
+        else:
+            hedge_stats = get_hedge_stats()
+        family("scraper_http_hedge_total", "counter", "Hedged request counters per host.")
+        for host, counters in sorted(hedge_stats.items()):
+            for kind, value in sorted(counters.items()):
+                labels = {"host": host, "kind": kind}
+                lines.append(f"scraper_http_hedge_total{_format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """``/metrics`` で Prometheus テキストを返すハンドラ。"""
+
+    def do_GET(self) -> None:  # noqa: N802 - BaseHTTPRequestHandler の規約
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        logger.debug("metrics: " + format, *args)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    デーモンモード用に Prometheus エンドポイントをバックグラウンドで起動する。
+
+    Args:
+        port: 待ち受けポート
+        host: 待ち受けアドレス（既定はローカルのみ）
+
+    Returns:
+        ThreadingHTTPServer: 起動したサーバー（``shutdown()`` で停止）
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info("Prometheus メトリクスを公開しました: http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,522 @@
+"""
+通知アウトボックスモジュール
+
+スクレイパーは整形済みの通知メッセージを SQLite のアウトボックスに登録するだけで処理を終え、
+LINE への送信はこのモジュールの送信処理（``drain()``）が別途まとめて行います。
+
+- 登録は ``dedupe_key`` で冪等（同じスロットの再実行で二重登録しない）
+- 送信失敗分は ``OUTBOX_RETRY_BACKOFF`` に従い次回以降の実行で再送
+- チャネル（LINE / Webhook / メール / ファイル）ごとに1件ずつ登録し、並列に送信
+  （遅い・失敗するチャネルが他のチャネルの送信を待たせない）
+- 送信時は LINE の ``X-Line-Retry-Key`` にメッセージ固有のキーを付け、
+  送信成功の記録前にプロセスが落ちて再送しても LINE 側で重複配信されない
+- タイムアウトした送信は結果が分かるまで ``sending`` のまま確保し続け（再送しない）、
+  応答待ちのスレッドが終わった時点で成功・失敗を記録する。確保期限
+  （``OUTBOX_LEASE_SECONDS``）を過ぎても結果が分からない場合（プロセスが落ちた場合など）だけ
+  再送されるため、冪等キーのないチャネル（Webhook / メール / ファイル）はこの場合に限り
+  重複して届くことがある（at-least-once）
+
+使い方:
+    python notification_outbox.py           # 送信可能な通知をすべて送信
+    python notification_outbox.py --status  # 状態ごとの件数を表示
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+from config import (
+    OUTBOX_CONCURRENCY,
+    OUTBOX_DB,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ABANDONED,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_SECONDS,
+    OUTBOX_RETRY_BACKOFF,
+)
+from notify_channels import CHANNELS, enabled_channels
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+BASE_DIR = Path(__file__).resolve().parent.parent
+OUTBOX_PATH = BASE_DIR / OUTBOX_DB
+
+# 状態: pending（未送信・再送待ち）/ sending（送信中）/ sent（送信済み）/ dead（再送打ち切り）
+STATUSES = ("pending", "sending", "sent", "dead")
+
+# 1件の通知を複数宛先へ送る場合の recipient 区切り文字（LINE は multicast で送信）
+RECIPIENT_SEPARATOR = ","
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT NOT NULL UNIQUE,
+    retry_key TEXT NOT NULL,
+    channel TEXT NOT NULL DEFAULT 'line',
+    recipient TEXT,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+@dataclass(frozen=True)
+class OutboxMessage:
+    """アウトボックスに登録された通知1件。"""
+
+    id: int
+    dedupe_key: str
+    retry_key: str
+    channel: str
+    recipient: Optional[str]
+    body: str
+    attempts: int
+
+
+@dataclass(frozen=True)
+class NewMessage:
+    """アウトボックスへ登録する通知（``Outbox.enqueue_many`` 用）。"""
+
+    body: str
+    dedupe_key: str
+    channel: str = "line"
+    recipient: Optional[str] = None  # 複数宛先は RECIPIENT_SEPARATOR 区切り
+
+
+@dataclass
+class DrainResult:
+    """``drain()`` 1回分の結果。"""
+
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+    timed_out: int = 0  # 応答待ちのまま結果の記録を送信スレッドに任せた件数
+
+
+Sender = Callable[[OutboxMessage], bool]
+
+
+class Outbox:
+    """SQLite に永続化された通知キュー。"""
+
+    def __init__(self, path: Path = OUTBOX_PATH) -> None:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: トランザクションは BEGIN IMMEDIATE で明示的に制御する
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(
+        self,
+        body: str,
+        dedupe_key: str,
+        channel: Optional[str] = None,
+        recipient: Optional[str] = None,
+    ) -> bool:
+        """
+        通知を登録する。
+
+        Args:
+            body: 送信するメッセージ本文
+            dedupe_key: 重複登録防止キー（例: "scrape_rankings:morning:20251104_0920"）
+            channel: 送信チャネル（省略時は有効な全チャネルへ1件ずつ登録）
+            recipient: 宛先（省略時はチャネル既定の宛先）
+
+        Returns:
+            bool: 新規登録した場合 True、同じキーが登録済みの場合 False
+        """
+        if channel is None:
+            messages = fan_out(body, dedupe_key)
+        else:
+            messages = [NewMessage(body, dedupe_key, channel, recipient)]
+        created = self.enqueue_many(messages) > 0
+        if created:
+            logger.info("通知をアウトボックスに登録しました: %s", dedupe_key)
+        else:
+            logger.info("通知は登録済みのためスキップします: %s", dedupe_key)
+        return created
+
+    def enqueue_many(self, messages: Iterable[NewMessage]) -> int:
+        """複数の通知を1トランザクションで登録し、新規登録件数を返す。"""
+
+        now = datetime.datetime.now(JST)
+        rows = [
+            (
+                message.dedupe_key,
+                str(uuid.uuid4()),
+                message.channel,
+                message.recipient,
+                message.body,
+                now.timestamp(),
+                now.isoformat(),
+            )
+            for message in messages
+        ]
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbox "
+                "(dedupe_key, retry_key, channel, recipient, body, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            created = conn.total_changes - before
+            conn.execute("COMMIT")
+        return created
+
+    def claim(self, limit: int = 50, now: Optional[float] = None) -> List[OutboxMessage]:
+        """送信可能な通知を確保（sending に変更）して返す。"""
+
+        now = time.time() if now is None else now
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT * FROM outbox "
+                    "WHERE (status = 'pending' AND next_attempt_at <= ?) "
+                    "   OR (status = 'sending' AND lease_until < ?) "
+                    "ORDER BY id LIMIT ?",
+                    (now, now, limit),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE outbox SET status = 'sending', lease_until = ? WHERE id = ?",
+                    [(now + OUTBOX_LEASE_SECONDS, row["id"]) for row in rows],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return [
+            OutboxMessage(
+                id=row["id"],
+                dedupe_key=row["dedupe_key"],
+                retry_key=row["retry_key"],
+                channel=row["channel"],
+                recipient=row["recipient"],
+                body=row["body"],
+                attempts=row["attempts"],
+            )
+            for row in rows
+        ]
+
+    def mark_sent(self, message: OutboxMessage) -> None:
+        """送信済みとして記録する。"""
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, "
+                "lease_until = NULL, last_error = NULL, sent_at = ? WHERE id = ?",
+                (datetime.datetime.now(JST).isoformat(), message.id),
+            )
+
+    def mark_timed_out(self, message: OutboxMessage, error: str) -> None:
+        """
+        タイムアウトを記録し、結果が分かるまで送信中のまま確保し続ける。
+
+        応答待ちの送信が後から届く場合があるため再送待ちには戻さない（確保期限を延ばすだけ）。
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE outbox SET lease_until = ?, last_error = ? "
+                "WHERE id = ? AND status = 'sending'",
+                (time.time() + OUTBOX_LEASE_SECONDS, error, message.id),
+            )
+
+    def mark_failed(self, message: OutboxMessage, error: str) -> str:
+        """送信失敗を記録し、新しい状態（pending / dead）を返す。"""
+
+        attempts = message.attempts + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            status = "dead"
+            next_attempt_at = time.time()
+        else:
+            status = "pending"
+            delay_index = min(attempts - 1, len(OUTBOX_RETRY_BACKOFF) - 1)
+            next_attempt_at = time.time() + OUTBOX_RETRY_BACKOFF[delay_index]
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "lease_until = NULL, last_error = ? WHERE id = ?",
+                (status, attempts, next_attempt_at, error, message.id),
+            )
+        return status
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとの件数を返す。"""
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+def fan_out(body: str, dedupe_key: str) -> List[NewMessage]:
+    """
+    有効な全チャネル向けに通知を複製する。
+
+    LINE の登録キーは ``dedupe_key`` のまま、その他のチャネルは ``:<チャネル名>`` を付ける。
+    """
+    return [
+        NewMessage(body, dedupe_key if name == "line" else f"{dedupe_key}:{name}", name)
+        for name in enabled_channels()
+    ]
+
+
+def _channel_sender(name: str) -> Sender:
+    def send(message: OutboxMessage) -> bool:
+        recipient = message.recipient
+        if recipient and RECIPIENT_SEPARATOR in recipient:
+            return CHANNELS[name].send(
+                message.body, recipient.split(RECIPIENT_SEPARATOR), message.retry_key
+            )
+        return CHANNELS[name].send(message.body, recipient, message.retry_key)
+
+    return send
+
+
+# チャネル → 送信関数
+SENDERS: Dict[str, Sender] = {name: _channel_sender(name) for name in CHANNELS}
+
+
+def _channel_timeout(channel: str) -> float:
+    target = CHANNELS.get(channel)
+    return target.timeout if target is not None else 30.0
+
+
+_default_outbox: Optional[Outbox] = None
+_default_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """既定パスのアウトボックスを返す（初回のみ生成）。"""
+
+    global _default_outbox
+    with _default_lock:
+        if _default_outbox is None:
+            _default_outbox = Outbox()
+        return _default_outbox
+
+
+def enqueue_notification(
+    body: str,
+    dedupe_key: str,
+    channel: Optional[str] = None,
+    recipient: Optional[str] = None,
+) -> bool:
+    """既定のアウトボックスに通知を登録する（スクレイパーからの入口）。"""
+
+    return get_outbox().enqueue(body, dedupe_key, channel=channel, recipient=recipient)
+
+
+def _deliver(sender: Optional[Sender], message: OutboxMessage) -> Optional[str]:
+    """1件送信し、失敗時はエラー内容を返す（成功時は None）。"""
+
+    if sender is None:
+        return f"未知の通知チャネルです: {message.channel}"
+    try:
+        return None if sender(message) else "送信関数が失敗を返しました"
+    except Exception as exc:  # 1件の失敗で他の通知を止めない
+        return f"{type(exc).__name__}: {exc}"
+
+
+# タイムアウトで結果を待つのをやめた（まだ応答待ちの）送信スレッド数
+_abandoned = 0
+_abandoned_lock = threading.Lock()
+
+
+def _abandon(future: Future, outbox: Outbox, message: OutboxMessage) -> None:
+    """
+    タイムアウトした送信を、終了するまで応答待ちのスレッドとして数える。
+
+    送信が終わった時点で結果（成功・失敗）をアウトボックスに記録する。
+    """
+
+    global _abandoned
+
+    def _finished(done: Future) -> None:
+        global _abandoned
+        with _abandoned_lock:
+            _abandoned -= 1
+        try:
+            error = done.result()
+            if error is None:
+                outbox.mark_sent(message)
+                logger.info("タイムアウト後に送信が完了しました: %s", message.dedupe_key)
+            else:
+                outbox.mark_failed(message, error)
+                logger.warning(
+                    "タイムアウト後に送信が失敗しました: %s (%s)", message.dedupe_key, error
+                )
+        except Exception:  # コールバックの失敗で送信スレッドを止めない
+            logger.exception("タイムアウトした送信の結果を記録できませんでした: %s", message.dedupe_key)
+
+    with _abandoned_lock:
+        _abandoned += 1
+    future.add_done_callback(_finished)
+
+
+def abandoned_workers() -> int:
+    """タイムアウト後も応答待ちのまま残っている送信スレッド数。"""
+
+    with _abandoned_lock:
+        return _abandoned
+
+
+def drain(
+    outbox: Optional[Outbox] = None,
+    senders: Optional[Dict[str, Sender]] = None,
+    batch_size: int = OUTBOX_CONCURRENCY,
+) -> DrainResult:
+    """
+    送信可能な通知がなくなるまで確保 → 並列送信 → 記録を繰り返す。
+
+    確保した通知はチャネルをまたいで同時に送信し、チャネルごとのタイムアウト
+    （``NOTIFY_CHANNEL_TIMEOUTS``）を超えたものは待つのをやめ、送信中のまま送信スレッドの
+    終了時に結果を記録する（応答待ちの送信と重ねて再送しない）。
+    1バッチの所要時間は最も遅いチャネルの時間で頭打ちになる。
+
+    バッチごとに件数分のスレッドを用意するため、送信はすべて確保直後に始まり、タイムアウトは
+    実際の送信開始から数える。タイムアウトしたスレッドは待たずに次のバッチへ進むが、
+    応答待ちのスレッドが ``OUTBOX_MAX_ABANDONED`` 以上残っている間は新しい送信を始めない。
+
+    Returns:
+        DrainResult: 送信成功・再送待ち・打ち切り・タイムアウトの件数
+    """
+    outbox = outbox or get_outbox()
+    senders = senders or SENDERS
+    result = DrainResult()
+
+    while True:
+        if abandoned_workers() >= OUTBOX_MAX_ABANDONED:
+            logger.warning(
+                "応答待ちの送信スレッドが %d 本残っているため、残りの通知は次回送信します",
+                abandoned_workers(),
+            )
+            break
+        messages = outbox.claim(batch_size)
+        if not messages:
+            break
+
+        # タイムアウトしたスレッドを待たずに次へ進めるため with 文は使わない
+        # （前のバッチで応答待ちのスレッドが次のバッチの送信を待たせないよう、バッチごとに作り直す）
+        executor = ThreadPoolExecutor(max_workers=len(messages), thread_name_prefix="outbox")
+        try:
+            started = time.monotonic()
+            futures = [
+                (message, executor.submit(_deliver, senders.get(message.channel), message))
+                for message in messages
+            ]
+            for message, future in futures:
+                deadline = started + _channel_timeout(message.channel)
+                try:
+                    error = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    error = f"タイムアウト（{_channel_timeout(message.channel):g}秒）"
+                    outbox.mark_timed_out(message, error)
+                    _abandon(future, outbox, message)
+                    result.timed_out += 1
+                    logger.warning(
+                        "通知の送信がタイムアウトしました（結果は送信完了時に記録）: %s", message.dedupe_key
+                    )
+                    continue
+
+                if error is None:
+                    outbox.mark_sent(message)
+                    result.sent += 1
+                    continue
+
+                status = outbox.mark_failed(message, error)
+                if status == "dead":
+                    result.dead += 1
+                    logger.error("通知の再送を打ち切りました: %s (%s)", message.dedupe_key, error)
+                else:
+                    result.retried += 1
+                    logger.warning(
+                        "通知の送信に失敗しました（再送予定）: %s (%s)", message.dedupe_key, error
+                    )
+        finally:
+            executor.shutdown(wait=False)
+
+    if result.sent or result.retried or result.dead or result.timed_out:
+        logger.info(
+            "アウトボックス送信結果: 成功 %d / 再送待ち %d / 打ち切り %d / タイムアウト %d",
+            result.sent,
+            result.retried,
+            result.dead,
+            result.timed_out,
+        )
+    return result
+
+
+def start_sender(
+    stop: threading.Event, interval: float = OUTBOX_POLL_SECONDS
+) -> threading.Thread:
+    """常駐プロセス用に、一定間隔で ``drain()`` するバックグラウンドスレッドを起動する。"""
+
+    def _loop() -> None:
+        while not stop.is_set():
+            try:
+                drain()
+            except Exception:
+                logger.exception("アウトボックスの送信処理でエラーが発生しました")
+            stop.wait(interval)
+
+    thread = threading.Thread(target=_loop, name="outbox-sender", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """アウトボックスの通知を送信する。打ち切りが発生した場合は 1 を返す。"""
+
+    parser = argparse.ArgumentParser(description="通知アウトボックスの送信")
+    parser.add_argument("--status", action="store_true", help="状態ごとの件数を表示して終了")
+    args = parser.parse_args(argv)
+
+    outbox = get_outbox()
+    if args.status:
+        for status, count in outbox.counts().items():
+            print(f"{status:<8} {count:>5}")
+        return 0
+
+    result = drain(outbox)
+    return 1 if result.dead else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    raise SystemExit(main())
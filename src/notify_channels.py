@@ -0,0 +1,203 @@
+"""
+通知チャネルモジュール
+
+LINE 以外の通知先（汎用 Webhook・SMTP メール・ローカルファイル）を含め、
+送信先を共通インタフェース ``Channel.send()`` で扱います。
+
+配信するチャネルは ``NOTIFY_CHANNELS``（環境変数 NOTIFY_CHANNELS で上書き可能）で選び、
+通知アウトボックスはチャネルごとに1件ずつ登録して並列に送信します。
+チャネル単位で再送・打ち切りが管理されるため、1チャネルの障害が他に波及しません。
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import smtplib
+import threading
+from email.message import EmailMessage
+from email.utils import make_msgid
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+from zoneinfo import ZoneInfo
+
+from config import NOTIFY_CHANNEL_TIMEOUTS, NOTIFY_CHANNELS, NOTIFY_FILE_SINK
+
+JST = ZoneInfo("Asia/Tokyo")
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+Recipient = Union[str, Sequence[str], None]
+
+
+class Channel:
+    """通知チャネルの基底クラス。"""
+
+    name = ""
+
+    @property
+    def timeout(self) -> float:
+        """送信1回あたりの上限時間（秒）。"""
+
+        return float(NOTIFY_CHANNEL_TIMEOUTS.get(self.name, 30))
+
+    def send(
+        self, body: str, recipient: Recipient = None, idempotency_key: Optional[str] = None
+    ) -> bool:
+        """
+        メッセージを送信する。
+
+        Args:
+            body: 本文
+            recipient: 宛先（チャネル固有。省略時はチャネル既定の宛先）
+            idempotency_key: 再送時の重複配信防止キー（対応チャネルのみ利用）
+
+        Returns:
+            bool: 送信成功時 True
+
+        Raises:
+            ValueError: チャネルの設定が不足している場合
+        """
+        raise NotImplementedError
+
+
+class LineChannel(Channel):
+    """LINE Messaging API（push / multicast）。"""
+
+    name = "line"
+
+    def send(
+        self, body: str, recipient: Recipient = None, idempotency_key: Optional[str] = None
+    ) -> bool:
+        # notify_line は送信時のみ必要なため遅延インポート
+        from notify_line import send_line_notify
+
+        return send_line_notify(body, user_id=recipient, retry_key=idempotency_key)
+
+
+class WebhookChannel(Channel):
+    """
+    Slack / Discord 等の Incoming Webhook。
+
+    ``NOTIFY_WEBHOOK_FORMAT``: slack（{"text": ...}）/ discord（{"content": ...}）/
+    json（{"text": ..., "idempotency_key": ...}）
+    """
+
+    name = "webhook"
+    PAYLOAD_KEYS = {"slack": "text", "discord": "content", "json": "text"}
+
+    def send(
+        self, body: str, recipient: Recipient = None, idempotency_key: Optional[str] = None
+    ) -> bool:
+        from http_client import get_session
+
+        url = recipient if isinstance(recipient, str) and recipient else None
+        url = url or os.getenv("NOTIFY_WEBHOOK_URL")
+        if not url:
+            raise ValueError("NOTIFY_WEBHOOK_URL が設定されていません")
+
+        payload_format = os.getenv("NOTIFY_WEBHOOK_FORMAT", "slack").strip().lower()
+        key = self.PAYLOAD_KEYS.get(payload_format)
+        if key is None:
+            raise ValueError(f"未知の NOTIFY_WEBHOOK_FORMAT です: {payload_format}")
+
+        payload: Dict[str, str] = {key: body}
+        headers = {}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+            if payload_format == "json":
+                payload["idempotency_key"] = idempotency_key
+
+        response = get_session().post(url, json=payload, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return True
+
+
+class EmailChannel(Channel):
+    """SMTP メール（件名は本文の1行目）。"""
+
+    name = "email"
+
+    def send(
+        self, body: str, recipient: Recipient = None, idempotency_key: Optional[str] = None
+    ) -> bool:
+        host = os.getenv("NOTIFY_SMTP_HOST")
+        sender = os.getenv("NOTIFY_EMAIL_FROM")
+        if isinstance(recipient, str) and recipient:
+            to_addresses = [recipient]
+        elif recipient:
+            to_addresses = list(recipient)
+        else:
+            to_env = os.getenv("NOTIFY_EMAIL_TO", "")
+            to_addresses = [address.strip() for address in to_env.split(",") if address.strip()]
+        if not host or not sender or not to_addresses:
+            raise ValueError(
+                "NOTIFY_SMTP_HOST / NOTIFY_EMAIL_FROM / NOTIFY_EMAIL_TO が設定されていません"
+            )
+
+        message = EmailMessage()
+        message["Subject"] = body.strip().splitlines()[0] if body.strip() else "通知"
+        message["From"] = sender
+        message["To"] = ", ".join(to_addresses)
+        # 再送時も同じ Message-ID にして受信側で重複を判別できるようにする
+        message["Message-ID"] = (
+            f"<{idempotency_key}@stock-market>" if idempotency_key else make_msgid()
+        )
+        message.set_content(body)
+
+        port = int(os.getenv("NOTIFY_SMTP_PORT", "587"))
+        with smtplib.SMTP(host, port, timeout=self.timeout) as smtp:
+            if os.getenv("NOTIFY_SMTP_STARTTLS", "1") not in ("0", "false", "no"):
+                smtp.starttls()
+            user = os.getenv("NOTIFY_SMTP_USER")
+            if user:
+                smtp.login(user, os.getenv("NOTIFY_SMTP_PASSWORD", ""))
+            smtp.send_message(message)
+        return True
+
+
+class FileChannel(Channel):
+    """ローカルファイルへ JSON Lines で追記する（動作確認・テスト用）。"""
+
+    name = "file"
+    _lock = threading.Lock()
+
+    def send(
+        self, body: str, recipient: Recipient = None, idempotency_key: Optional[str] = None
+    ) -> bool:
+        path = Path(os.getenv("NOTIFY_FILE_SINK") or BASE_DIR / NOTIFY_FILE_SINK)
+        record = {
+            "sent_at": datetime.datetime.now(JST).isoformat(),
+            "recipient": recipient if isinstance(recipient, (str, type(None))) else list(recipient),
+            "idempotency_key": idempotency_key,
+            "body": body,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, path.open("a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return True
+
+
+# チャネル名 → チャネル
+CHANNELS: Dict[str, Channel] = {
+    channel.name: channel
+    for channel in (LineChannel(), WebhookChannel(), EmailChannel(), FileChannel())
+}
+
+
+def enabled_channels() -> List[str]:
+    """
+    配信対象のチャネル名を返す（環境変数 NOTIFY_CHANNELS 優先）。
+
+    Raises:
+        ValueError: 未知のチャネル名が指定された場合
+    """
+    value = os.getenv("NOTIFY_CHANNELS", "").strip()
+    if value:
+        names = [name.strip().lower() for name in value.split(",") if name.strip()]
+    else:
+        names = list(NOTIFY_CHANNELS)
+    unknown = [name for name in names if name not in CHANNELS]
+    if unknown:
+        raise ValueError(f"未知の通知チャネルです: {', '.join(unknown)}")
+    return names
@@ -10,18 +10,32 @@ LINE Messaging APIを使用して、スクレイピング結果の通知を送
 import os
 import time
 import requests
-from typing import Dict, List, Optional
-from config import LINE_MESSAGING_API_PUSH, RETRY_COUNT, RETRY_DELAYS
-
-
-def send_line_notify(message: str, token: str = None, user_id: str = None) -> bool:
+from typing import Dict, List, Optional, Sequence, Union
+from config import (
+    LINE_MESSAGING_API_MULTICAST,
+    LINE_MESSAGING_API_PUSH,
+    RETRY_COUNT,
+    RETRY_DELAYS,
+)
+from http_client import get_session
+
+
+def send_line_notify(
+    message: str,
+    token: str = None,
+    user_id: Union[str, Sequence[str], None] = None,
+    retry_key: str = None,
+) -> bool:
     """
     LINE Messaging API (push message) でメッセージを送信する
 
     Args:
         message: 送信するメッセージ
         token: LINE Channel Access Token（省略時は環境変数 LINE_CHANNEL_ACCESS_TOKEN から取得）
-        user_id: 送信先のLINE User ID（省略時は環境変数 LINE_TARGET_USER_ID から取得）
+        user_id: 送信先のLINE User ID（省略時は環境変数 LINE_TARGET_USER_ID から取得）。
+            リストを渡した場合は multicast で複数ユーザーへ同じメッセージを1回で送信する
+        retry_key: 再送時の重複配信を防ぐキー（UUID、X-Line-Retry-Key ヘッダーとして送信）。
+            同じキーで送信済みの場合は LINE が 409 を返すため、送信成功として扱う
 
     Returns:
         bool: 送信成功時 True、失敗時 False
@@ -49,11 +63,22 @@ def send_line_notify(message: str, token: str = None, user_id: str = None) -> bo
     if not user_id:
         raise ValueError("LINE_TARGET_USER_ID が設定されていません")
 
-    # LINE Messaging API (push) にリクエスト
+    # 宛先が複数なら multicast、1件なら push
+    if isinstance(user_id, str):
+        endpoint = LINE_MESSAGING_API_PUSH
+        recipient_label = f"{user_id[:10]}..."
+    else:
+        user_id = list(user_id)
+        endpoint = LINE_MESSAGING_API_MULTICAST
+        recipient_label = f"{len(user_id)}名"
+
+    # LINE Messaging API にリクエスト
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
+    if retry_key:
+        headers["X-Line-Retry-Key"] = retry_key
 
     # Messaging API のメッセージフォーマット
     data = {
@@ -69,9 +94,10 @@ def send_line_notify(message: str, token: str = None, user_id: str = None) -> bo
     # リトライロジック
     for attempt in range(1, RETRY_COUNT + 1):
         try:
-            response = requests.post(LINE_MESSAGING_API_PUSH, headers=headers, json=data, timeout=10)
+            # 共有セッションを使い、プリウォーム済みの接続を再利用する
+            response = get_session().post(endpoint, headers=headers, json=data, timeout=10)
             response.raise_for_status()
-            print(f"✅ LINE通知送信成功 (宛先: {user_id[:10]}...)")
+            print(f"✅ LINE通知送信成功 (宛先: {recipient_label})")
             return True
         except requests.exceptions.RequestException as e:
             is_last_attempt = (attempt == RETRY_COUNT)
@@ -80,6 +106,10 @@ def send_line_notify(message: str, token: str = None, user_id: str = None) -> bo
             should_retry = False
             if hasattr(e, 'response') and e.response is not None:
                 status_code = e.response.status_code
+                # 同じリトライキーで受理済み（前回の送信が届いていた）
+                if status_code == 409 and retry_key:
+                    print(f"✅ LINE通知は送信済みです (リトライキー: {retry_key})")
+                    return True
                 # 4xx系エラー（401, 403など）はリトライしない
                 if 400 <= status_code < 500:
                     print(f"❌ LINE通知送信エラー (試行 {attempt}/{RETRY_COUNT}): {e}")
@@ -125,7 +155,8 @@ def format_success_message(
     Args:
         datetime_str: 日時文字列（例: "2025-10-20 09:15"）
         target: "morning" or "afternoon"
-        rankings: ランキングデータのリスト
+        rankings: ランキングデータのリスト（``sector`` / ``sector_change`` / ``sector_rank`` があれば
+            銘柄の下に業種の騰落率と順位を添える）
         previous_rankings: 前回のランキングデータ（オプション）
         slot_time: 取得対象の予定時刻（例: "09:20"）
 
@@ -211,6 +242,11 @@ def format_success_message(
             
             message += f"{rank}位: [{code}] {name} {change_percent}{rank_change_icon}\n"
 
+            # 業種の騰落率・順位（sector_attribution.py が付与した場合のみ）
+            sector = item.get("sector")
+            if sector and item.get("sector_change"):
+                message += f"　└ {sector} {item['sector_change']}（業種{item.get('sector_rank', '?')}位）\n"
+
     return message
 
 
@@ -0,0 +1,446 @@
+"""
+取得パイプライン（fetch → parse → normalize → store → notify）
+
+ランキング（scrape_rankings.py）と業種別ランキング（scrape_sector_rankings.py）は
+同じ段の並びで処理し、取得元ごとの違い（URL・パーサ・保存先・通知文面）だけを
+``Source`` プラグインとして渡します。各段は ``SlotRun`` の列を受け取って次の段へ流す
+ジェネレータで、``STAGES`` の並びがそのまま処理順になります。
+
+    load_previous → fetch → parse → normalize → enrich → snapshot → publish → store → persist → alerts → notify
+
+- fetch は共有セッション（http_client.py）の接続プール・DNS キャッシュ・ヘッジを使い、
+  複数スロットをまとめて流した場合は ``PIPELINE_FETCH_WORKERS`` 本まで並行して取得します。
+- 各段は RunMetrics のステージとして計測されます（実行レポート・Prometheus に反映）。
+- fetch / parse / normalize で失敗したスロットはエラー通知を登録し、以降の段を飛ばします。
+- enrich は取得元が ``Source.enrich`` を持つ場合だけ行に項目を足します（銘柄への業種動向の付与など）。
+  付与に失敗してもスロットは失敗させず、付与なしで続けます。
+- persist は常駐スケジューラでまとめコミット（git_batch.py）が有効な場合だけ保存ファイルを記録します。
+
+取得元を追加する場合は ``Source`` を1つ定義し、``run_slot(source, variant, slot_time)``
+を呼ぶだけです。
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import reduce
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from alert_rules import evaluate_snapshot, format_alert_message
+from change_stream import publish_diff
+from config import PIPELINE_FETCH_WORKERS, SUBSCRIPTION_SUMMARY_TOP
+from git_batch import record as record_for_commit
+from http_client import fetch
+from metrics import RunMetrics
+from notification_outbox import enqueue_notification
+from slot_claim import try_claim
+from slot_lag import evaluate_run
+from subscriptions import enqueue_for_subscribers
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+DATETIME_FORMAT = "%Y%m%d_%H%M"
+
+Rows = List[Dict[str, str]]
+
+
+@dataclass(frozen=True)
+class Source:
+    """取得元プラグイン。パイプラインの各段から呼ばれる取得元固有の処理をまとめる。"""
+
+    name: str  # エントリポイント名（メトリクスと通知の重複排除キーに使う）
+    variant_field: str  # 保存データでスロット識別子を入れるキー（"target" / "slot"）
+    url: Callable[[str], str]  # スロット識別子 → 取得URL（未定義なら KeyError）
+    parse: Callable[[Any], Rows]  # HTTP レスポンス → 行
+    save: Callable[[Dict[str, Any], str], Any]  # (データ, スロット識別子) → 保存パス
+    report_dir: Callable[[str], Path]  # スロット識別子 → 実行レポートの出力先
+    format_success: Callable[["SlotRun", Rows], str]
+    format_error: Callable[[str, str, str, str], str]  # (日時, スロット識別子, エラー, 時刻)
+    stream_target: Optional[str] = None  # 差分配信・アラート評価の対象名（省略時はスロット識別子）
+    select: Optional[Callable[[Rows], Rows]] = None  # 保存・通知する行の絞り込み
+    load_previous: Optional[Callable[[str], Optional[Rows]]] = None  # 前回の行（比較用）
+    encoding: Optional[str] = None  # レスポンスの文字コードを明示する場合（例: "shift_jis"）
+    enrich: Optional[Callable[["SlotRun", Rows], Rows]] = None  # 行への付加情報（失敗しても続行）
+
+
+@dataclass
+class SlotRun:
+    """1スロット分の実行状態。各段が順に埋めていく。"""
+
+    source: Source
+    variant: str
+    slot_time: str
+    url: str
+    metrics: RunMetrics
+    previous: Optional[Rows] = None
+    response: Any = None
+    rows: Rows = field(default_factory=list)
+    datetime_str: str = ""
+    data: Dict[str, Any] = field(default_factory=dict)
+    filepath: Any = None
+    error: Optional[BaseException] = None
+    notify_errors: bool = True
+
+    @property
+    def target(self) -> str:
+        return self.source.stream_target or self.variant
+
+    def dedupe_key(self, suffix: str = "") -> str:
+        key = f"{self.source.name}:{self.variant}:{self.datetime_str}"
+        return f"{key}:{suffix}" if suffix else key
+
+
+Stage = Callable[[Iterable[SlotRun]], Iterator[SlotRun]]
+
+
+def _fail(run: SlotRun, exc: Exception) -> None:
+    """取得失敗を記録して以降の段を飛ばし、エラー通知を登録する。"""
+
+    run.error = exc
+    if not run.notify_errors:
+        return
+    run.datetime_str = datetime.datetime.now(JST).strftime(DATETIME_FORMAT)
+    message = run.source.format_error(run.datetime_str, run.variant, str(exc), run.slot_time)
+    with run.metrics.stage("notify"):
+        enqueue_notification(message, run.dedupe_key("error"))
+    logger.error("スクレイピングに失敗しました: %s", exc)
+
+
+# ===========================
+# 段（ジェネレータ）
+# ===========================
+
+
+def load_previous(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """前回の行を読み込む（``Source.load_previous`` がある取得元のみ）。"""
+
+    for run in runs:
+        if run.error is None and run.source.load_previous is not None:
+            with run.metrics.stage("load_previous") as stage:
+                run.previous = run.source.load_previous(run.variant)
+                stage.rows = len(run.previous or [])
+        yield run
+
+
+def _fetch_one(run: SlotRun) -> SlotRun:
+    if run.error is None:
+        try:
+            with run.metrics.stage("fetch") as stage:
+                run.response = fetch(run.url, encoding=run.source.encoding, stage=stage)
+        except Exception as exc:
+            _fail(run, exc)
+    return run
+
+
+def fetch_pages(
+    runs: Iterable[SlotRun], workers: int = PIPELINE_FETCH_WORKERS
+) -> Iterator[SlotRun]:
+    """ページを取得する。複数スロットは共有セッション上で並行に取得し、入力順に流す。"""
+
+    batch = list(runs)
+    if len(batch) <= 1 or workers <= 1:
+        yield from map(_fetch_one, batch)
+        return
+    with ThreadPoolExecutor(
+        max_workers=min(workers, len(batch)), thread_name_prefix="pipeline-fetch"
+    ) as pool:
+        yield from pool.map(_fetch_one, batch)
+
+
+def parse_pages(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """取得元のパーサで行を抽出する。"""
+
+    for run in runs:
+        if run.error is None:
+            try:
+                with run.metrics.stage("parse") as stage:
+                    run.rows = run.source.parse(run.response)
+                    stage.rows = len(run.rows)
+            except Exception as exc:
+                _fail(run, exc)
+        yield run
+
+
+def normalize_rows(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """保存・通知する行に絞り込む（``Source.select``）。"""
+
+    for run in runs:
+        if run.error is None:
+            try:
+                with run.metrics.stage("normalize") as stage:
+                    if run.source.select is not None:
+                        run.rows = run.source.select(run.rows)
+                    if not run.rows:
+                        raise ValueError("ランキングデータが取得できませんでした")
+                    stage.rows = len(run.rows)
+            except Exception as exc:
+                _fail(run, exc)
+            else:
+                logger.info("ランキングデータ取得: %s %d件", run.variant, len(run.rows))
+        yield run
+
+
+def enrich_rows(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """行に取得元固有の付加情報を付ける（``Source.enrich``）。失敗しても行はそのまま流す。"""
+
+    for run in runs:
+        if run.error is None and run.source.enrich is not None:
+            with run.metrics.stage("enrich") as stage:
+                try:
+                    run.rows = run.source.enrich(run, run.rows)
+                except Exception as exc:
+                    logger.warning("付加情報の付与に失敗したため省略します: %s (%s)", run.variant, exc)
+                stage.rows = len(run.rows)
+        yield run
+
+
+def build_snapshot(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """保存用のデータ（取得日時・スロット・行）を組み立てる。"""
+
+    for run in runs:
+        if run.error is None:
+            now = datetime.datetime.now(JST)
+            run.datetime_str = now.strftime(DATETIME_FORMAT)
+            run.data = {
+                "datetime": run.datetime_str,
+                "slot_time": run.slot_time,
+                run.source.variant_field: run.variant,
+                "url": run.url,
+                "scraped_at": now.isoformat(),
+                "rankings": run.rows,
+            }
+        yield run
+
+
+def publish_changes(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """解析直後に差分を変更ストリームへ配信する（常駐スケジューラ実行時のみ）。"""
+
+    for run in runs:
+        if run.error is None:
+            publish_diff(run.target, run.datetime_str, run.rows, run.previous)
+        yield run
+
+
+def store(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """取得元の保存処理で JSON を書き出す。"""
+
+    for run in runs:
+        if run.error is None:
+            with run.metrics.stage("save") as stage:
+                run.filepath = run.source.save(run.data, run.variant)
+                run.metrics.snapshot = str(run.filepath)
+                stage.bytes = Path(run.filepath).stat().st_size
+                stage.rows = len(run.rows)
+        yield run
+
+
+def persist(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """保存したファイルをまとめコミット（git_batch.py、常駐時のみ有効）の対象に記録する。"""
+
+    for run in runs:
+        if run.error is None:
+            record_for_commit(run.filepath)
+        yield run
+
+
+def evaluate_alerts(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """ユーザー定義のアラートルールを評価する（一致分は別通知）。"""
+
+    for run in runs:
+        if run.error is None:
+            with run.metrics.stage("alerts") as stage:
+                alerts = evaluate_snapshot(run.target, run.datetime_str, run.rows)
+                stage.rows = len(alerts)
+                if alerts:
+                    enqueue_notification(
+                        format_alert_message(run.datetime_str, alerts),
+                        run.dedupe_key("alerts"),
+                    )
+        yield run
+
+
+def notify(runs: Iterable[SlotRun]) -> Iterator[SlotRun]:
+    """全体向けメッセージと購読者向けサマリーをアウトボックスへ登録する。"""
+
+    for run in runs:
+        if run.error is None:
+            message = run.source.format_success(run, run.rows)
+            # 購読者向けは上位のみのサマリー＋各自のウォッチリスト該当分
+            summary = run.source.format_success(run, run.rows[:SUBSCRIPTION_SUMMARY_TOP])
+            lag_alert = evaluate_run(run.target, run.data)
+            # 送信はアウトボックス（notification_outbox.py）が行うため登録のみで戻る
+            with run.metrics.stage("notify") as stage:
+                stage.bytes = len(message.encode("utf-8"))
+                stage.rows = enqueue_for_subscribers(
+                    message,
+                    summary,
+                    run.rows,
+                    run.dedupe_key(),
+                    operator_note=lag_alert,
+                )
+        yield run
+
+
+STAGES: Tuple[Stage, ...] = (
+    load_previous,
+    fetch_pages,
+    parse_pages,
+    normalize_rows,
+    enrich_rows,
+    build_snapshot,
+    publish_changes,
+    store,
+    persist,
+    evaluate_alerts,
+    notify,
+)
+
+SCRAPE_STAGES: Tuple[Stage, ...] = (fetch_pages, parse_pages, normalize_rows)
+
+
+def run_pipeline(
+    runs: Iterable[SlotRun], stages: Sequence[Stage] = STAGES
+) -> Iterator[SlotRun]:
+    """段を順に連結し、処理済みの ``SlotRun`` を流す。"""
+
+    return reduce(lambda stream, stage: stage(stream), stages, iter(runs))
+
+
+# ===========================
+# 入口
+# ===========================
+
+
+def scrape(source: Source, variant: str, url: str, metrics: RunMetrics) -> Rows:
+    """
+    取得・解析・絞り込みのみを行い、行を返す（保存・通知なし）。
+
+    各スクリプトの ``scrape_*`` 関数（ライブ取得など）から使う。
+    失敗時はエラー通知を登録せず、例外をそのまま送出する。
+    """
+    run = SlotRun(source, variant, "", url, metrics, notify_errors=False)
+    for run in run_pipeline([run], SCRAPE_STAGES):
+        if run.error is not None:
+            raise run.error
+    return run.rows
+
+
+def current_slot(
+    slots: Dict[str, str], now: Optional[datetime.datetime] = None
+) -> Optional[Tuple[str, str]]:
+    """
+    ``slots``（HH:MM → スロット識別子）のうち、現在時刻以前で最新のスロットを返す。
+
+    GitHub Actions の遅延により実行時刻が大きくずれても同日のスロットを割り当てる
+    （許容幅制限なし）。まだ最初のスロット前であれば ``None`` を返す。
+
+    Examples:
+        >>> slots = {"11:45": "midday", "16:00": "close"}
+        >>> current_slot(slots, datetime.datetime(2025, 11, 4, 9, 20, tzinfo=JST)) is None
+        True
+        >>> current_slot(slots, datetime.datetime(2025, 11, 4, 13, 0, tzinfo=JST))
+        ('midday', '11:45')
+        >>> current_slot(slots, datetime.datetime(2025, 11, 4, 16, 12, tzinfo=JST))
+        ('close', '16:00')
+
+    Returns:
+        Optional[Tuple[str, str]]: (スロット識別子, 時刻文字列) または None
+    """
+    now = now or datetime.datetime.now(JST)
+    current_time = now.strftime("%H:%M")
+    if not slots:
+        logger.warning("スロットが定義されていないため、実行時間帯を判定できません。")
+        return None
+
+    # HH:MM はゼロ埋めのため文字列の比較で時刻順になる
+    ordered = sorted(slots.items())
+    past_slots = [(time_str, variant) for time_str, variant in ordered if time_str <= current_time]
+    if not past_slots:
+        logger.info(
+            "現在時刻 %s は最初の実行時間帯 %s より前のためスキップします。",
+            current_time,
+            ordered[0][0],
+        )
+        return None
+
+    time_str, variant = past_slots[-1]
+    logger.info(
+        "現在時刻 %s は %s の実行時間帯として処理します（許容幅制限なし）", current_time, time_str
+    )
+    return variant, time_str
+
+
+def run_slots(
+    requests: Sequence[Tuple[Source, str, str]]
+) -> List[Optional[Any]]:
+    """
+    複数スロットをまとめて実行する（実行権の取得 → パイプライン → 実行レポート）。
+
+    取得は ``fetch_pages`` で並行に行われる。失敗したスロットは実行権を返して
+    再実行で取り直せるようにし、すべてのスロットを後始末したあと最初の例外を送出する。
+
+    Args:
+        requests: (取得元, スロット識別子, 予定スロット時刻 HH:MM) の列
+
+    Returns:
+        List[Optional[Any]]: スロットごとの保存パス。重複実行でスキップした場合は None
+    """
+    runs: List[SlotRun] = []
+    claims: Dict[int, Tuple[int, Any]] = {}
+    results: List[Optional[Any]] = [None] * len(requests)
+    # URL 未定義（KeyError）は実行権を取る前に検出する
+    urls = [source.url(variant) for source, variant, _ in requests]
+    for index, (source, variant, slot_time) in enumerate(requests):
+        # スロット実行権を原子的に取得（取得済み・実行中ならスキップ）
+        claim = try_claim(variant, slot_time)
+        if claim is None:
+            logger.info("重複実行を防止するため処理を終了します。")
+            continue
+        metrics = RunMetrics(source.name)
+        metrics.set_slot(variant, slot_time)
+        run = SlotRun(source, variant, slot_time, urls[index], metrics)
+        claims[id(run)] = (index, claim)
+        runs.append(run)
+
+    # 最後の段（notify）まで通過したスロットだけを完了として扱う
+    completed: Set[int] = set()
+    failure: Optional[BaseException] = None
+    try:
+        for run in run_pipeline(runs):
+            if run.error is None:
+                completed.add(id(run))
+    except BaseException as exc:  # 後始末のあと送出する
+        failure = exc
+
+    for run in runs:
+        index, claim = claims[id(run)]
+        run.metrics.finish()
+        run.metrics.write_report(run.source.report_dir(run.variant))
+        if id(run) not in completed:
+            # 失敗したスロットは再実行で取り直せるよう実行権を返す
+            claim.release()
+            failure = failure or run.error
+            continue
+        claim.complete(run.filepath)
+        logger.info("JSONファイルを保存しました: %s", run.filepath)
+        results[index] = run.filepath
+
+    if failure is not None:
+        raise failure
+    return results
+
+
+def run_slot(source: Source, variant: str, slot_time: str) -> Optional[Any]:
+    """
+    指定スロットを1回実行する（重複チェック → 取得 → 保存 → 通知 → 実行レポート）。
+
+    Returns:
+        Optional[Any]: 保存したファイルパス。重複実行でスキップした場合は None
+    """
+    return run_slots([(source, variant, slot_time)])[0]
@@ -0,0 +1,247 @@
+"""
+立会時間に連動したポーリング間隔の計画
+
+東証の立会時間（``TSE_SESSIONS``）と ``POLL_CADENCE`` に従い、寄り付き直後・引け間際は
+数秒間隔、ザラ場中盤は粗く取得し、昼休み・引け後・休場日（土日祝・年末年始）・
+半日立会日の後場は取得しません。固定間隔で終日取得する場合に比べて
+リクエスト数を大きく減らしつつ、値動きの大きい時間帯の分解能を上げます。
+
+常駐スケジューラの ``--live`` で使われ、取得結果の差分は変更ストリーム（SSE）へ配信されます。
+取得結果は日中ログ（キーフレーム＋デルタ、delta_store.py）へ保存されます（``INTRADAY_STORAGE``）。
+
+使い方:
+    python polling_cadence.py                       # 今日の計画
+    python polling_cadence.py --date 2025-11-04 --compare 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from check_workday import is_trading_day
+from config import (
+    INTRADAY_STORAGE,
+    MARKET_CLOSED_DAYS,
+    MARKET_HALF_DAYS,
+    POLL_CADENCE,
+    TSE_SESSIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+
+# 次回の取得時刻を探す最大日数（年末年始の連休を考慮）
+MAX_LOOKAHEAD_DAYS = 14
+
+# ライブ取得のキー（同一分内に複数回取得するため秒まで含める）
+LIVE_KEY_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def _parse_time(value: str) -> datetime.time:
+    hour, minute = map(int, value.split(":"))
+    return datetime.time(hour, minute)
+
+
+@dataclass(frozen=True)
+class CadenceWindow:
+    """同じ間隔で取得する時間帯（``start`` 以上 ``end`` 未満）。"""
+
+    start: datetime.time
+    end: datetime.time
+    interval: int  # 秒
+    target: str  # URLS のキー
+
+    def bounds(self, date: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+        return (
+            datetime.datetime.combine(date, self.start, tzinfo=JST),
+            datetime.datetime.combine(date, self.end, tzinfo=JST),
+        )
+
+
+WINDOWS = tuple(
+    CadenceWindow(_parse_time(start), _parse_time(end), int(interval), target)
+    for start, end, interval, target in POLL_CADENCE
+)
+
+
+def is_market_day(date: datetime.date) -> bool:
+    """
+    東証の立会がある日かを返す（土日祝に加え年末年始の休場日を除外）。
+
+    Examples:
+        >>> is_market_day(datetime.date(2025, 11, 4))
+        True
+        >>> is_market_day(datetime.date(2025, 12, 31))
+        False
+    """
+    return is_trading_day(date) and date.strftime("%m-%d") not in MARKET_CLOSED_DAYS
+
+
+def is_half_day(date: datetime.date) -> bool:
+    """前場のみの半日立会日かを返す。"""
+
+    return date.isoformat() in MARKET_HALF_DAYS
+
+
+def windows_for(date: datetime.date) -> List[CadenceWindow]:
+    """
+    指定日の取得時間帯を返す（休場日は空、半日立会日は前場のみ）。
+
+    Examples:
+        >>> [w.target for w in windows_for(datetime.date(2025, 11, 4))][:2]
+        ['morning', 'morning']
+        >>> windows_for(datetime.date(2025, 11, 3))  # 文化の日
+        []
+    """
+    if not is_market_day(date):
+        return []
+    if is_half_day(date):
+        return [window for window in WINDOWS if window.target == "morning"]
+    return list(WINDOWS)
+
+
+def next_poll(now: datetime.datetime) -> Tuple[datetime.datetime, str]:
+    """
+    ``now`` 以降で最初の取得時刻と取得対象を返す。
+
+    各時間帯の中では開始時刻から ``interval`` 秒刻みの格子に揃える。
+
+    Examples:
+        >>> at, target = next_poll(datetime.datetime(2025, 11, 4, 9, 0, 2, tzinfo=JST))
+        >>> at.strftime("%H:%M:%S"), target
+        ('09:00:05', 'morning')
+        >>> at, target = next_poll(datetime.datetime(2025, 11, 4, 11, 45, tzinfo=JST))
+        >>> at.strftime("%H:%M:%S"), target
+        ('12:29:00', 'afternoon')
+    """
+    for offset in range(MAX_LOOKAHEAD_DAYS + 1):
+        date = now.date() + datetime.timedelta(days=offset)
+        for window in windows_for(date):
+            start, end = window.bounds(date)
+            if now >= end:
+                continue
+            if now <= start:
+                return start, window.target
+            elapsed = (now - start).total_seconds()
+            ticks = -(-elapsed // window.interval)  # 切り上げ
+            at = start + datetime.timedelta(seconds=ticks * window.interval)
+            if at < end:
+                return at, window.target
+    raise RuntimeError(f"{MAX_LOOKAHEAD_DAYS}日以内に取得予定がありません。")
+
+
+def plan_day(date: datetime.date) -> List[Tuple[datetime.datetime, str]]:
+    """指定日の取得時刻と対象をすべて返す。"""
+
+    polls = []
+    for window in windows_for(date):
+        at, end = window.bounds(date)
+        step = datetime.timedelta(seconds=window.interval)
+        while at < end:
+            polls.append((at, window.target))
+            at += step
+    return polls
+
+
+def fixed_interval_count(date: datetime.date, interval: int) -> int:
+    """立会開始から終了まで固定間隔で取得し続けた場合のリクエスト数（比較用）。"""
+
+    if not is_market_day(date):
+        return 0
+    opened = min(_parse_time(start) for start, _ in TSE_SESSIONS.values())
+    closed = max(_parse_time(end) for _, end in TSE_SESSIONS.values())
+    span = datetime.datetime.combine(date, closed) - datetime.datetime.combine(date, opened)
+    return int(span.total_seconds() // interval)
+
+
+def poll_once(target: str, now: Optional[datetime.datetime] = None) -> bool:
+    """ランキングを1回取得して日中ログへ保存し、変化があれば変更ストリームへ配信する。配信したら True。"""
+
+    # ライブ取得時のみ必要なため遅延インポート
+    from change_stream import publish_diff
+    from config import URLS
+    from scrape_rankings import scrape_ranking
+
+    now = now or datetime.datetime.now(JST)
+    key = now.strftime(LIVE_KEY_FORMAT)
+    rows = scrape_ranking(URLS[target])
+    if INTRADAY_STORAGE:
+        from delta_store import STORE, log_path
+        from git_batch import record
+
+        snapshot = {
+            "datetime": key,
+            "target": target,
+            "url": URLS[target],
+            "scraped_at": now.isoformat(),
+            "rankings": rows,
+        }
+        STORE.append(target, key, snapshot, now.date())
+        record(log_path(target, now.date()))
+    event = publish_diff(target, key, rows, skip_unchanged=True)
+    return event is not None
+
+
+def run_live(stop: threading.Event) -> None:
+    """停止要求があるまで計画どおりに取得を繰り返す。取得失敗は次の時刻で再試行する。"""
+
+    while not stop.is_set():
+        at, target = next_poll(datetime.datetime.now(JST))
+        remaining = (at - datetime.datetime.now(JST)).total_seconds()
+        # 長い待機中も停止要求と壁時計のずれに追従する
+        if remaining > 0 and stop.wait(min(remaining, 60)):
+            break
+        if datetime.datetime.now(JST) < at:
+            continue
+        try:
+            poll_once(target, at)
+        except Exception as exc:
+            logger.warning("ライブ取得に失敗しました: %s %s: %s", target, at.strftime("%H:%M:%S"), exc)
+
+
+def start_live_poller(stop: threading.Event) -> threading.Thread:
+    """ライブ取得をバックグラウンドスレッドで開始する。"""
+
+    thread = threading.Thread(target=run_live, args=(stop,), name="live-poller", daemon=True)
+    thread.start()
+    logger.info("ライブ取得を開始しました（%d 時間帯）", len(WINDOWS))
+    return thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="立会時間に連動した取得計画の表示")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument(
+        "--compare", type=int, default=None, help="固定間隔（秒）で取得した場合のリクエスト数と比較"
+    )
+    args = parser.parse_args()
+
+    date = args.date or datetime.datetime.now(JST).date()
+    windows = windows_for(date)
+    if not windows:
+        print(f"{date}: 休場日のため取得しません")
+        return
+
+    polls = plan_day(date)
+    print(f"{date}: {len(polls)} 回{'（半日立会）' if is_half_day(date) else ''}")
+    for window in windows:
+        start, end = window.bounds(date)
+        count = sum(1 for at, _ in polls if start <= at < end)
+        print(
+            f"  {window.start:%H:%M}-{window.end:%H:%M} {window.target:<9} "
+            f"{window.interval:>3}秒間隔 {count:>4} 回"
+        )
+    if args.compare:
+        fixed = fixed_interval_count(date, args.compare)
+        print(f"固定 {args.compare} 秒間隔: {fixed} 回（計画は {len(polls) / fixed:.0%}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+オンデマンド・プロファイリングモジュール
+
+環境変数 ``SCRAPER_PROFILE`` またはコマンドライン引数 ``--profile`` で有効化し、
+エントリポイントの実行全体を cProfile / tracemalloc で計測します。
+
+出力（``PROFILE_DIR`` 配下、``<name>_<YYYYMMDD_HHMMSS>`` をプレフィックスとする）:
+    - ``.pstats``      : cProfile の生データ（``python -m pstats`` や snakeviz で閲覧）
+    - ``.pstats.txt``  : 累積時間順の上位関数
+    - ``.collapsed``   : スタックサンプリング結果（flamegraph.pl / speedscope 形式）
+    - ``.alloc.txt``   : tracemalloc によるメモリ確保元の上位
+"""
+
+from __future__ import annotations
+
+import cProfile
+import datetime
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Set
+from zoneinfo import ZoneInfo
+
+from config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_TOP_N
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILE_ROOT = BASE_DIR / PROFILE_DIR
+
+PROFILE_ENV = "SCRAPER_PROFILE"
+ALL_MODES = {"cpu", "mem"}
+
+
+def profile_modes(argv: Optional[Sequence[str]] = None) -> Set[str]:
+    """
+    有効なプロファイルモードを返す。
+
+    ``SCRAPER_PROFILE`` または ``--profile[=cpu,mem]`` を解釈する。
+    値が ``1`` / ``all`` / 空（``--profile`` のみ）の場合は cpu と mem の両方。
+
+    Examples:
+        >>> sorted(profile_modes(["--profile=mem"]))
+        ['mem']
+    """
+    values: List[str] = []
+    env_value = os.environ.get(PROFILE_ENV, "").strip()
+    if env_value:
+        values.append(env_value)
+    for arg in argv or ():
+        if arg == "--profile":
+            values.append("all")
+        elif arg.startswith("--profile="):
+            values.append(arg.split("=", 1)[1] or "all")
+
+    modes: Set[str] = set()
+    for value in values:
+        for token in value.lower().split(","):
+            token = token.strip()
+            if token in ("1", "true", "yes", "all"):
+                modes |= ALL_MODES
+            elif token in ALL_MODES:
+                modes.add(token)
+            elif token and token not in ("0", "false", "no"):
+                logger.warning("不明なプロファイルモードを無視します: %s", token)
+    return modes
+
+
+class StackSampler:
+    """指定スレッドのスタックを一定間隔で採取し、collapsed 形式で集計する。"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL) -> None:
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.samples: Counter = Counter()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, filepath: Path) -> None:
+        """flamegraph.pl 互換の collapsed stack ファイルを書き出す。"""
+
+        with filepath.open("w", encoding="utf-8") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+def _write_pstats(profiler: cProfile.Profile, prefix: Path) -> None:
+    profiler.dump_stats(str(prefix.with_suffix(".pstats")))
+    buffer = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buffer)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    prefix.with_suffix(".pstats.txt").write_text(buffer.getvalue(), encoding="utf-8")
+
+
+def _write_allocations(snapshot: tracemalloc.Snapshot, filepath: Path) -> None:
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+    lines = ["# 確保元の上位（行単位）"]
+    for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]:
+        lines.append(str(stat))
+    lines.append("")
+    lines.append("# 確保元の上位（トレースバック単位）")
+    for stat in snapshot.statistics("traceback")[:PROFILE_TOP_N]:
+        lines.append(f"{stat.size / 1024:.1f} KiB / {stat.count} blocks")
+        lines.extend(f"    {line}" for line in stat.traceback.format())
+    filepath.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@contextmanager
+def profiled(
+    name: str,
+    modes: Optional[Set[str]] = None,
+    output_dir: Optional[Path] = None,
+) -> Iterator[None]:
+    """
+    ブロック全体を cProfile / tracemalloc で計測するコンテキストマネージャ。
+
+    Args:
+        name: 出力ファイル名のプレフィックス（エントリポイント名）
+        modes: {"cpu", "mem"} の部分集合（省略時は ``profile_modes()``）
+        output_dir: 出力ディレクトリ（省略時は ``PROFILE_DIR``）
+
+    使い方:
+        with profiled("scrape_rankings", profile_modes(sys.argv[1:])):
+            main()
+    """
+    if modes is None:
+        modes = profile_modes()
+    if not modes:
+        yield
+        return
+
+    output_dir = output_dir or PROFILE_ROOT
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.datetime.now(JST).strftime("%Y%m%d_%H%M%S")
+    prefix = output_dir / f"{name}_{stamp}"
+
+    profiler: Optional[cProfile.Profile] = None
+    sampler: Optional[StackSampler] = None
+    if "mem" in modes:
+        tracemalloc.start(25)
+    if "cpu" in modes:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    logger.info("プロファイリングを開始します: %s (%s)", name, ",".join(sorted(modes)))
+    try:
+        yield
+    finally:
+        if profiler is not None and sampler is not None:
+            profiler.disable()
+            sampler.stop()
+            _write_pstats(profiler, prefix)
+            sampler.write(prefix.with_suffix(".collapsed"))
+        if "mem" in modes:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            _write_allocations(snapshot, prefix.with_suffix(".alloc.txt"))
+        logger.info("プロファイル結果を出力しました: %s.*", prefix)
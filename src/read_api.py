@@ -0,0 +1,285 @@
+"""
+スナップショット読み取り API
+
+``data/`` 配下のスナップショットをローカル HTTP で配信します。ダッシュボード等は
+``git pull`` とファイル走査の代わりにこの API をポーリングできます。
+
+エンドポイント（すべて GET、JSON）:
+    /targets                                   対象ごとの件数と最新キー
+    /latest/<target>                           最新スナップショット
+    /snapshots/<target>/<YYYYMMDD_HHMM>        キー指定のスナップショット
+    /snapshots/<target>?from=&to=&limit=&include=data
+                                               範囲検索（from / to は YYYYMMDD または
+                                               YYYYMMDD_HHMM、両端を含む）
+
+レスポンスは本文・gzip 済み本文・ETag を組にしてメモリにキャッシュし、対象ディレクトリの
+更新（新しいスナップショットの保存）を検知したものだけ作り直します。
+``If-None-Match`` が一致すれば 304 を返し、``Accept-Encoding: gzip`` には圧縮済み本文を返します。
+
+使い方:
+    python read_api.py                 # http://127.0.0.1:8765
+    python read_api.py --port 9000
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from config import READ_API_CACHE_SIZE, READ_API_HOST, READ_API_MAX_RANGE, READ_API_PORT
+from snapshot_store import SNAPSHOT_SOURCES, SnapshotRef, list_snapshots, load_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    """HTTP エラーとして返す例外。"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """キャッシュ済みレスポンス。"""
+
+    version: Tuple[int, ...]
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+
+def _encode(payload: Any, version: Tuple[int, ...]) -> CachedResponse:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+    return CachedResponse(version, body, gzip.compress(body, compresslevel=6), etag)
+
+
+class SnapshotIndex:
+    """対象ごとのスナップショット一覧。ディレクトリの更新時刻が変わった時だけ作り直す。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[int, List[SnapshotRef], List[str]]] = {}
+
+    @staticmethod
+    def _mtime(target: str) -> int:
+        directory, _ = SNAPSHOT_SOURCES[target]
+        try:
+            return os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def get(self, target: str) -> Tuple[int, List[SnapshotRef], List[str]]:
+        """(バージョン, 参照一覧, キー一覧) を返す。"""
+
+        if target not in SNAPSHOT_SOURCES:
+            raise ApiError(404, f"unknown target: {target}")
+
+        mtime = self._mtime(target)
+        with self._lock:
+            entry = self._entries.get(target)
+            if entry is not None and entry[0] == mtime:
+                return entry
+        refs = list_snapshots(target)
+        entry = (mtime, refs, [ref.key for ref in refs])
+        with self._lock:
+            self._entries[target] = entry
+        return entry
+
+
+class ReadApi:
+    """パス → レスポンスの解決とキャッシュ。"""
+
+    def __init__(self, cache_size: int = READ_API_CACHE_SIZE) -> None:
+        self.index = SnapshotIndex()
+        self._cache: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def _cached(self, cache_key: str, version: Tuple[int, ...]) -> Optional[CachedResponse]:
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is None or cached.version != version:
+                return None
+            self._cache.move_to_end(cache_key)
+            return cached
+
+    def _store(self, cache_key: str, response: CachedResponse) -> CachedResponse:
+        with self._lock:
+            self._cache[cache_key] = response
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return response
+
+    def resolve(self, path: str, query: str) -> CachedResponse:
+        """
+        リクエストパスに対応するレスポンスを返す。
+
+        Raises:
+            ApiError: パス・パラメータが不正、または対象が存在しない場合
+        """
+        parts = [part for part in path.split("/") if part]
+        cache_key = f"{path}?{query}"
+
+        if parts == ["targets"]:
+            version = tuple(self.index.get(target)[0] for target in SNAPSHOT_SOURCES)
+            return self._cached(cache_key, version) or self._store(
+                cache_key, _encode(self._targets(), version)
+            )
+
+        if len(parts) in (2, 3) and parts[0] in ("latest", "snapshots"):
+            target = parts[1]
+            mtime, refs, keys = self.index.get(target)
+            version = (mtime,)
+            cached = self._cached(cache_key, version)
+            if cached is not None:
+                return cached
+
+            if parts[0] == "latest" and len(parts) == 2:
+                if not refs:
+                    raise ApiError(404, f"no snapshot for target: {target}")
+                payload = self._snapshot_payload(refs[-1])
+            elif parts[0] == "snapshots" and len(parts) == 3:
+                position = bisect.bisect_left(keys, parts[2])
+                if position == len(keys) or keys[position] != parts[2]:
+                    raise ApiError(404, f"snapshot not found: {target}/{parts[2]}")
+                payload = self._snapshot_payload(refs[position])
+            elif parts[0] == "snapshots":
+                payload = self._range(refs, keys, parse_qs(query))
+            else:
+                raise ApiError(404, f"not found: {path}")
+            return self._store(cache_key, _encode(payload, version))
+
+        raise ApiError(404, f"not found: {path}")
+
+    def _targets(self) -> Dict[str, Any]:
+        result = {}
+        for target in SNAPSHOT_SOURCES:
+            _, refs, _ = self.index.get(target)
+            result[target] = {"count": len(refs), "latest": refs[-1].key if refs else None}
+        return result
+
+    @staticmethod
+    def _snapshot_payload(ref: SnapshotRef) -> Dict[str, Any]:
+        data = load_snapshot(ref)
+        if data is None:
+            raise ApiError(500, f"failed to load snapshot: {ref.target}/{ref.key}")
+        return {"target": ref.target, "key": ref.key, "data": data}
+
+    def _range(
+        self, refs: List[SnapshotRef], keys: List[str], params: Dict[str, List[str]]
+    ) -> Dict[str, Any]:
+        start_key = params.get("from", [""])[0]
+        end_key = params.get("to", [""])[0]
+        include_data = params.get("include", [""])[0] == "data"
+        try:
+            limit = min(int(params.get("limit", [READ_API_MAX_RANGE])[0]), READ_API_MAX_RANGE)
+        except ValueError as exc:
+            raise ApiError(400, "limit must be an integer") from exc
+
+        # 日付のみ（YYYYMMDD）の to はその日の最後まで含める
+        if len(end_key) == 8:
+            end_key += "_9999"
+        lo = bisect.bisect_left(keys, start_key) if start_key else 0
+        hi = bisect.bisect_right(keys, end_key) if end_key else len(keys)
+        selected = refs[lo:hi][-limit:] if limit > 0 else []
+
+        items = []
+        for ref in selected:
+            item: Dict[str, Any] = {"key": ref.key}
+            if include_data:
+                item["data"] = self._snapshot_payload(ref)["data"]
+            items.append(item)
+        return {"count": len(items), "total": hi - lo, "items": items}
+
+
+class ReadApiHandler(BaseHTTPRequestHandler):
+    """読み取り API のリクエストハンドラ。"""
+
+    server_version = "StockMarketReadAPI/1.0"
+    api: ReadApi  # serve() で設定する
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        try:
+            response = self.api.resolve(url.path, url.query)
+        except ApiError as exc:
+            self._send_error(exc.status, str(exc))
+            return
+
+        if self.headers.get("If-None-Match") == response.etag:
+            self.send_response(304)
+            self.send_header("ETag", response.etag)
+            self.end_headers()
+            return
+
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        body = response.gzip_body if use_gzip else response.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", response.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 親クラスの引数名
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def serve(host: str = READ_API_HOST, port: int = READ_API_PORT) -> ThreadingHTTPServer:
+    """読み取り API サーバーを生成する（``serve_forever()`` は呼び出し側で実行）。"""
+
+    handler = type("BoundReadApiHandler", (ReadApiHandler,), {"api": ReadApi()})
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info("読み取り API を起動しました: http://%s:%d/", host, server.server_port)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="スナップショット読み取り API")
+    parser.add_argument("--host", default=READ_API_HOST)
+    parser.add_argument("--port", type=int, default=READ_API_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    server = serve(args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("読み取り API を停止します。")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
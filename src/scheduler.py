@@ -0,0 +1,282 @@
+"""
+常駐スケジューラ
+
+GitHub Actions の cron の代わりに1プロセスを常駐させ、``TIME_SLOTS`` /
+``SECTOR_TIME_SLOTS`` の各スロットをプロセス内で実行します。
+
+スロット時刻の ``PREWARM_SECONDS`` 秒前に以下を済ませておき、スロット開始時点では
+取得・解析・通知がコールドスタートのコストを含まないようにします。
+    - DNS 解決（TTL 付きキャッシュ）と対象ホスト・LINE API への TLS 接続確立
+    - BeautifulSoup / lxml パーサの初期化（最小HTMLを1回パース）
+
+LINE 通知はスロット実行とは別スレッドで通知アウトボックスから送信します。
+``--stream-port`` 指定時は、各スロットの解析直後にランキング差分を SSE で配信します
+（change_stream.py）。
+``--live`` を併用すると、立会時間中は polling_cadence.py の計画に従ってランキングを
+取得し続け、変化があるたびに差分を配信します（スナップショットの保存・通知は行わない）。
+``--git-batch`` 指定時は保存したデータを取得ごとではなく ``GIT_BATCH_INTERVAL_SECONDS``
+ごとと停止時にまとめてコミット・push します（git_batch.py）。
+
+使い方:
+    python scheduler.py                      # 常駐実行
+    python scheduler.py --metrics-port 9108  # Prometheus メトリクスも公開
+    python scheduler.py --stream-port 8766   # ランキング差分を SSE で配信
+    python scheduler.py --stream-port 8766 --live  # 立会中のライブ取得も行う
+    python scheduler.py --queue              # スロットをジョブキューに登録（実行はワーカー）
+    python scheduler.py --git-batch          # データを10分ごとにまとめてコミット・push
+    python scheduler.py --list               # 次回以降のスロット予定を表示
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import logging
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+# scrape_rankings がルートロガーに JST フォーマッタを設定するため先に読み込む
+import scrape_rankings
+import scrape_sector_rankings
+from change_stream import start_stream_server
+from config import (
+    GIT_BATCH_INTERVAL_SECONDS,
+    LINE_MESSAGING_API_PUSH,
+    PREWARM_SECONDS,
+    SECTOR_TIME_SLOTS,
+    SECTOR_URL,
+    TIME_SLOTS,
+    URLS,
+)
+from git_batch import start_batcher
+from http_client import prewarm
+from job_queue import JobQueue
+from metrics import start_metrics_server
+from notification_outbox import start_sender
+from polling_cadence import start_live_poller
+
+logger = logging.getLogger(__name__)
+
+JST = scrape_rankings.JST
+
+# 取得が行われない日が続いても次スロットを探す最大日数（年末年始の連休を考慮）
+MAX_LOOKAHEAD_DAYS = 14
+
+# 長時間スリープ中も壁時計を再確認する間隔（秒）
+SLEEP_CHUNK_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class ScheduledSlot:
+    """実行予定のスロット1件。"""
+
+    at: datetime.datetime
+    kind: str  # "ranking" / "sector"
+    slot: str  # morning / afternoon / midday / close
+    slot_time: str  # HH:MM
+
+    @property
+    def label(self) -> str:
+        return f"{self.kind}:{self.slot} {self.at.strftime('%Y-%m-%d %H:%M')}"
+
+
+# 種別 → (スロット実行関数, パーサのウォームアップ関数)
+RUNNERS: Dict[str, Callable[[str, str], object]] = {
+    "ranking": scrape_rankings.run_slot,
+    "sector": scrape_sector_rankings.run_slot,
+}
+PARSER_WARMERS: Dict[str, Callable[[], None]] = {
+    "ranking": scrape_rankings.warm_up_parser,
+    "sector": scrape_sector_rankings.warm_up_parser,
+}
+
+
+def build_schedule(date: datetime.date) -> List[ScheduledSlot]:
+    """指定日のスロット一覧を時刻順で返す（営業日判定は行わない）。"""
+
+    entries = [("ranking", slot, time_str) for time_str, slot in TIME_SLOTS.items()]
+    entries += [("sector", slot, time_str) for time_str, slot in SECTOR_TIME_SLOTS.items()]
+
+    slots = []
+    for kind, slot, time_str in entries:
+        hour, minute = map(int, time_str.split(":"))
+        at = datetime.datetime.combine(date, datetime.time(hour, minute), tzinfo=JST)
+        slots.append(ScheduledSlot(at=at, kind=kind, slot=slot, slot_time=time_str))
+    slots.sort(key=lambda item: item.at)
+    return slots
+
+
+def next_slot(now: datetime.datetime) -> ScheduledSlot:
+    """``now`` より後で最初に来る営業日のスロットを返す。"""
+
+    for offset in range(MAX_LOOKAHEAD_DAYS + 1):
+        date = now.date() + datetime.timedelta(days=offset)
+        if not scrape_rankings.is_trading_day(date):
+            continue
+        for slot in build_schedule(date):
+            if slot.at > now:
+                return slot
+    raise RuntimeError(f"{MAX_LOOKAHEAD_DAYS}日以内に実行予定のスロットが見つかりません。")
+
+
+def prewarm_slot(slot: ScheduledSlot) -> float:
+    """スロットで使う接続とパーサを事前に温め、所要秒数を返す。"""
+
+    started = time.perf_counter()
+    target_url = URLS[slot.slot] if slot.kind == "ranking" else SECTOR_URL
+    prewarm([target_url, LINE_MESSAGING_API_PUSH])
+    try:
+        PARSER_WARMERS[slot.kind]()
+    except Exception as exc:  # ウォームアップ失敗で本番を止めない
+        logger.warning("パーサのウォームアップに失敗しました: %s", exc)
+    elapsed = time.perf_counter() - started
+    logger.info("プリウォーム完了: %s (%.3f秒)", slot.label, elapsed)
+    return elapsed
+
+
+def run_scheduled_slot(slot: ScheduledSlot) -> None:
+    """スロットをプロセス内で実行する。例外はログに残して常駐を継続する。"""
+
+    separator = "=" * 60
+    logger.info(separator)
+    logger.info("スケジュール実行 開始: %s", slot.label)
+    try:
+        RUNNERS[slot.kind](slot.slot, slot.slot_time)
+    except Exception:
+        logger.exception("スケジュール実行に失敗しました: %s", slot.label)
+    finally:
+        logger.info(separator)
+
+
+def _sleep_until(at: datetime.datetime, stop: threading.Event) -> bool:
+    """``at`` まで待機する。停止要求があれば True を返す。"""
+
+    while True:
+        remaining = (at - datetime.datetime.now(JST)).total_seconds()
+        if remaining <= 0:
+            return False
+        if stop.wait(min(remaining, SLEEP_CHUNK_SECONDS)):
+            return True
+
+
+def run_forever(
+    stop: threading.Event,
+    prewarm_seconds: float = PREWARM_SECONDS,
+    queue: Optional[JobQueue] = None,
+) -> None:
+    """
+    停止要求があるまでスロットの待機 → プリウォーム → 実行を繰り返す。
+
+    ``queue`` を渡した場合はスロット時刻にジョブを登録するだけで、実行はワーカー
+    （job_queue.py worker）に任せる（プリウォームも行わない）。
+    """
+
+    while not stop.is_set():
+        slot = next_slot(datetime.datetime.now(JST))
+        logger.info("次回スロット: %s", slot.label)
+
+        if queue is None:
+            if _sleep_until(slot.at - datetime.timedelta(seconds=prewarm_seconds), stop):
+                break
+            prewarm_slot(slot)
+
+        if _sleep_until(slot.at, stop):
+            break
+        if queue is None:
+            run_scheduled_slot(slot)
+        else:
+            queue.enqueue(slot.kind, slot.slot, slot.slot_time, slot.at.date())
+
+    logger.info("スケジューラを停止しました。")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """常駐スケジューラを起動する。"""
+
+    parser = argparse.ArgumentParser(description="ランキング取得の常駐スケジューラ")
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="指定時は Prometheus メトリクスを http://127.0.0.1:<port>/metrics で公開",
+    )
+    parser.add_argument(
+        "--stream-port",
+        type=int,
+        default=None,
+        help="指定時はランキング差分を http://127.0.0.1:<port>/events で SSE 配信",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="立会時間中は取得計画（POLL_CADENCE）に従ってライブ取得し、差分を配信する",
+    )
+    parser.add_argument(
+        "--queue",
+        action="store_true",
+        help="スロットを自プロセスで実行せずジョブキューに登録する（実行は job_queue.py worker）",
+    )
+    parser.add_argument(
+        "--git-batch",
+        action="store_true",
+        help="保存したデータを一定間隔と停止時にまとめてコミット・push する",
+    )
+    parser.add_argument(
+        "--git-interval",
+        type=float,
+        default=GIT_BATCH_INTERVAL_SECONDS,
+        help=f"--git-batch のコミット間隔（秒、既定: {GIT_BATCH_INTERVAL_SECONDS}）",
+    )
+    parser.add_argument(
+        "--prewarm-seconds",
+        type=float,
+        default=PREWARM_SECONDS,
+        help=f"スロット何秒前にプリウォームするか（既定: {PREWARM_SECONDS}）",
+    )
+    parser.add_argument("--list", action="store_true", help="次回以降のスロット予定を表示して終了")
+    args = parser.parse_args(argv)
+    if args.live and args.stream_port is None:
+        parser.error("--live は --stream-port と併用してください")
+
+    if args.list:
+        now = datetime.datetime.now(JST)
+        for _ in range(len(TIME_SLOTS) + len(SECTOR_TIME_SLOTS)):
+            slot = next_slot(now)
+            print(slot.label)
+            now = slot.at
+        return
+
+    stop = threading.Event()
+
+    def _handle_signal(signum: int, _frame: object) -> None:
+        logger.info("シグナル %d を受信しました。停止します。", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port)
+    if args.stream_port is not None:
+        start_stream_server(args.stream_port)
+    if args.live:
+        start_live_poller(stop)
+    start_sender(stop)
+    git_thread = start_batcher(stop, args.git_interval) if args.git_batch else None
+
+    queue = JobQueue() if args.queue else None
+    if queue is not None:
+        logger.info("スケジューラを起動しました（スロットはジョブキューへ登録）")
+    else:
+        logger.info("スケジューラを起動しました（プリウォーム: %.0f秒前）", args.prewarm_seconds)
+    run_forever(stop, args.prewarm_seconds, queue)
+    if git_thread is not None:
+        # 停止時の最後のまとめコミット・push を待つ
+        git_thread.join()
+
+
+if __name__ == "__main__":
+    main()
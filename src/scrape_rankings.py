@@ -9,27 +9,29 @@ import datetime
 import json
 import logging
 import os
+import sys
 import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-import requests
 from bs4 import BeautifulSoup
 from zoneinfo import ZoneInfo
 
+import pipeline
 from config import (
     DATA_DIR,
-    REQUEST_TIMEOUT,
-    RETRY_COUNT,
-    RETRY_DELAYS,
     TIME_SLOTS,
     URLS,
-    USER_AGENT,
 )
+from metrics import RunMetrics
+from profiling import profile_modes, profiled
+from sector_attribution import enrich_rankings
+from snapshot_codec import load_path, write_snapshot
+from snapshot_store import list_snapshots, load_snapshot
+from symbol_master import get_master
 
 JST = ZoneInfo("Asia/Tokyo")
 DATETIME_FORMAT = "%Y%m%d_%H%M"
-JSON_INDENT = 2
 TOP_LIMIT = 10
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_ROOT = BASE_DIR / DATA_DIR
@@ -64,7 +66,9 @@ class JSTFormatter(logging.Formatter):
 
 
 logger = logging.getLogger("scrape_rankings")
-if not logger.handlers:
+# 共通モジュール（http_client 等）のログも同じ書式で出力するためルートに設定する
+_root_logger = logging.getLogger()
+if not _root_logger.handlers:
     handler = logging.StreamHandler()
     handler.setFormatter(
         JSTFormatter(
@@ -72,8 +76,9 @@ if not logger.handlers:
             "%Y-%m-%d %H:%M:%S",
         )
     )
-    logger.addHandler(handler)
+    _root_logger.addHandler(handler)
 logger.setLevel(logging.INFO)
+_root_logger.setLevel(logging.INFO)
 
 
 CHECK_WORKDAY_FALLBACK = False
@@ -110,17 +115,10 @@ try:  # pragma: no cover - 後続チケットで正式実装予定
     from notify_line import (  # type: ignore
         format_error_message,
         format_success_message,
-        send_line_notify,
     )
 except ImportError:
     LINE_NOTIFY_AVAILABLE = False
 
-    def send_line_notify(message: str) -> bool:
-        """LINE Notify 未実装時のフォールバック。"""
-
-        logger.info("LINE通知(未設定): %s", message)
-        return False
-
     def format_success_message(
         datetime_str: str,
         target: str,
@@ -155,82 +153,48 @@ RankingList = List[RankingRecord]
 
 
 def get_current_time_slot() -> Optional[Tuple[str, str]]:
-    """現在時刻にもっとも近い取得対象と設定時刻を返す。
+    """現在時刻以前で最新の取得対象と設定時刻を返す（pipeline.current_slot）。
 
     GitHub Actions の遅延により実行時刻が大きくずれても、同日のスロットを
     優先的に割り当てる。まだ最初のスロット前であれば ``None`` を返す。
     """
 
-    now = datetime.datetime.now(JST)
+    return pipeline.current_slot(TIME_SLOTS)
 
-    slots: List[Tuple[datetime.datetime, str, str]] = []
-    for time_str, target in TIME_SLOTS.items():
-        slot_hour, slot_minute = map(int, time_str.split(":"))
-        slot_time = now.replace(
-            hour=slot_hour,
-            minute=slot_minute,
-            second=0,
-            microsecond=0,
-        )
-        slots.append((slot_time, time_str, target))
 
-    if not slots:
-        logger.warning("TIME_SLOTS が定義されていないため、実行時間帯を判定できません。")
-        return None
+def scrape_ranking(url: str, metrics: Optional[RunMetrics] = None) -> RankingList:
+    """指定URLからランキングデータを取得する。
 
-    # 時刻順に並べたうえで、現在時刻以前の最新スロットのみ採用
-    slots.sort(key=lambda item: item[0])
-    past_slots = [item for item in slots if item[0] <= now]
+    ``metrics`` を渡した場合は fetch / parse / normalize の各ステージを計測する。
+    """
 
-    if not past_slots:
-        next_slot_time, next_time_str, _ = slots[0]
-        logger.info(
-            "現在時刻 %s は最初の実行時間帯 %s より前のためスキップします。",
-            now.strftime("%H:%M"),
-            next_time_str,
-        )
-        return None
+    if metrics is None:
+        metrics = RunMetrics("scrape_ranking")
 
-    slot_time, time_str, target = past_slots[-1]
+    return pipeline.scrape(SOURCE, "", url, metrics)
 
-    logger.info(
-        "現在時刻 %s は %s の実行時間帯として処理します（許容幅制限なし）",
-        now.strftime("%H:%M"),
-        time_str,
-    )
-    return target, time_str
 
+# パーサのウォームアップ用の最小HTML（実ページと同じテーブル構造）
+WARMUP_HTML = """
+<table class="m-table">
+<tr><th>順位</th><th>銘柄名</th><th>現在値</th><th>変動額</th><th>出来高</th>
+<th>売買代金</th><th>変動率</th></tr>
+<tr><td>1</td><td>ソフトバンクグループ9984 東P</td><td>10,000</td><td>+100</td>
+<td>1,000,000</td><td>10,000</td><td>+1.00%</td></tr>
+</table>
+"""
 
-def scrape_ranking(url: str) -> RankingList:
-    """指定URLからランキングデータを取得する。"""
 
-    headers = {"User-Agent": USER_AGENT}
-    response: Optional[requests.Response] = None
+def warm_up_parser() -> None:
+    """BeautifulSoup / lxml と銘柄マスタを事前に初期化するため、最小HTMLを1回パースする。"""
+
+    parse_ranking_html(WARMUP_HTML)
 
-    for attempt in range(1, RETRY_COUNT + 1):
-        try:
-            logger.info(
-                "HTTP GET: %s (試行 %d/%d)", url, attempt, RETRY_COUNT
-            )
-            response = requests.get(
-                url, headers=headers, timeout=REQUEST_TIMEOUT
-            )
-            response.raise_for_status()
-            logger.info("HTTP GET 成功: status=%s", response.status_code)
-            break
-        except requests.exceptions.RequestException as exc:
-            logger.warning("HTTP通信エラー: %s", exc)
-            if attempt == RETRY_COUNT:
-                raise
-            delay_index = min(attempt - 1, len(RETRY_DELAYS) - 1)
-            delay = RETRY_DELAYS[delay_index]
-            logger.info("%s 秒後にリトライします。", delay)
-            time.sleep(delay)
 
-    if response is None:
-        raise requests.exceptions.RequestException("HTTPレスポンスを取得できませんでした。")
+def parse_ranking_html(html: str) -> RankingList:
+    """ランキングページのHTMLからベスト10を抽出する。"""
 
-    soup = BeautifulSoup(response.text, "lxml")
+    soup = BeautifulSoup(html, "lxml")
 
     # テーブル検索（複数パターン）
     table = soup.find("table", class_="m-table")
@@ -244,6 +208,7 @@ def scrape_ranking(url: str) -> RankingList:
     if table is None:
         raise AttributeError("ランキングテーブルが見つかりません。HTML構造を確認してください。")
 
+    master = get_master()
     rankings: RankingList = []
     rows = table.find_all("tr")
 
@@ -258,22 +223,15 @@ def scrape_ranking(url: str) -> RankingList:
         # 銘柄名とコードの分離
         name_code_text = cells[1].get_text(strip=True) if len(cells) > 1 else ""
 
-        # 銘柄名とコードを分離（例: "ソフトバンクグループ9984 東P" or "キオクシアホールディングス285A 東P"）
-        import re
-        # パターン: 銘柄名 + (3-4桁の数字+文字 または 4桁の数字) + 市場コード
-        match = re.search(r'^(.+?)([0-9]{3,4}[A-Z]?)\s+(.*)$', name_code_text)
-        if match:
-            name = match.group(1).strip()
-            code = match.group(2).strip()
-        else:
-            # コードが見つからない場合は全体を銘柄名とする
-            name = name_code_text
-            code = ""
+        # 銘柄名・コード・市場区分を分離（例: "ソフトバンクグループ9984 東P" or "キオクシアホールディングス285A 東P"）
+        # 一度見たセルは銘柄マスタの辞書から引く（symbol_master.py）
+        name, code, market = master.split_name_cell(name_code_text)
 
         record: RankingRecord = {
             "rank": rank_text,
             "code": code,
             "name": name,
+            "market": market,
         }
 
         # 現在値（index 2）
@@ -307,7 +265,8 @@ def scrape_ranking(url: str) -> RankingList:
     if not rankings:
         raise AttributeError("ランキングデータが取得できませんでした。HTML構造を確認してください。")
 
-    logger.info("ランキングデータ取得: %d件", len(rankings))
+    # 新しく見た銘柄があればキャッシュへ書き戻す（なければ何もしない）
+    master.save()
     return rankings
 
 
@@ -323,10 +282,8 @@ def save_to_json(data: Dict[str, Any], target: str) -> str:
         data["datetime"] = timestamp
 
     filename = f"ranking_{timestamp}.json"
-    filepath = target_dir / filename
-
-    with filepath.open("w", encoding="utf-8") as file:
-        json.dump(data, file, ensure_ascii=False, indent=JSON_INDENT)
+    # 保存形式（JSON / 辞書付き zstd）は snapshot_codec.py の設定に従う
+    filepath = write_snapshot(target_dir / filename, data)
 
     logger.info("JSON保存: %s", filepath)
     return str(filepath)
@@ -346,11 +303,11 @@ def load_previous_ranking(target: str) -> Optional[RankingList]:
     
     if not target_dir.exists():
         logger.info("前回のランキングデータが存在しません: %s", target_dir)
-        return None
+        return _load_archived_ranking(target)
     
     # JSONファイルを新しい順に取得
     json_files = sorted(
-        target_dir.glob("ranking_*.json"),
+        target_dir.glob("ranking_*.json*"),
         key=lambda p: p.stat().st_mtime,
         reverse=True
     )
@@ -360,101 +317,47 @@ def load_previous_ranking(target: str) -> Optional[RankingList]:
     if len(json_files) >= 1:
         prev_file = json_files[0]
         try:
-            with prev_file.open("r", encoding="utf-8") as file:
-                data = json.load(file)
-                rankings = data.get("rankings", [])
-                logger.info("前回のランキングデータを読み込みました: %s (%d件)", prev_file.name, len(rankings))
-                return rankings
-        except (json.JSONDecodeError, IOError) as exc:
+            data = load_path(prev_file)
+            rankings = data.get("rankings", [])
+            logger.info("前回のランキングデータを読み込みました: %s (%d件)", prev_file.name, len(rankings))
+            return rankings
+        except (json.JSONDecodeError, IOError, ValueError) as exc:
             logger.warning("前回のランキングデータの読み込みに失敗: %s", exc)
             return None
     
-    logger.info("前回のランキングファイルが見つかりません")
-    return None
-
-
-def check_recent_execution(
-    target: str,
-    slot_time: str,
-    threshold_minutes: int = 10,
-) -> bool:
-    """
-    指定スロットの実行有無を判定して重複取得を避ける。
+    return _load_archived_ranking(target)
 
-    Args:
-        target: "morning" or "afternoon"
-        slot_time: 予定スロット時刻（例: "09:10"）
-        threshold_minutes: 時刻ベース判定のフォールバック閾値（分）
 
-    Returns:
-        bool: True=重複のためスキップ, False=実行すべき
-    """
-    target_dir = DATA_ROOT / target
-
-    if not target_dir.exists():
-        return False
+def _load_archived_ranking(target: str) -> Optional[RankingList]:
+    """直近の取引日分がない場合（連休明けなど）はアーカイブ済みの最新分を読み込む。"""
 
-    # JSONファイルを新しい順に取得
-    json_files = sorted(
-        target_dir.glob("ranking_*.json"),
-        key=lambda p: p.stat().st_mtime,
-        reverse=True
-    )
-
-    if not json_files:
-        return False
-
-    now = datetime.datetime.now(JST)
-    today = now.date()
-
-    # 予定スロットが同一の日付に既に保存されていないか確認
-    for candidate in json_files:
-        # ファイル名から日付を抽出（ranking_YYYYMMDD_HHMM.json）
-        try:
-            name_parts = candidate.stem.split("_")
-            if len(name_parts) >= 2:
-                file_date_str = name_parts[1]  # YYYYMMDD
-                file_date = datetime.datetime.strptime(file_date_str, "%Y%m%d").date()
-            else:
-                continue
-        except (ValueError, IndexError):
-            continue
-
-        if file_date != today:
-            continue
-
-        try:
-            with candidate.open("r", encoding="utf-8") as file:
-                data = json.load(file)
-        except (json.JSONDecodeError, OSError):
-            continue
-
-        if data.get("target") != target:
-            continue
+    refs = list_snapshots(target)
+    data = load_snapshot(refs[-1]) if refs else None
+    if data is None:
+        logger.info("前回のランキングファイルが見つかりません")
+        return None
+    rankings = data.get("rankings", [])
+    logger.info("前回のランキングデータをアーカイブから読み込みました: %s (%d件)", refs[-1].key, len(rankings))
+    return rankings
 
-        if data.get("slot_time") == slot_time:
-            logger.info(
-                "スロット %s (%s) は既に %s に保存済みのため重複実行をスキップします。",
-                slot_time,
-                target,
-                candidate.name,
-            )
-            return True
-
-    # スロット一致が見つからない場合は従来どおり直近実行間隔でフォールバック
-    latest_file = json_files[0]
-    file_mtime = datetime.datetime.fromtimestamp(latest_file.stat().st_mtime, tz=JST)
-    diff_minutes = (now - file_mtime).total_seconds() / 60
-
-    if diff_minutes < threshold_minutes:
-        logger.info(
-            "%.1f分前に実行済みです（%s）。重複実行を防止するためスキップします。",
-            diff_minutes,
-            latest_file.name,
-        )
-        return True
 
-    return False
+# 取得パイプライン（pipeline.py）へ渡す取得元プラグイン
+SOURCE = pipeline.Source(
+    name="scrape_rankings",
+    variant_field="target",
+    url=lambda target: URLS[target],
+    parse=lambda response: parse_ranking_html(response.text),
+    save=save_to_json,
+    report_dir=lambda target: DATA_ROOT / target,
+    # 前回のランキングと比較してメッセージを作成
+    format_success=lambda run, rankings: format_success_message(
+        run.datetime_str, run.variant, rankings, run.previous, run.slot_time
+    ),
+    format_error=format_error_message,
+    load_previous=load_previous_ranking,
+    # 銘柄の業種の騰落率・順位を付ける（業種ページはスロットにつき1回まで取得）
+    enrich=enrich_rankings,
+)
 
 
 def main() -> None:
@@ -528,70 +431,33 @@ def main() -> None:
 
     target, slot_time_str = slot_info
 
-    # 重複実行チェック（10分以内に実行済みならスキップ）
-    if check_recent_execution(target, slot_time_str, threshold_minutes=10):
-        logger.info("重複実行を防止するため処理を終了します。")
-        logger.info(separator)
-        return
-
-    url = URLS.get(target)
-    if url is None:
-        raise KeyError(f"URL for target '{target}' is not defined in config.")
-
-    # 前回のランキングを読み込む
-    previous_rankings = load_previous_ranking(target)
-
     try:
-        rankings = scrape_ranking(url)
-    except Exception as exc:
-        datetime_str = datetime.datetime.now(JST).strftime(DATETIME_FORMAT)
-        error_message = format_error_message(
-            datetime_str,
-            target,
-            str(exc),
-            slot_time_str,
-        )
-        success = send_line_notify(error_message)
-        if not success:
-            logger.error("LINE通知の送信に失敗しました（エラー通知）")
-            raise RuntimeError("LINE通知の送信に失敗しました") from exc
-        logger.error("スクレイピングに失敗しました: %s", exc)
+        filepath = run_slot(target, slot_time_str)
+        if filepath is not None:
+            logger.info("松井証券ランキング取得 完了")
+    finally:
         logger.info(separator)
-        raise
 
-    now = datetime.datetime.now(JST)
-    datetime_str = now.strftime(DATETIME_FORMAT)
-    data: Dict[str, Any] = {
-        "datetime": datetime_str,
-        "slot_time": slot_time_str,
-        "target": target,
-        "url": url,
-        "scraped_at": now.isoformat(),
-        "rankings": rankings,
-    }
 
-    filepath = save_to_json(data, target)
+def run_slot(target: str, slot_time_str: str) -> Optional[str]:
+    """
+    指定スロットを1回実行する（重複チェック → 取得 → 保存 → 通知 → 実行レポート）。
 
-    # 前回のランキングと比較してメッセージを作成
-    message = format_success_message(
-        datetime_str,
-        target,
-        rankings,
-        previous_rankings,
-        slot_time_str,
-    )
-    success = send_line_notify(message)
-    if not success:
-        logger.error("LINE通知の送信に失敗しました（成功通知）")
-        raise RuntimeError("LINE通知の送信に失敗しました")
-    
-    if not LINE_NOTIFY_AVAILABLE:
-        logger.info("LINE通知はログ出力のみ (notify_line.py 未実装)。")
+    GitHub Actions からの ``main()`` と常駐スケジューラ（scheduler.py）の共通入口。
+    処理の各段は取得パイプライン（pipeline.py）が行う。
 
-    logger.info("JSONファイルを保存しました: %s", filepath)
-    logger.info("松井証券ランキング取得 完了")
-    logger.info(separator)
+    Args:
+        target: 取得対象（morning / afternoon）
+        slot_time_str: 予定スロット時刻（HH:MM）
+
+    Returns:
+        Optional[str]: 保存したファイルパス。重複実行でスキップした場合は None
+    """
+    if target not in URLS:
+        raise KeyError(f"URL for target '{target}' is not defined in config.")
+    return pipeline.run_slot(SOURCE, target, slot_time_str)
 
 
 if __name__ == "__main__":
-    main()
+    with profiled("scrape_rankings", profile_modes(sys.argv[1:])):
+        main()
@@ -2,11 +2,11 @@
 SBI証券 業種別騰落率ランキング自動取得スクリプト
 
 SBI証券の業種別株価平均ランキング（前日比）を取得し、LINE通知します。
+全33業種を data/sector/sector_ranking_YYYYMMDD_HHMM.json に保存し、通知は上位5位と下位5位に絞ります。
 GitHub Actionsから定期実行されることを想定しています。
 """
 
 import datetime
-import json
 import logging
 import os
 import sys
@@ -14,22 +14,22 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
-import requests
 from bs4 import BeautifulSoup
 
 # プロジェクトルートをパスに追加
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
+import pipeline
 from config import (
-    RETRY_COUNT,
-    RETRY_DELAYS,
-    REQUEST_TIMEOUT,
     SECTOR_DATA_DIR,
     SECTOR_TIME_SLOTS,
     SECTOR_URL,
-    USER_AGENT,
 )
+from metrics import RunMetrics
+from profiling import profile_modes, profiled
+from sector_attribution import remember_sector_rows
+from snapshot_codec import write_snapshot
 
 # check_workday.py の is_trading_day をインポート
 try:
@@ -47,18 +47,6 @@ except ImportError:
             return False
         return True
 
-# notify_line.py の send_line_message をインポート
-try:
-    from notify_line import send_line_message as send_line_notify
-    LINE_NOTIFY_AVAILABLE = True
-except ImportError:
-    LINE_NOTIFY_AVAILABLE = False
-
-    def send_line_notify(message: str) -> bool:
-        """フォールバック: ログ出力のみ"""
-        logging.info("[LINE通知] %s", message)
-        return True
-
 # ===========================
 # ロギング設定
 # ===========================
@@ -83,95 +71,112 @@ DATETIME_FORMAT = "%Y%m%d_%H%M"
 # ===========================
 
 
-def scrape_sector_ranking(url: str) -> List[Dict[str, str]]:
+def scrape_sector_ranking(
+    url: str, metrics: Optional[RunMetrics] = None
+) -> List[Dict[str, str]]:
     """
-    SBI証券の業種別騰落率ランキングを取得する。
-    上位5位（1~5位）と下位5位（29~33位）を取得。
+    SBI証券の業種別株価平均ランキング（前日比、全33業種）を取得する。
 
     Args:
         url: スクレイピング対象URL
+        metrics: 指定時は fetch / parse / normalize の各ステージを計測する
 
     Returns:
         List[Dict]: 業種別ランキングデータのリスト
-            [{"rank": "1", "sector": "...", "change_percent": "+1.23%", ...}, ...]
+            [{"rank": "1", "sector": "医薬品", "price": "3,536.83",
+              "change": "+48.07(+1.38％)", "prev_price": "3,488.76"}, ...]
 
     Raises:
         requests.exceptions.RequestException: HTTP通信エラー
-        AttributeError: HTML構造の解析失敗
+        ValueError: HTML構造の解析失敗
     """
-    headers = {"User-Agent": USER_AGENT}
-
-    for attempt in range(1, RETRY_COUNT + 1):
-        try:
-            logger.info("セクター別ランキング取得を試行します（%d/%d）", attempt, RETRY_COUNT)
-            response = requests.get(
-                url, headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=True
-            )
-            response.raise_for_status()
-            logger.info("HTTP %d: データ取得成功", response.status_code)
-            break
-        except requests.exceptions.RequestException as exc:
-            logger.warning("HTTP通信エラー（試行 %d/%d）: %s", attempt, RETRY_COUNT, exc)
-            if attempt < RETRY_COUNT:
-                delay = RETRY_DELAYS[min(attempt - 1, len(RETRY_DELAYS) - 1)]
-                logger.info("%d秒後にリトライします...", delay)
-                import time
-                time.sleep(delay)
-            else:
-                logger.error("最大リトライ回数に達しました。取得を中断します。")
-                raise
-
-    soup = BeautifulSoup(response.content, "lxml")
-
-    # SBI証券の業種別テーブルを探す
-    # 実際のHTML構造に合わせて調整が必要
-    table = soup.find("table", class_="md-l-table-01")
-    if not table:
-        table = soup.find("table")
+    if metrics is None:
+        metrics = RunMetrics("scrape_sector_ranking")
 
-    if not table:
-        raise AttributeError("業種別ランキングテーブルが見つかりません。HTML構造が変更された可能性があります。")
+    logger.info("セクター別ランキング取得を開始します: %s", url)
+    return pipeline.scrape(SOURCE, "sector", url, metrics)
+
+
+# パーサのウォームアップ用の最小HTML（実ページと同じテーブル構造）
+WARMUP_HTML = """
+<table class="md-table06">
+<tr><th>順位</th><th>業種名</th><th>株価平均</th><th>前日比</th><th>前日株価平均</th></tr>
+<tr><td>1</td><td>鉱業</td><td>600.00</td><td>+6.00(+1.01％)</td><td>594.00</td></tr>
+</table>
+"""
+
+
+def warm_up_parser() -> None:
+    """BeautifulSoup を事前に初期化するため、最小HTMLを1回パースする。"""
+
+    parse_sector_ranking_html(WARMUP_HTML)
+
+
+def parse_sector_ranking_html(html: str) -> List[Dict[str, str]]:
+    """
+    業種別株価平均ランキングページのHTMLから全業種を抽出する。
+
+    Examples:
+        >>> parse_sector_ranking_html(WARMUP_HTML)
+        [{'rank': '1', 'sector': '鉱業', 'price': '600.00', 'change': '+6.00(+1.01％)', 'prev_price': '594.00'}]
+
+    Raises:
+        ValueError: HTML パース失敗時
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    # ランキングテーブルを探す (class="md-table06")
+    table = soup.find("table", class_="md-table06")
 
-    all_rankings = []
+    if not table:
+        logger.error("ランキングテーブルが見つかりません")
+        # デバッグ情報
+        all_tables = soup.find_all("table")
+        logger.error("ページ内のテーブル数: %d", len(all_tables))
+        if soup.title:
+            logger.error("ページタイトル: %s", soup.title.get_text())
+        raise ValueError("ランキングテーブルが見つかりません")
+
+    # テーブルの行を取得
     rows = table.find_all("tr")
+    if len(rows) < 2:
+        logger.error("テーブルに十分な行がありません")
+        raise ValueError("テーブルに十分な行がありません")
 
-    for row in rows[1:]:  # ヘッダー行をスキップ
-        cols = row.find_all(["td", "th"])
-        if len(cols) < 3:
-            continue
+    rankings = []
 
-        try:
-            rank = cols[0].get_text(strip=True)
-            sector = cols[1].get_text(strip=True)
-            change_percent = cols[2].get_text(strip=True)
-
-            # オプション: 追加の列があれば取得
-            value = cols[3].get_text(strip=True) if len(cols) > 3 else ""
-            change = cols[4].get_text(strip=True) if len(cols) > 4 else ""
-
-            all_rankings.append({
-                "rank": rank,
-                "sector": sector,
-                "change_percent": change_percent,
-                "value": value,
-                "change": change,
-            })
-
-        except (IndexError, AttributeError) as exc:
-            logger.warning("行の解析をスキップしました: %s", exc)
+    # ヘッダー行をスキップして、データ行を処理
+    for row in rows[1:]:  # 最初の行はヘッダー
+        cols = row.find_all("td")
+        if len(cols) < 5:
             continue
 
-    if not all_rankings:
-        raise ValueError("ランキングデータが取得できませんでした")
+        rankings.append(
+            {
+                "rank": cols[0].get_text(strip=True),
+                "sector": cols[1].get_text(strip=True),
+                "price": cols[2].get_text(strip=True),
+                "change": cols[3].get_text(strip=True),
+                "prev_price": cols[4].get_text(strip=True),
+            }
+        )
+
+    return rankings
+
+
+def select_top_bottom(all_rankings: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    通知する上位5位（1~5位）と下位5位（29~33位）を抽出する（保存は全33業種）。
 
-    # 上位5位（1~5位）と下位5位（29~33位）を抽出
+    Examples:
+        >>> rows = [{"rank": str(i)} for i in range(1, 34)]
+        >>> [row["rank"] for row in select_top_bottom(rows)]
+        ['1', '2', '3', '4', '5', '29', '30', '31', '32', '33']
+    """
     top_5 = all_rankings[:5]
     bottom_5 = all_rankings[28:33] if len(all_rankings) >= 33 else []
-    
-    selected_rankings = top_5 + bottom_5
 
-    logger.info("セクター別ランキングを %d 件取得しました（上位5位+下位5位）", len(selected_rankings))
-    return selected_rankings
+    return top_5 + bottom_5
 
 
 # ===========================
@@ -179,13 +184,13 @@ def scrape_sector_ranking(url: str) -> List[Dict[str, str]]:
 # ===========================
 
 
-def save_to_json(data: Dict[str, Any], slot: str) -> Path:
+def save_to_json(data: Dict[str, Any], target: str) -> Path:
     """
     セクター別ランキングデータをJSON形式で保存する。
 
     Args:
         data: 保存するデータ（辞書形式）
-        slot: タイムスロット識別子（"midday" or "close"）
+        target: タイムスロット識別子（"midday" or "close"）
 
     Returns:
         Path: 保存したファイルのパス
@@ -193,11 +198,10 @@ def save_to_json(data: Dict[str, Any], slot: str) -> Path:
     DATA_ROOT.mkdir(parents=True, exist_ok=True)
 
     datetime_str = data["datetime"]
-    filename = f"sector_{datetime_str}.json"
-    filepath = DATA_ROOT / filename
-
-    with filepath.open("w", encoding="utf-8") as file:
-        json.dump(data, file, ensure_ascii=False, indent=2)
+    # ファイル名: sector_ranking_YYYYMMDD_HHMM.json
+    filename = f"sector_ranking_{datetime_str}.json"
+    # 保存形式（JSON / 辞書付き zstd）は snapshot_codec.py の設定に従う
+    filepath = write_snapshot(DATA_ROOT / filename, data)
 
     logger.info("データを保存しました: %s", filepath)
     return filepath
@@ -215,12 +219,12 @@ def format_success_message(
 ) -> str:
     """
     セクター別ランキング取得成功時のLINEメッセージを作成する。
-    上位5位と下位5位を区別して表示。
+    全業種のうち上位5位と下位5位（29~33位）を区別して表示。
 
     Args:
         datetime_str: 実行日時文字列
         slot: タイムスロット識別子
-        rankings: ランキングデータ
+        rankings: ランキングデータ（全業種）
 
     Returns:
         str: LINE通知用メッセージ
@@ -241,41 +245,26 @@ def format_success_message(
         "【上位5業種】",
     ]
 
-    # 上位5位
-    for item in rankings[:5]:
+    selected = select_top_bottom(rankings)
+    for index, item in enumerate(selected):
+        # 下位5位（29~33位）
+        if index == 5:
+            lines.append("")
+            lines.append("【下位5業種】")
+
         rank = item.get("rank", "?")
         sector = item.get("sector", "不明")
-        change_pct = item.get("change_percent", "N/A")
+        change = item.get("change", "N/A")
 
         # 色インジケーター
-        if "+" in change_pct:
+        if change.startswith("+"):
             color = "🟢"
-        elif "-" in change_pct:
+        elif change.startswith("-"):
             color = "🔴"
         else:
             color = "⚪"
 
-        lines.append(f"{rank}位: {sector} {color}{change_pct}")
-
-    # 下位5位（29~33位）
-    if len(rankings) > 5:
-        lines.append("")
-        lines.append("【下位5業種】")
-        
-        for item in rankings[5:]:
-            rank = item.get("rank", "?")
-            sector = item.get("sector", "不明")
-            change_pct = item.get("change_percent", "N/A")
-
-            # 色インジケーター
-            if "+" in change_pct:
-                color = "🟢"
-            elif "-" in change_pct:
-                color = "🔴"
-            else:
-                color = "⚪"
-
-            lines.append(f"{rank}位: {sector} {color}{change_pct}")
+        lines.append(f"{rank}位: {sector} {color}{change}")
 
     return "\n".join(lines)
 
@@ -305,104 +294,37 @@ def format_error_message(
 
 def get_current_time_slot() -> Optional[Tuple[str, str]]:
     """
-    現在時刻から該当するタイムスロットを取得する。
+    現在時刻以前で最新のセクター別タイムスロットを取得する（pipeline.current_slot）。
+
+    11:45 より前は ``None``、11:45〜15:59 は midday、16:00 以降は close。
 
     Returns:
         Optional[Tuple[str, str]]: (slot識別子, 時刻文字列) または None
     """
-    now = datetime.datetime.now(JST)
-    current_time = now.strftime("%H:%M")
-
-    for slot_time, slot_id in SECTOR_TIME_SLOTS.items():
-        logger.info(
-            "現在時刻 %s は %s のセクター別実行時間帯として処理します（許容幅制限なし）",
-            current_time,
-            slot_time,
-        )
-        return (slot_id, slot_time)
-
-    return None
+    return pipeline.current_slot(SECTOR_TIME_SLOTS)
 
 
 # ===========================
-# 重複実行チェック
+# 取得元プラグイン（pipeline.py）
 # ===========================
 
-
-def check_recent_execution(
-    slot: str,
-    slot_time: str,
-    threshold_minutes: int = 10,
-) -> bool:
-    """
-    指定スロットの実行有無を判定して重複取得を避ける。
-
-    Args:
-        slot: タイムスロット識別子
-        slot_time: 予定スロット時刻（例: "11:45"）
-        threshold_minutes: 時刻ベース判定のフォールバック閾値（分）
-
-    Returns:
-        bool: True=重複のためスキップ, False=実行すべき
-    """
-    if not DATA_ROOT.exists():
-        return False
-
-    json_files = sorted(
-        DATA_ROOT.glob("sector_*.json"),
-        key=lambda p: p.stat().st_mtime,
-        reverse=True
-    )
-
-    if not json_files:
-        return False
-
-    now = datetime.datetime.now(JST)
-    today = now.date()
-
-    for candidate in json_files:
-        # ファイル名から日付を抽出（sector_YYYYMMDD_HHMM.json）
-        try:
-            name_parts = candidate.stem.split("_")
-            if len(name_parts) >= 2:
-                file_date_str = name_parts[1]  # YYYYMMDD
-                file_date = datetime.datetime.strptime(file_date_str, "%Y%m%d").date()
-            else:
-                continue
-        except (ValueError, IndexError):
-            continue
-
-        if file_date != today:
-            continue
-
-        try:
-            with candidate.open("r", encoding="utf-8") as file:
-                data = json.load(file)
-        except (json.JSONDecodeError, OSError):
-            continue
-
-        if data.get("slot_time") == slot_time:
-            logger.info(
-                "スロット %s は既に %s に保存済みのため重複実行をスキップします。",
-                slot_time,
-                candidate.name,
-            )
-            return True
-
-    # フォールバック: 直近10分以内のチェック
-    latest_file = json_files[0]
-    file_mtime = datetime.datetime.fromtimestamp(latest_file.stat().st_mtime, tz=JST)
-    diff_minutes = (now - file_mtime).total_seconds() / 60
-
-    if diff_minutes < threshold_minutes:
-        logger.info(
-            "%.1f分前に実行済みです（%s）。重複実行を防止するためスキップします。",
-            diff_minutes,
-            latest_file.name,
-        )
-        return True
-
-    return False
+SOURCE = pipeline.Source(
+    name="scrape_sector_rankings",
+    variant_field="target",
+    url=lambda slot: SECTOR_URL,
+    # 全業種の解析結果はランキングへの業種動向の付与（sector_attribution.py）でも再利用する
+    parse=lambda response: remember_sector_rows(parse_sector_ranking_html(response.text)),
+    save=save_to_json,
+    report_dir=lambda slot: DATA_ROOT,
+    format_success=lambda run, rankings: format_success_message(
+        run.datetime_str, run.variant, rankings
+    ),
+    format_error=lambda datetime_str, slot, error, slot_time: format_error_message(
+        datetime_str, slot, error
+    ),
+    stream_target="sector",
+    encoding="shift_jis",  # SBI証券はShift_JIS
+)
 
 
 # ===========================
@@ -439,51 +361,31 @@ def main() -> None:
 
     slot, slot_time_str = slot_info
 
-    # 重複実行チェック（10分以内に実行済みならスキップ）
-    if check_recent_execution(slot, slot_time_str, threshold_minutes=10):
-        logger.info("重複実行を防止するため処理を終了します。")
-        logger.info(separator)
-        return
-
     try:
-        rankings = scrape_sector_ranking(SECTOR_URL)
-    except Exception as exc:
-        datetime_str = datetime.datetime.now(JST).strftime(DATETIME_FORMAT)
-        error_message = format_error_message(datetime_str, slot, str(exc))
-        success = send_line_notify(error_message)
-        if not success:
-            logger.error("LINE通知の送信に失敗しました（エラー通知）")
-            raise RuntimeError("LINE通知の送信に失敗しました") from exc
-        logger.error("スクレイピングに失敗しました: %s", exc)
+        filepath = run_slot(slot, slot_time_str)
+        if filepath is not None:
+            logger.info("SBI証券 業種別騰落率ランキング取得 完了")
+    finally:
         logger.info(separator)
-        raise
-
-    now = datetime.datetime.now(JST)
-    datetime_str = now.strftime(DATETIME_FORMAT)
-    data: Dict[str, Any] = {
-        "datetime": datetime_str,
-        "slot_time": slot_time_str,
-        "slot": slot,
-        "url": SECTOR_URL,
-        "scraped_at": now.isoformat(),
-        "rankings": rankings,
-    }
 
-    filepath = save_to_json(data, slot)
 
-    message = format_success_message(datetime_str, slot, rankings)
-    success = send_line_notify(message)
-    if not success:
-        logger.error("LINE通知の送信に失敗しました（成功通知）")
-        raise RuntimeError("LINE通知の送信に失敗しました")
+def run_slot(slot: str, slot_time_str: str) -> Optional[Path]:
+    """
+    指定スロットを1回実行する（重複チェック → 取得 → 保存 → 通知 → 実行レポート）。
 
-    if not LINE_NOTIFY_AVAILABLE:
-        logger.info("LINE通知はログ出力のみ (notify_line.py 未実装)。")
+    GitHub Actions からの ``main()`` と常駐スケジューラ（scheduler.py）の共通入口。
+    処理の各段は取得パイプライン（pipeline.py）が行う。
 
-    logger.info("JSONファイルを保存しました: %s", filepath)
-    logger.info("SBI証券 業種別騰落率ランキング取得 完了")
-    logger.info(separator)
+    Args:
+        slot: スロット識別子（midday / close）
+        slot_time_str: 予定スロット時刻（HH:MM）
+
+    Returns:
+        Optional[Path]: 保存したファイルパス。重複実行でスキップした場合は None
+    """
+    return pipeline.run_slot(SOURCE, slot, slot_time_str)
 
 
 if __name__ == "__main__":
-    main()
+    with profiled("scrape_sector_rankings", profile_modes(sys.argv[1:])):
+        main()
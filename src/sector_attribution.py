@@ -0,0 +1,228 @@
+"""
+銘柄ランキングへの業種動向の付与（取得時の突き合わせ）
+
+松井証券のランキング上位に入った銘柄について、その銘柄の業種全体が動いているのかを
+通知の時点で分かるように、銘柄マスタ（symbol_master.py）で33業種を引き、SBI証券の
+業種別ランキングから業種の騰落率と順位を各行に付けます。
+
+    {"code": "6758", ..., "sector": "電気機器", "sector_rank": "3", "sector_change": "+1.23%"}
+
+- 業種別ランキングはプロセス内にキャッシュし、同じスロット（日付＋予定時刻）の対象
+  （morning / afternoon など）で共有します。業種ページの取得は1スロットにつき最大1回です。
+- 業種別ランキングの取得（scrape_sector_rankings.py）で解析した全業種もキャッシュに載せるため、
+  常駐スケジューラでは ``SECTOR_ATTRIBUTION_MAX_AGE_SECONDS`` 以内の結果を取得なしで再利用します。
+- 付与用の取得はリトライせず1回だけ行い、失敗した場合もスロット内では再取得せず、
+  業種なしのまま処理を続けます（スロットは失敗させない・通知を遅らせない）。
+- 業種が分からない銘柄（銘柄マスタに33業種がない）は業種の項目を付けません。
+  業種が分かる銘柄が1つもなければ業種ページを取得しません。
+
+``SECTOR_ATTRIBUTION=0`` で無効になります。
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from alert_rules import row_percent
+from config import SECTOR_ATTRIBUTION_MAX_AGE_SECONDS, SECTOR_URL
+from http_client import fetch
+from symbol_master import get_master, sector_key
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+
+Row = Dict[str, Any]
+
+
+class SectorMove(NamedTuple):
+    """業種別ランキングの1業種分（順位・騰落率）。"""
+
+    sector: str
+    rank: str
+    change_percent: str
+
+
+class SectorBoard(NamedTuple):
+    """ある時点の業種別ランキング全体（正規化した業種名 → 動向）。"""
+
+    moves: Dict[str, SectorMove]
+    fetched_at: float
+    slot: Optional[Tuple[str, str]]
+
+
+def is_enabled() -> bool:
+    """業種動向の付与が有効かどうか（環境変数 ``SECTOR_ATTRIBUTION``、既定は有効）。"""
+
+    return os.getenv("SECTOR_ATTRIBUTION", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def index_moves(rows: List[Row]) -> Dict[str, SectorMove]:
+    """
+    業種別ランキングの行を正規化した業種名で引けるようにする。
+
+    Examples:
+        >>> moves = index_moves([{"rank": "1", "sector": "ｶﾞﾗｽ土石製品", "change": "+21.00(+2.1％)"}])
+        >>> moves[sector_key("ガラス・土石製品")]
+        SectorMove(sector='ｶﾞﾗｽ土石製品', rank='1', change_percent='+2.10%')
+    """
+    moves: Dict[str, SectorMove] = {}
+    for row in rows:
+        name = row.get("sector", "")
+        percent = row_percent(row)
+        if name and percent is not None:
+            moves[sector_key(name)] = SectorMove(name, row.get("rank", ""), f"{percent:+.2f}%")
+    return moves
+
+
+def slot_key(slot_time: str, now: Optional[datetime.datetime] = None) -> Optional[Tuple[str, str]]:
+    """
+    キャッシュを共有する単位（日付, 予定時刻）を返す。予定時刻がなければ ``None``。
+
+    Examples:
+        >>> slot_key("09:20", datetime.datetime(2025, 10, 21, 9, 21, tzinfo=JST))
+        ('2025-10-21', '09:20')
+        >>> slot_key("") is None
+        True
+    """
+    if not slot_time:
+        return None
+    now = now or datetime.datetime.now(JST)
+    return now.date().isoformat(), slot_time
+
+
+class SectorCache:
+    """
+    業種別ランキングのプロセス内キャッシュ。
+
+    同じスロットの要求、または ``max_age`` 秒以内に取得・解析した結果はそのまま返し、
+    それ以外は業種ページを1回だけ取得する。並行する要求はロックで待ち合わせるため、
+    対象がいくつあっても取得は1回になる。
+    """
+
+    def __init__(self, url: str = SECTOR_URL, max_age: float = SECTOR_ATTRIBUTION_MAX_AGE_SECONDS) -> None:
+        self.url = url
+        self.max_age = max_age
+        self.fetches = 0
+        self._board: Optional[SectorBoard] = None
+        self._failed_slot: Optional[Tuple[str, str]] = None
+        self._lock = threading.Lock()
+
+    def remember(self, rows: List[Row], slot: Optional[Tuple[str, str]] = None) -> None:
+        """解析済みの業種別ランキング（全業種）をキャッシュに載せる。"""
+
+        moves = index_moves(rows)
+        if moves:
+            with self._lock:
+                self._board = SectorBoard(moves, time.monotonic(), slot)
+
+    def _is_fresh(self, slot: Optional[Tuple[str, str]]) -> bool:
+        board = self._board
+        if board is None:
+            return False
+        if slot is not None and board.slot == slot:
+            return True
+        return time.monotonic() - board.fetched_at <= self.max_age
+
+    def board(self, slot: Optional[Tuple[str, str]] = None) -> Optional[SectorBoard]:
+        """スロットで使う業種別ランキングを返す（必要なら取得）。取得できなければ ``None``。"""
+
+        with self._lock:
+            if self._is_fresh(slot):
+                return self._board
+            if slot is not None and slot == self._failed_slot:
+                return None
+
+            # 業種別ランキングのパーサは取得時にだけ必要（scrape_sector_rankings は pipeline を読み込む）
+            from scrape_sector_rankings import parse_sector_ranking_html
+
+            self.fetches += 1
+            try:
+                # 付与は任意のため、リトライ待ちで通知を遅らせないよう1回だけ試す
+                response = fetch(self.url, encoding="shift_jis", attempts=1)  # SBI証券はShift_JIS
+                moves = index_moves(parse_sector_ranking_html(response.text))
+            except Exception as exc:
+                self._failed_slot = slot
+                logger.warning("業種別ランキングを取得できなかったため業種の付与を省略します: %s", exc)
+                return None
+            self._board = SectorBoard(moves, time.monotonic(), slot)
+            logger.info("業種別ランキングを取得しました（業種の付与用）: %d業種", len(moves))
+            return self._board
+
+
+def attach(rows: List[Row], board: SectorBoard, master: Any = None) -> int:
+    """
+    各行に業種・業種順位・業種騰落率を付け、付与できた行数を返す。
+
+    Examples:
+        >>> class Master:
+        ...     def sector(self, code):
+        ...         return {"6758": "電気機器"}.get(code, "")
+        >>> board = SectorBoard(index_moves([{"rank": "3", "sector": "電気機器", "change": "+70.00(+1.23％)"}]), 0.0, None)
+        >>> rows = [{"code": "6758"}, {"code": "9999"}]
+        >>> attach(rows, board, Master())
+        1
+        >>> rows
+        [{'code': '6758', 'sector': '電気機器', 'sector_rank': '3', 'sector_change': '+1.23%'}, {'code': '9999'}]
+    """
+    master = master or get_master()
+    attached = 0
+    for row in rows:
+        sector = master.sector(row.get("code", ""))
+        move = board.moves.get(sector_key(sector)) if sector else None
+        if move is None:
+            continue
+        row["sector"] = sector
+        row["sector_rank"] = move.rank
+        row["sector_change"] = move.change_percent
+        attached += 1
+    return attached
+
+
+_default_cache: Optional[SectorCache] = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> SectorCache:
+    """プロセス共通の業種別ランキングキャッシュを返す（初回のみ生成）。"""
+
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SectorCache()
+        return _default_cache
+
+
+def remember_sector_rows(rows: List[Row]) -> List[Row]:
+    """業種別ランキングの解析結果をキャッシュに載せてそのまま返す（取得元のパーサから呼ぶ）。"""
+
+    if is_enabled():
+        get_cache().remember(rows)
+    return rows
+
+
+def enrich_rankings(run: Any, rows: List[Row]) -> List[Row]:
+    """
+    ランキングの行に業種動向を付ける（``pipeline.Source.enrich``）。
+
+    業種別ランキングを取得できない・業種が分からない場合は行をそのまま返す。
+    業種が分かる銘柄が1つもなければ業種ページを取得しない。
+    """
+    if not is_enabled() or not rows:
+        return rows
+    master = get_master()
+    if not any(master.sector(row.get("code", "")) for row in rows):
+        logger.info("33業種の分かる銘柄がないため業種動向の付与を省略します: %s", run.variant)
+        return rows
+    board = get_cache().board(slot_key(run.slot_time))
+    if board is None:
+        return rows
+    attached = attach(rows, board, master)
+    logger.info("業種動向を付与しました: %s %d/%d件", run.variant, attached, len(rows))
+    return rows
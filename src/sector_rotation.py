@@ -0,0 +1,396 @@
+"""
+業種別ランキングのローテーション分析
+
+``data/sector`` の業種別スナップショット（昼・引け）を 日付 × スロット × 業種 の
+NumPy 行列に読み込み、以下をすべて行列演算でまとめて計算します。
+
+    rolling_returns     引けの前日比を複利でつないだ N 日リターン
+    zscores             業種横断の z スコア（日・スロットごと）
+    midday_to_close     後場（昼 → 引け）のリターンと、前場の方向からの反転
+    rank_persistence    前日と当日の騰落率順位のスピアマン相関（順位の持続性）
+    momentum_leaders    N 日リターン上位の業種
+
+スナップショット（``sector_ranking_*.json``: 全33業種、``change`` の括弧内に騰落率）を読み込みます。
+``change_percent`` を持つ行や一部の業種だけのスナップショットも読み込み、含まれない業種は欠損として扱います。
+含まれない業種・欠けた日は NaN として扱い、NaN を含む窓・組の結果も NaN になります。
+
+使い方:
+    python sector_rotation.py                    # 直近日のローテーション
+    python sector_rotation.py --window 10 --top 5
+    python sector_rotation.py --json             # 全日の指標を JSON で出力
+    python sector_rotation.py --bench 245        # 245 営業日分の合成データで計算時間を計測
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from alert_rules import row_percent
+from snapshot_store import Snapshot, iter_snapshots
+
+logger = logging.getLogger(__name__)
+
+# 行列のスロット軸（SECTOR_TIME_SLOTS の識別子の順）
+SLOTS: Tuple[str, ...] = ("midday", "close")
+MIDDAY, CLOSE = 0, 1
+
+# 旧形式の ``target`` の値 → スロット識別子
+SLOT_ALIASES = {"closing": "close"}
+
+DEFAULT_WINDOW = 5
+DEFAULT_TOP = 3
+
+@dataclass
+class SectorHistory:
+    """業種別スナップショットの行列。欠損は NaN。"""
+
+    dates: List[datetime.date]
+    sectors: List[str]
+    price: np.ndarray  # (日付, スロット, 業種) 業種別株価平均
+    change: np.ndarray  # (日付, スロット, 業種) 前日比騰落率（%）
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.change.shape  # type: ignore[return-value]
+
+
+# ===========================
+# 読み込み
+# ===========================
+
+
+def _parse_price(text: Any) -> float:
+    try:
+        return float(str(text or "").replace(",", ""))
+    except ValueError:
+        return float("nan")
+
+
+def row_change(row: Mapping[str, Any]) -> Optional[float]:
+    """
+    業種行の前日比騰落率（%）を返す。``change`` の括弧内から読む。
+
+    Examples:
+        >>> row_change({"change_percent": "+1.25%"})
+        1.25
+        >>> row_change({"change": "+128.92(+3.85％)"})
+        3.85
+        >>> row_change({"change": "-"}) is None
+        True
+    """
+    return row_percent(row)
+
+
+def snapshot_slot_id(data: Snapshot) -> Optional[str]:
+    """スナップショットのスロット識別子（midday / close）を返す。"""
+
+    slot = data.get("slot") or data.get("target")
+    slot = SLOT_ALIASES.get(slot, slot)
+    return slot if slot in SLOTS else None
+
+
+def build_history(snapshots: Sequence[Tuple[str, Snapshot]]) -> SectorHistory:
+    """
+    (キー, スナップショット) の列から行列を作る。同じ日・スロットが複数あれば後のものを使う。
+
+    Examples:
+        >>> history = build_history([
+        ...     ("20251104_1200", {"target": "midday", "rankings": [
+        ...         {"sector": "鉱業", "price": "100", "change": "+1.00(+1.01％)"}]}),
+        ...     ("20251104_1600", {"slot": "close", "rankings": [
+        ...         {"sector": "鉱業", "value": "102", "change_percent": "+3.03%"},
+        ...         {"sector": "銀行業", "value": "50", "change_percent": "-1.00%"}]}),
+        ... ])
+        >>> history.shape, history.sectors
+        ((1, 2, 2), ['鉱業', '銀行業'])
+        >>> history.change[0].tolist()
+        [[1.01, nan], [3.03, -1.0]]
+    """
+    cells: Dict[Tuple[datetime.date, int], Dict[str, Tuple[float, float]]] = {}
+    for key, data in snapshots:
+        slot = snapshot_slot_id(data)
+        if slot is None:
+            continue
+        try:
+            date = datetime.datetime.strptime(key[:8], "%Y%m%d").date()
+        except ValueError:
+            continue
+        rows = {}
+        for row in data.get("rankings") or []:
+            sector = str(row.get("sector") or "").strip()
+            change = row_change(row)
+            if sector and change is not None:
+                rows[sector] = (_parse_price(row.get("price") or row.get("value")), change)
+        if rows:
+            cells[(date, SLOTS.index(slot))] = rows
+
+    dates = sorted({date for date, _ in cells})
+    sectors = sorted({sector for rows in cells.values() for sector in rows})
+    date_index = {date: number for number, date in enumerate(dates)}
+    sector_index = {sector: number for number, sector in enumerate(sectors)}
+
+    # 全セルの座標と値を一括で代入する
+    entries = [
+        (date_index[date], slot, sector_index[sector], price, change)
+        for (date, slot), rows in cells.items()
+        for sector, (price, change) in rows.items()
+    ]
+    price = np.full((len(dates), len(SLOTS), len(sectors)), np.nan)
+    change = np.full_like(price, np.nan)
+    if entries:
+        day, slot, sector, price_values, change_values = (np.array(column) for column in zip(*entries))
+        price[day, slot, sector] = price_values
+        change[day, slot, sector] = change_values
+    return SectorHistory(dates=dates, sectors=sectors, price=price, change=change)
+
+
+def load_history() -> SectorHistory:
+    """保存済み（アーカイブ分を含む）の業種別スナップショットを読み込む。"""
+
+    return build_history([(ref.key, data) for ref, data in iter_snapshots(["sector"])])
+
+
+# ===========================
+# 指標（すべて行列演算）
+# ===========================
+
+
+def rolling_returns(daily_percent: np.ndarray, window: int) -> np.ndarray:
+    """
+    日次騰落率（%、(日付, 業種)）を複利でつないだ ``window`` 日リターン（%）を返す。
+
+    最初の ``window - 1`` 日と、窓に欠損を含む場合は NaN。
+
+    Examples:
+        >>> rolling_returns(np.array([[10.0], [10.0], [np.nan], [0.0]]), 2).round(2).ravel().tolist()
+        [nan, 21.0, nan, nan]
+    """
+    growth = np.log1p(daily_percent / 100)
+    missing = np.isnan(growth)
+    zero = np.zeros((1,) + growth.shape[1:])
+    total = np.concatenate([zero, np.cumsum(np.where(missing, 0.0, growth), axis=0)])
+    gaps = np.concatenate([zero, np.cumsum(missing, axis=0)])
+
+    result = np.full(growth.shape, np.nan)
+    if window <= len(growth):
+        span = total[window:] - total[:-window]
+        complete = (gaps[window:] - gaps[:-window]) == 0
+        result[window - 1 :] = np.where(complete, np.expm1(span) * 100, np.nan)
+    return result
+
+
+def zscores(values: np.ndarray) -> np.ndarray:
+    """
+    最後の軸（業種）で横断的に標準化する。ばらつきがない行は NaN。
+
+    Examples:
+        >>> zscores(np.array([[1.0, 2.0, 3.0], [1.0, 1.0, np.nan]])).round(3).tolist()
+        [[-1.225, 0.0, 1.225], [nan, nan, nan]]
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=-1, keepdims=True)
+        mean = np.where(valid, values, 0.0).sum(axis=-1, keepdims=True) / count
+        spread = np.sqrt(np.where(valid, (values - mean) ** 2, 0.0).sum(axis=-1, keepdims=True) / count)
+        return np.where(spread > 0, (values - mean) / spread, np.nan)
+
+
+def midday_to_close(history: SectorHistory) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (後場リターン %, 反転フラグ) を返す（いずれも (日付, 業種)）。
+
+    後場リターンは引けの株価 / 昼の株価。反転は前場（昼時点の前日比）と後場の向きが逆の業種。
+    株価がない場合は前日比から後場リターンを求める。
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        by_price = (history.price[:, CLOSE] / history.price[:, MIDDAY] - 1) * 100
+        by_change = ((1 + history.change[:, CLOSE] / 100) / (1 + history.change[:, MIDDAY] / 100) - 1) * 100
+    afternoon = np.where(np.isnan(by_price), by_change, by_price)
+    morning = history.change[:, MIDDAY]
+    reversal = (np.sign(morning) * np.sign(afternoon)) < 0
+    return afternoon, reversal
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """最後の軸の順位（0始まり）。NaN は NaN のまま。"""
+
+    order = np.argsort(values, axis=-1)  # NaN は末尾
+    ranks = np.empty(values.shape)
+    positions = np.broadcast_to(np.arange(values.shape[-1], dtype=float), values.shape)
+    np.put_along_axis(ranks, order, positions, axis=-1)
+    ranks[np.isnan(values)] = np.nan
+    return ranks
+
+
+def rank_persistence(values: np.ndarray) -> np.ndarray:
+    """
+    各日とその前日の業種順位のスピアマン相関を返す（先頭日と、共通の業種が3未満の日は NaN）。
+
+    Examples:
+        >>> days = np.array([[1.0, 2.0, 3.0, 4.0], [1.5, 2.5, 3.5, 0.0], [4.0, 3.0, 2.0, 1.0]])
+        >>> rank_persistence(days).round(2).tolist()
+        [nan, -0.2, 0.2]
+    """
+    result = np.full(values.shape[0], np.nan)
+    if values.shape[0] < 2:
+        return result
+    today, previous = values[1:], values[:-1]
+    common = ~np.isnan(today) & ~np.isnan(previous)
+    today_ranks = _ranks(np.where(common, today, np.nan))
+    previous_ranks = _ranks(np.where(common, previous, np.nan))
+
+    count = common.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 共通の業種は両日とも 0..n-1 の順位を持つため、平均と分散は n だけで決まる
+        mean = (count - 1) / 2
+        covariance = np.nansum(today_ranks * previous_ranks, axis=-1) / count - mean**2
+        variance = (count**2 - 1) / 12
+        result[1:] = np.where(count >= 3, covariance / variance, np.nan)
+    return result
+
+
+def momentum_leaders(scores: np.ndarray, top: int) -> np.ndarray:
+    """各日のスコア上位 ``top`` 業種の列番号を返す（(日付, top)、NaN は下位扱い）。"""
+
+    return np.argsort(np.where(np.isnan(scores), -np.inf, -scores), axis=-1, kind="stable")[:, :top]
+
+
+# ===========================
+# レポート
+# ===========================
+
+
+def rotation_report(
+    history: SectorHistory, window: int = DEFAULT_WINDOW, top: int = DEFAULT_TOP
+) -> Dict[str, np.ndarray]:
+    """全日のローテーション指標をまとめて計算する。"""
+
+    close = history.change[:, CLOSE]
+    rolling = rolling_returns(close, window)
+    afternoon, reversal = midday_to_close(history)
+    has_both = ~np.isnan(afternoon) & ~np.isnan(history.change[:, MIDDAY])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        reversal_rate = reversal.sum(axis=-1) / has_both.sum(axis=-1)
+    return {
+        "rolling": rolling,
+        "zscore": zscores(history.change),
+        "afternoon": afternoon,
+        "reversal": reversal,
+        "reversal_rate": reversal_rate,
+        "persistence": rank_persistence(close),
+        "leaders": momentum_leaders(rolling, top),
+    }
+
+
+def synthetic_history(days: int, sectors: int = 33, seed: int = 0) -> SectorHistory:
+    """計測用の合成データ（日数 × 2スロット × 業種）を作る。"""
+
+    generator = np.random.default_rng(seed)
+    change = generator.normal(0, 1.2, size=(days, len(SLOTS), sectors))
+    previous_close = 1000 * np.exp(np.cumsum(generator.normal(0, 0.012, size=(days, sectors)), axis=0))
+    price = previous_close[:, None, :] * (1 + change / 100)
+    start = datetime.date(2025, 1, 6)
+    return SectorHistory(
+        dates=[start + datetime.timedelta(days=offset) for offset in range(days)],
+        sectors=[f"業種{number:02d}" for number in range(sectors)],
+        price=price,
+        change=change,
+    )
+
+
+def _rounded(values: np.ndarray) -> Any:
+    return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+
+def report_to_dict(history: SectorHistory, report: Mapping[str, np.ndarray]) -> Dict[str, Any]:
+    """JSON 出力用に日付ごとの指標へ変換する。"""
+
+    days = []
+    for day, date in enumerate(history.dates):
+        days.append({
+            "date": date.isoformat(),
+            "rolling": dict(zip(history.sectors, _rounded(report["rolling"][day]))),
+            "afternoon": dict(zip(history.sectors, _rounded(report["afternoon"][day]))),
+            "reversal_rate": _rounded(report["reversal_rate"][day : day + 1])[0],
+            "persistence": _rounded(report["persistence"][day : day + 1])[0],
+            "leaders": [history.sectors[index] for index in report["leaders"][day]
+                        if not np.isnan(report["rolling"][day, index])],
+        })
+    return {"sectors": history.sectors, "days": days}
+
+
+def format_latest(history: SectorHistory, report: Mapping[str, np.ndarray], window: int) -> str:
+    """直近日のローテーションを表示用の文字列にする。"""
+
+    day = len(history.dates) - 1
+    lines = [f"{history.dates[day]}（{len(history.dates)} 日 / {len(history.sectors)} 業種）"]
+
+    leaders = [index for index in report["leaders"][day] if not np.isnan(report["rolling"][day, index])]
+    lines.append(f"{window}日モメンタム上位:")
+    lines += [f"  {history.sectors[index]:<10} {report['rolling'][day, index]:+.2f}%" for index in leaders]
+    if not leaders:
+        lines.append(f"  （{window}日分の引けデータがそろっていません）")
+
+    zscore = report["zscore"][day, CLOSE]
+    ranked = [index for index in np.argsort(-np.nan_to_num(zscore, nan=-np.inf)) if not np.isnan(zscore[index])]
+    if ranked:
+        lines.append("引けの z スコア（上位 / 下位）:")
+        lines += [f"  {history.sectors[index]:<10} {zscore[index]:+.2f}" for index in ranked[:3] + ranked[-3:]]
+
+    rate = report["reversal_rate"][day]
+    if not np.isnan(rate):
+        reversed_names = [history.sectors[index] for index in np.flatnonzero(report["reversal"][day])]
+        lines.append(f"前場 → 後場の反転: {rate:.0%}（{'、'.join(reversed_names) or 'なし'}）")
+    persistence = report["persistence"][day]
+    if not np.isnan(persistence):
+        lines.append(f"前日との順位相関（スピアマン）: {persistence:+.2f}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="業種別ランキングのローテーション分析")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="モメンタムの日数")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="モメンタム上位の業種数")
+    parser.add_argument("--json", action="store_true", help="全日の指標を JSON で出力")
+    parser.add_argument("--bench", type=int, default=None, metavar="DAYS", help="合成データで計算時間を計測")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if args.bench is not None:
+        history = synthetic_history(args.bench)
+        started = time.perf_counter()
+        report = rotation_report(history, args.window, args.top)
+        elapsed = time.perf_counter() - started
+        print(f"{args.bench} 日 × {len(SLOTS)} スロット × {len(history.sectors)} 業種: {elapsed * 1000:.1f} ms")
+        print(format_latest(history, report, args.window))
+        return
+
+    started = time.perf_counter()
+    history = load_history()
+    loaded = time.perf_counter()
+    if not history.dates:
+        raise SystemExit("業種別スナップショットがありません")
+    report = rotation_report(history, args.window, args.top)
+    logger.info(
+        "読み込み %.3f 秒 / 計算 %.3f 秒", loaded - started, time.perf_counter() - loaded
+    )
+    if args.json:
+        print(json.dumps(report_to_dict(history, report), ensure_ascii=False, indent=2))
+        return
+    print(format_latest(history, report, args.window))
+
+
+if __name__ == "__main__":
+    main()
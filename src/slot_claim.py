@@ -0,0 +1,262 @@
+"""
+スロット実行権（claim）モジュール
+
+``(対象, 日付, スロット時刻)`` ごとに1つの claim ファイルを作成し、作成に成功した実行だけが
+取得を行います。内容を書いた一時ファイルを ``os.link`` で claim のパスに張るため、作成の成否は
+1回のシステムコールで決まり、内容のない claim が見えることもありません。このため
+同じファイルシステムを共有する実行（同一ホストのプロセスや、共有ディレクトリ上の複数ノード）が
+同時に実行しても取得は1回になります。ファイルの更新時刻には依存しないため
+``git checkout`` 後の再実行でも判定は変わりません。
+
+GitHub Actions のランナーどうしはファイルシステムを共有せず、git（claim をコミットした data/）を
+介してしか互いの claim を見られないため、同時に起動したランナーの排他にはなりません
+（コミット済みの claim による再実行時の重複防止だけが効きます）。
+
+claim ファイル: ``data/claims/YYYYMMDD/<対象>_<HHMM>.claim``
+    {"status": "running" | "done", "owner": "host:pid", "started_at": ..., "lease_until": ..., "result": ...}
+
+取得に失敗した場合は claim を削除し、後続の再実行で取り直せるようにします。
+プロセスの強制終了やジョブのタイムアウトで ``running`` のまま残った claim は、
+``lease_until``（開始から ``SLOT_CLAIM_LEASE_SECONDS`` 秒）を過ぎると次の実行が引き継ぎます。
+空・壊れた claim と、スロット時刻より前に開始した claim（スロットの取り違えで作られたもの）も
+無効として引き継ぎます。スロット時刻より前の実行はそのスロットを取得しません。
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+
+from config import SLOT_CLAIM_DIR, SLOT_CLAIM_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+BASE_DIR = Path(__file__).resolve().parent.parent
+CLAIM_ROOT = BASE_DIR / SLOT_CLAIM_DIR
+
+
+def claim_path(
+    target: str, slot_time: str, date: datetime.date, root: Optional[Path] = None
+) -> Path:
+    """
+    claim ファイルのパスを返す。
+
+    Examples:
+        >>> claim_path("morning", "09:20", datetime.date(2025, 11, 4), Path("claims")).as_posix()
+        'claims/20251104/morning_0920.claim'
+    """
+    root = CLAIM_ROOT if root is None else root
+    return root / date.strftime("%Y%m%d") / f"{target}_{slot_time.replace(':', '')}.claim"
+
+
+def _read(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open("r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def is_expired(record: Dict[str, Any], now: datetime.datetime) -> bool:
+    """
+    ``running`` の claim の保持期限が過ぎているかどうか。期限のない旧形式は開始時刻から判定する。
+
+    Examples:
+        >>> now = datetime.datetime(2025, 11, 4, 9, 50, tzinfo=JST)
+        >>> is_expired({"status": "running", "lease_until": "2025-11-04T09:40:00+09:00"}, now)
+        True
+        >>> is_expired({"status": "running", "lease_until": "2025-11-04T10:00:00+09:00"}, now)
+        False
+        >>> is_expired({"status": "done", "lease_until": "2025-11-04T09:40:00+09:00"}, now)
+        False
+    """
+    if record.get("status") != "running":
+        return False
+    try:
+        if record.get("lease_until"):
+            deadline = datetime.datetime.fromisoformat(record["lease_until"])
+        else:
+            started = record.get("started_at") or record.get("claimed_at")
+            deadline = datetime.datetime.fromisoformat(started) + datetime.timedelta(
+                seconds=SLOT_CLAIM_LEASE_SECONDS
+            )
+    except (TypeError, ValueError):
+        return False
+    return now >= deadline
+
+
+def slot_start(slot_time: str, now: datetime.datetime) -> datetime.datetime:
+    """
+    ``now`` と同じ日のスロット開始時刻を返す。
+
+    Examples:
+        >>> slot_start("11:45", datetime.datetime(2025, 11, 4, 9, 20, tzinfo=JST)).isoformat()
+        '2025-11-04T11:45:00+09:00'
+    """
+    hour, minute = map(int, slot_time.split(":"))
+    return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def is_stale(record: Dict[str, Any], now: datetime.datetime, slot_at: datetime.datetime) -> bool:
+    """
+    claim を無効として引き継いでよいかどうか。
+
+    空・壊れた claim、スロット時刻より前に開始した claim、保持期限切れの ``running`` が対象。
+
+    Examples:
+        >>> now = datetime.datetime(2025, 11, 4, 11, 47, tzinfo=JST)
+        >>> slot_at = slot_start("11:45", now)
+        >>> is_stale({}, now, slot_at)
+        True
+        >>> is_stale({"status": "done", "started_at": "2025-11-04T09:20:05+09:00"}, now, slot_at)
+        True
+        >>> is_stale({"status": "done", "started_at": "2025-11-04T11:45:30+09:00"}, now, slot_at)
+        False
+    """
+    if not record:
+        return True
+    started = record.get("started_at") or record.get("claimed_at")
+    try:
+        if started and datetime.datetime.fromisoformat(started) < slot_at:
+            return True
+    except (TypeError, ValueError):
+        return True
+    return is_expired(record, now)
+
+
+def _take_over(path: Path, stale: Dict[str, Any]) -> bool:
+    """
+    期限切れの claim を退避して取り除く。並行する引き継ぎのうち1つだけが成功する。
+
+    退避した内容が判定時と異なる（他の実行が先に引き継いで作り直した）場合は元に戻す。
+    """
+    tombstone = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.stale")
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        return True  # 他の実行が先に退避した（作成は os.link で競う）
+    moved = _read(tombstone)
+    if moved != stale:
+        try:
+            os.link(tombstone, path)
+        except FileExistsError:
+            pass
+        tombstone.unlink()
+        return False
+    tombstone.unlink()
+    return True
+
+
+class SlotClaim:
+    """取得済みのスロット実行権。"""
+
+    def __init__(self, path: Path, record: Dict[str, Any]) -> None:
+        self.path = path
+        self.record = record
+
+    def complete(self, result: Optional[object] = None) -> None:
+        """取得完了を記録する（書き込みは一時ファイル経由で置き換え）。"""
+
+        record = {
+            **self.record,
+            "status": "done",
+            "completed_at": datetime.datetime.now(JST).isoformat(),
+            "result": str(result) if result is not None else None,
+        }
+        record.pop("lease_until", None)
+        temp_path = self.path.with_suffix(".tmp")
+        with temp_path.open("w", encoding="utf-8") as file:
+            json.dump(record, file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+        self.record = record
+
+    def release(self) -> None:
+        """取得失敗時に claim を削除し、再実行で取り直せるようにする。"""
+
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info("スロット実行権を解放しました: %s", self.path.name)
+
+
+def try_claim(
+    target: str,
+    slot_time: str,
+    now: Optional[datetime.datetime] = None,
+    root: Optional[Path] = None,
+) -> Optional[SlotClaim]:
+    """
+    スロットの実行権を取得する。保持期限を過ぎた ``running`` の claim は引き継ぐ。
+
+    Args:
+        target: 取得対象（morning / afternoon / midday / close）
+        slot_time: 予定スロット時刻（HH:MM）
+        now: 現在時刻（省略時は JST の現在時刻。日付と保持期限の決定に使う）
+        root: claim ディレクトリ（省略時は ``SLOT_CLAIM_DIR``）
+
+    Returns:
+        Optional[SlotClaim]: 取得できた場合は claim、他の実行が保持している場合は None
+    """
+    now = now or datetime.datetime.now(JST)
+    slot_at = slot_start(slot_time, now)
+    if now < slot_at:
+        logger.warning(
+            "スロット %s (%s) の時刻前（%s）のため実行権を取得しません。",
+            slot_time,
+            target,
+            now.strftime("%H:%M"),
+        )
+        return None
+    path = claim_path(target, slot_time, now.date(), root)
+    record = {
+        "status": "running",
+        "target": target,
+        "slot_time": slot_time,
+        "owner": f"{socket.gethostname()}:{os.getpid()}",
+        "started_at": now.isoformat(),
+        "lease_until": (now + datetime.timedelta(seconds=SLOT_CLAIM_LEASE_SECONDS)).isoformat(),
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with temp_path.open("w", encoding="utf-8") as file:
+        json.dump(record, file, ensure_ascii=False, indent=2)
+    try:
+        while True:
+            try:
+                os.link(temp_path, path)
+                break
+            except FileExistsError:
+                pass
+            existing = _read(path)
+            if is_stale(existing, now, slot_at) and _take_over(path, existing):
+                logger.warning(
+                    "無効・期限切れのスロット実行権を引き継ぎます: %s（%s, 開始 %s）",
+                    path.name,
+                    existing.get("owner", "不明"),
+                    existing.get("started_at") or existing.get("claimed_at", "不明"),
+                )
+                continue
+            logger.info(
+                "スロット %s (%s) は実行済みまたは実行中のためスキップします（%s, %s, %s）。",
+                slot_time,
+                target,
+                existing.get("status", "不明"),
+                existing.get("owner", "不明"),
+                existing.get("started_at") or existing.get("claimed_at", "不明"),
+            )
+            return None
+    finally:
+        temp_path.unlink()
+
+    logger.info("スロット実行権を取得しました: %s", path.name)
+    return SlotClaim(path, record)
@@ -0,0 +1,267 @@
+"""
+スロット遅延（SLO）トラッキングモジュール
+
+予定スロット時刻（``slot_time``）から実際の取得時刻（``scraped_at``）までの遅延を
+スナップショットごとに算出し、スロット単位で直近の p50 / p95 / max を集計します。
+新しい実行の遅延が SLO を超えた場合はアラート文を返します。
+
+使い方:
+    python slot_lag.py          # 履歴全体の集計を表示
+    python slot_lag.py --json   # 集計結果を JSON で出力
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import math
+import sys
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import SLOT_LAG_SLO_OVERRIDES, SLOT_LAG_SLO_SECONDS, SLOT_LAG_WINDOW
+from snapshot_store import (
+    Snapshot,
+    iter_snapshots,
+    list_snapshots,
+    load_snapshot,
+    snapshot_slot,
+    snapshot_time,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LagSample:
+    """スナップショット1件分のスロット遅延。"""
+
+    target: str
+    slot: str
+    date: datetime.date
+    lag_seconds: float
+
+
+@dataclass
+class SlotLagStats:
+    """スロット単位の直近遅延統計（秒）。"""
+
+    target: str
+    slot: str
+    count: int
+    p50: float
+    p95: float
+    max: float
+    last: float
+    slo_seconds: float
+    misses: int
+
+
+def slo_for(target: str, slot: str) -> float:
+    """指定スロットの SLO（秒）を返す。"""
+
+    return float(SLOT_LAG_SLO_OVERRIDES.get(f"{target} {slot}", SLOT_LAG_SLO_SECONDS))
+
+
+def compute_lag(target: str, data: Snapshot, key: Optional[str] = None) -> Optional[LagSample]:
+    """
+    スナップショットの予定スロット時刻から取得時刻までの遅延を算出する。
+
+    ``slot_time`` を持たない旧形式のスナップショットは ``None`` を返す。
+
+    Examples:
+        >>> sample = compute_lag("morning", {
+        ...     "slot_time": "09:35",
+        ...     "scraped_at": "2025-11-04T11:17:38+09:00",
+        ... })
+        >>> int(sample.lag_seconds // 60)
+        102
+    """
+    slot = snapshot_slot(data)
+    scraped = snapshot_time(data, key)
+    if not slot or scraped is None:
+        return None
+
+    try:
+        hour, minute = map(int, slot.split(":"))
+    except ValueError:
+        return None
+
+    scheduled = scraped.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return LagSample(
+        target=target,
+        slot=slot,
+        date=scraped.date(),
+        lag_seconds=(scraped - scheduled).total_seconds(),
+    )
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    """最近傍順位法によるパーセンタイル。"""
+
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class SlotLagTracker:
+    """スロットごとに直近 ``window`` 件の遅延を保持して統計を算出する。"""
+
+    def __init__(self, window: int = SLOT_LAG_WINDOW) -> None:
+        self._window = window
+        self._samples: Dict[Tuple[str, str], Deque[LagSample]] = {}
+
+    @classmethod
+    def from_history(
+        cls, targets: Optional[Iterable[str]] = None, window: int = SLOT_LAG_WINDOW
+    ) -> "SlotLagTracker":
+        """保存済みスナップショット履歴から集計を構築する。"""
+
+        tracker = cls(window)
+        for ref, data in iter_snapshots(targets):
+            sample = compute_lag(ref.target, data, ref.key)
+            if sample is not None:
+                tracker.add(sample)
+        return tracker
+
+    @classmethod
+    def from_recent(
+        cls, target: str, slot: str, window: int = SLOT_LAG_WINDOW
+    ) -> "SlotLagTracker":
+        """
+        指定スロットの直近の遅延を新しい順に読み込んで集計を構築する（通知時の評価用）。
+
+        スナップショットのある直近 ``window`` 日のうち、当該スロットの直近 ``window`` 件を使う。
+        スロットの取得は1日1回（slot_claim.py）のため、毎日取得していれば履歴全体の直近
+        ``window`` 件と同じになる。それより前の日付は読み込まないので、履歴が増えても
+        読み込む件数は変わらない（取得しなかった日がある場合は件数が少なくなる）。
+        """
+        tracker = cls(window)
+        samples: List[LagSample] = []
+        dates = set()
+        for ref in reversed(list_snapshots(target)):
+            dates.add(ref.key[:8])
+            if len(samples) >= window or len(dates) > window:
+                break
+            data = load_snapshot(ref)
+            sample = compute_lag(target, data, ref.key) if data is not None else None
+            if sample is not None and sample.slot == slot:
+                samples.append(sample)
+        for sample in reversed(samples):
+            tracker.add(sample)
+        return tracker
+
+    def add(self, sample: LagSample) -> None:
+        """サンプルを追加する（古いものは窓から押し出される）。"""
+
+        key = (sample.target, sample.slot)
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = deque(maxlen=self._window)
+            self._samples[key] = samples
+        samples.append(sample)
+
+    def stats(self, target: str, slot: str) -> Optional[SlotLagStats]:
+        """指定スロットの統計を返す（サンプルがなければ ``None``）。"""
+
+        samples = self._samples.get((target, slot))
+        if not samples:
+            return None
+
+        values = sorted(sample.lag_seconds for sample in samples)
+        slo = slo_for(target, slot)
+        return SlotLagStats(
+            target=target,
+            slot=slot,
+            count=len(values),
+            p50=_percentile(values, 0.50),
+            p95=_percentile(values, 0.95),
+            max=values[-1],
+            last=samples[-1].lag_seconds,
+            slo_seconds=slo,
+            misses=sum(1 for value in values if value > slo),
+        )
+
+    def all_stats(self) -> List[SlotLagStats]:
+        """全スロットの統計を対象・スロット順で返す。"""
+
+        result = []
+        for target, slot in sorted(self._samples):
+            stats = self.stats(target, slot)
+            if stats is not None:
+                result.append(stats)
+        return result
+
+
+def format_lag_alert(sample: LagSample, stats: Optional[SlotLagStats]) -> str:
+    """SLO 超過時の通知文を作成する。"""
+
+    message = (
+        f"⏱ スロット遅延 SLO 超過: {sample.target} {sample.slot} "
+        f"遅延 {sample.lag_seconds / 60:.1f}分 (SLO {slo_for(sample.target, sample.slot) / 60:.0f}分)"
+    )
+    if stats is not None:
+        message += (
+            f"\n直近{stats.count}回: p50 {stats.p50 / 60:.1f}分 / "
+            f"p95 {stats.p95 / 60:.1f}分 / max {stats.max / 60:.1f}分 "
+            f"(超過 {stats.misses}回)"
+        )
+    return message
+
+
+def evaluate_run(target: str, data: Snapshot) -> Optional[str]:
+    """
+    新しく保存したスナップショットの遅延を評価する。
+
+    当該スロットの直近の履歴（保存済みの当該スナップショットを含む）から統計を算出してログに出力し、
+    SLO を超えていればアラート文を、超えていなければ ``None`` を返す。
+    """
+    sample = compute_lag(target, data)
+    if sample is None:
+        return None
+
+    tracker = SlotLagTracker.from_recent(target, sample.slot)
+    stats = tracker.stats(target, sample.slot)
+    if stats is not None:
+        logger.info(
+            "スロット遅延 %s %s: 今回 %.0f秒 / p50 %.0f秒 / p95 %.0f秒 / max %.0f秒 (n=%d)",
+            target,
+            sample.slot,
+            sample.lag_seconds,
+            stats.p50,
+            stats.p95,
+            stats.max,
+            stats.count,
+        )
+
+    if sample.lag_seconds <= slo_for(target, sample.slot):
+        return None
+
+    alert = format_lag_alert(sample, stats)
+    logger.warning(alert.replace("\n", " "))
+    return alert
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """履歴全体のスロット遅延統計を表示する。"""
+
+    args = list(sys.argv[1:] if argv is None else argv)
+    tracker = SlotLagTracker.from_history()
+    all_stats = tracker.all_stats()
+
+    if "--json" in args:
+        print(json.dumps([asdict(stats) for stats in all_stats], ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'対象':<10} {'スロット':<6} {'件数':>4} {'p50(分)':>8} {'p95(分)':>8} {'max(分)':>8} {'SLO超過':>7}")
+    for stats in all_stats:
+        print(
+            f"{stats.target:<10} {stats.slot:<6} {stats.count:>4} "
+            f"{stats.p50 / 60:>8.1f} {stats.p95 / 60:>8.1f} {stats.max / 60:>8.1f} "
+            f"{stats.misses:>4}/{stats.count}"
+        )
+
+
+if __name__ == "__main__":
+    main()
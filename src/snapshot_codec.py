@@ -0,0 +1,287 @@
+"""
+スナップショットの保存形式（JSON / 辞書付き zstd）
+
+スナップショットは数KBの小さな JSON で、項目名・市場区分・業種名・URL などの同じ文字列が
+毎回現れます。1ファイルずつ gzip しても辞書が育つ前に終わってしまうため、``data/`` の
+既存スナップショットから学習した zstd 辞書を使って圧縮します。
+
+- 辞書は ``dicts/snapshot_v<版>.zdict`` として版ごとにリポジトリへコミットします。
+  辞書 ID（``DICT_ID_BASE + 版``）が各 zstd フレームに記録されるため、読み込み時は
+  ファイルが作られた版の辞書が自動で選ばれ、新しい版を追加しても古いファイルを読めます。
+- 書き込み形式は ``SNAPSHOT_CODEC``（環境変数 ``SNAPSHOT_CODEC`` で上書き可能）で選びます。
+  ``zstd`` の場合は ``*.json.zst``、それ以外と zstandard 未導入時は従来どおり ``*.json`` です。
+- 読み込み（``loads`` / ``load_path``）は拡張子で判定し、設定に関係なく両形式を読めます。
+
+使い方:
+    python snapshot_codec.py train                # data/ から辞書を学習（ZSTD_DICT_VERSION）
+    python snapshot_codec.py train --version 2    # 新しい版の辞書を追加
+    python snapshot_codec.py stats                # 形式ごとの1ファイルあたりのサイズ・復号時間
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import SNAPSHOT_CODEC, ZSTD_DICT_DIR, ZSTD_DICT_VERSION, ZSTD_LEVEL
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard 未導入時は JSON のみ
+    zstandard = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DICT_ROOT = BASE_DIR / ZSTD_DICT_DIR
+ZSTD_SUFFIX = ".zst"
+JSON_INDENT = 2
+
+# zstd の辞書 ID は 32768 未満が予約済みのため、その上に版番号を足して使う
+DICT_ID_BASE = 32768
+
+# 学習時の辞書サイズ（バイト）
+DEFAULT_DICT_SIZE = 16 * 1024
+
+
+def configured_codec() -> str:
+    """書き込み形式（config または環境変数 SNAPSHOT_CODEC）を返す。"""
+
+    return os.environ.get("SNAPSHOT_CODEC", "").strip().lower() or SNAPSHOT_CODEC
+
+
+def dict_path(version: int) -> Path:
+    return DICT_ROOT / f"snapshot_v{version}.zdict"
+
+
+@lru_cache(maxsize=None)
+def load_dictionary(version: int) -> "zstandard.ZstdCompressionDict":
+    """指定版の辞書を読み込む（プロセス内で1回だけ）。"""
+
+    return zstandard.ZstdCompressionDict(dict_path(version).read_bytes())
+
+
+def _dictionary_for_id(dict_id: int) -> Optional["zstandard.ZstdCompressionDict"]:
+    if dict_id == 0:
+        return None
+    path = dict_path(dict_id - DICT_ID_BASE)
+    if not path.exists():
+        raise ValueError(f"zstd 辞書が見つかりません: {path}（辞書 ID {dict_id}）")
+    return load_dictionary(dict_id - DICT_ID_BASE)
+
+
+_warned = False
+
+
+def zstd_enabled() -> bool:
+    """zstd で書き込むかを返す。設定されていても使えない場合は警告して JSON に戻す。"""
+
+    global _warned
+    if configured_codec() != "zstd":
+        return False
+    reason = None
+    if zstandard is None:
+        reason = "zstandard が未導入です"
+    elif not dict_path(ZSTD_DICT_VERSION).exists():
+        reason = f"辞書がありません: {dict_path(ZSTD_DICT_VERSION)}"
+    if reason is None:
+        return True
+    if not _warned:
+        logger.warning("SNAPSHOT_CODEC=zstd ですが %s。JSON で保存します。", reason)
+        _warned = True
+    return False
+
+
+# ZstdCompressor / ZstdDecompressor は同時使用できないためスレッドごとに持つ
+_local = threading.local()
+
+
+def _compressor() -> "zstandard.ZstdCompressor":
+    compressor = getattr(_local, "compressor", None)
+    if compressor is None:
+        dictionary = load_dictionary(ZSTD_DICT_VERSION)
+        dictionary.precompute_compress(level=ZSTD_LEVEL)
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+        _local.compressor = compressor
+    return compressor
+
+
+def _decompressor(dict_id: int) -> "zstandard.ZstdDecompressor":
+    cache: Dict[int, Any] = _local.__dict__.setdefault("decompressors", {})
+    decompressor = cache.get(dict_id)
+    if decompressor is None:
+        dictionary = _dictionary_for_id(dict_id)
+        decompressor = (
+            zstandard.ZstdDecompressor(dict_data=dictionary)
+            if dictionary is not None
+            else zstandard.ZstdDecompressor()
+        )
+        cache[dict_id] = decompressor
+    return decompressor
+
+
+def compress(raw: bytes) -> bytes:
+    """現在の版の辞書で圧縮する。"""
+
+    return _compressor().compress(raw)
+
+
+def decompress(data: bytes) -> bytes:
+    """フレームに記録された辞書 ID の辞書で復号する。"""
+
+    if zstandard is None:
+        raise RuntimeError("zstd 形式のスナップショットを読むには zstandard が必要です")
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    return _decompressor(dict_id).decompress(data)
+
+
+def encode_json(data: Any) -> bytes:
+    """従来の JSON ファイルと同じ書式のバイト列を返す。"""
+
+    return json.dumps(data, ensure_ascii=False, indent=JSON_INDENT).encode("utf-8")
+
+
+def loads(raw: bytes, name: str) -> Any:
+    """ファイル名の拡張子に応じて復号し、JSON として読み込む。"""
+
+    if name.endswith(ZSTD_SUFFIX):
+        raw = decompress(raw)
+    return json.loads(raw)
+
+
+def load_path(path: Path) -> Any:
+    return loads(path.read_bytes(), path.name)
+
+
+def write_snapshot(path: Path, data: Any) -> Path:
+    """
+    ``path``（``*.json``）にスナップショットを書き込み、実際のパスを返す。
+
+    zstd が有効な場合は ``*.json.zst`` に圧縮して書き込む。
+    """
+    raw = encode_json(data)
+    if zstd_enabled():
+        path = path.with_name(path.name + ZSTD_SUFFIX)
+        raw = compress(raw)
+    path.write_bytes(raw)
+    return path
+
+
+def encode_member(name: str, raw: bytes) -> Tuple[str, bytes, bool]:
+    """
+    アーカイブへ格納する (ファイル名, 内容, 圧縮済みか) を返す。
+
+    zstd 形式のファイルはそのまま、zstd が有効なら JSON も圧縮して格納する
+    （圧縮済みの内容はアーカイブ側で再圧縮しない）。
+    """
+    if name.endswith(ZSTD_SUFFIX):
+        return name, raw, True
+    if name.endswith(".json") and zstd_enabled():
+        return name + ZSTD_SUFFIX, compress(raw), True
+    return name, raw, False
+
+
+# ===========================
+# 辞書の学習・評価
+# ===========================
+
+
+def corpus() -> List[bytes]:
+    """学習・評価用に、保存済みのスナップショット（アーカイブ分を含む）を JSON 書式で返す。"""
+
+    from snapshot_store import iter_snapshots
+
+    return [encode_json(data) for _, data in iter_snapshots()]
+
+
+def train(version: int, size: int = DEFAULT_DICT_SIZE, samples: Optional[List[bytes]] = None) -> Path:
+    """スナップショットから辞書を学習して ``dicts/snapshot_v<版>.zdict`` に保存する。"""
+
+    if zstandard is None:
+        raise RuntimeError("辞書の学習には zstandard が必要です（pip install zstandard）")
+    path = dict_path(version)
+    if path.exists():
+        raise FileExistsError(f"{path} は既にあります。既存の版は変更せず新しい版を追加してください")
+    samples = corpus() if samples is None else samples
+    dictionary = zstandard.train_dictionary(
+        size, samples, dict_id=DICT_ID_BASE + version, level=ZSTD_LEVEL
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(dictionary.as_bytes())
+    logger.info(
+        "辞書を保存しました: %s (%d bytes, サンプル %d 件)",
+        path,
+        len(dictionary.as_bytes()),
+        len(samples),
+    )
+    return path
+
+
+def stats(samples: List[bytes], version: int = ZSTD_DICT_VERSION) -> Dict[str, Dict[str, float]]:
+    """形式ごとの1ファイルあたりの平均サイズと復号時間（マイクロ秒）を返す。"""
+
+    results: Dict[str, Dict[str, float]] = {}
+
+    def measure(label: str, encoded: List[bytes], decode: Any) -> None:
+        timings = []
+        for blob in encoded:
+            started = time.perf_counter()
+            decode(blob)
+            timings.append((time.perf_counter() - started) * 1e6)
+        results[label] = {
+            "bytes": statistics.mean(len(blob) for blob in encoded),
+            "decode_us": statistics.median(timings),
+        }
+
+    measure("json", samples, bytes)
+    measure("gzip", [gzip.compress(raw, 9) for raw in samples], gzip.decompress)
+    if zstandard is not None:
+        plain = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        measure("zstd", [plain.compress(raw) for raw in samples], zstandard.ZstdDecompressor().decompress)
+        if dict_path(version).exists():
+            dictionary = load_dictionary(version)
+            with_dict = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+            measure(
+                f"zstd+dict v{version}",
+                [with_dict.compress(raw) for raw in samples],
+                zstandard.ZstdDecompressor(dict_data=dictionary).decompress,
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="スナップショット圧縮用 zstd 辞書の学習と評価")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train")
+    train_parser.add_argument("--version", type=int, default=ZSTD_DICT_VERSION)
+    train_parser.add_argument("--size", type=int, default=DEFAULT_DICT_SIZE)
+    stats_parser = subparsers.add_parser("stats")
+    stats_parser.add_argument("--version", type=int, default=ZSTD_DICT_VERSION)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if args.command == "train":
+        print(train(args.version, args.size))
+        return
+
+    samples = corpus()
+    print(f"サンプル {len(samples)} 件")
+    for label, values in stats(samples, args.version).items():
+        print(f"{label:<14} {values['bytes']:>8.0f} bytes/件  復号 {values['decode_us']:>7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+スナップショット履歴アクセスモジュール
+
+``data/`` 配下に保存されたランキングスナップショット（JSON）の一覧取得・読み込みを
+一か所にまとめます。各機能（遅延集計・分析など）はファイル配置を意識せず、
+このモジュール経由で履歴を参照します。
+
+直近の取引日は個別の JSON ファイル（ホット）、それより古いものは日単位の圧縮アーカイブ
+``data/archive/<対象>/YYYYMMDD.zip``（コールド、data_tiering.py が作成）にあります。
+一覧は ``data/archive/index.json`` とホットのディレクトリから作るため、アーカイブを開かずに
+取得でき、読み込み時だけ該当アーカイブから取り出します。
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import os
+import zipfile
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from config import ARCHIVE_DIR, DATA_DIR, SECTOR_DATA_DIR
+from snapshot_codec import load_path, loads
+
+logger = logging.getLogger(__name__)
+
+JST = ZoneInfo("Asia/Tokyo")
+DATETIME_FORMAT = "%Y%m%d_%H%M"
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_ROOT = BASE_DIR / DATA_DIR
+ARCHIVE_ROOT = BASE_DIR / ARCHIVE_DIR
+ARCHIVE_INDEX = ARCHIVE_ROOT / "index.json"
+
+# 取得対象 → (保存ディレクトリ, ファイル名 glob)
+# いずれも JSON（*.json）と辞書付き zstd（*.json.zst、snapshot_codec.py）の両形式を含む
+SNAPSHOT_SOURCES: Dict[str, Tuple[Path, str]] = {
+    "morning": (DATA_ROOT / "morning", "ranking_*.json*"),
+    "afternoon": (DATA_ROOT / "afternoon", "ranking_*.json*"),
+    "sector": (BASE_DIR / SECTOR_DATA_DIR, "sector_ranking_*.json*"),
+}
+
+Snapshot = Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class SnapshotRef:
+    """保存済みスナップショット1件への参照。"""
+
+    target: str
+    key: str  # YYYYMMDD_HHMM
+    path: Path  # ホットは JSON ファイル、コールドはアーカイブ（zip）
+    member: Optional[str] = None  # コールドの場合のアーカイブ内ファイル名
+
+    @property
+    def date(self) -> datetime.date:
+        return datetime.datetime.strptime(self.key[:8], "%Y%m%d").date()
+
+
+def snapshot_key(path: Path) -> str:
+    """ファイル名から ``YYYYMMDD_HHMM`` 形式のキーを取り出す。"""
+
+    return "_".join(path.name.split(".", 1)[0].split("_")[-2:])
+
+
+def archive_path(name: str, part: str, root: Optional[Path] = None) -> Path:
+    """
+    アーカイブのパスを返す（``name`` は対象名、``part`` は索引のキー: YYYYMMDD / YYYYMMDD-2、旧形式は YYYYMM）。
+
+    Examples:
+        >>> archive_path("morning", "20251031", Path("archive")).as_posix()
+        'archive/morning/20251031.zip'
+    """
+    root = ARCHIVE_ROOT if root is None else root
+    return root / name / f"{part}.zip"
+
+
+_index_cache: Tuple[Optional[int], Dict[str, Dict[str, List[str]]]] = (None, {})
+
+
+def load_archive_index() -> Dict[str, Dict[str, List[str]]]:
+    """アーカイブ索引（対象 → アーカイブ名 → ファイル名一覧）を返す。更新時刻が変わった時だけ読み直す。"""
+
+    global _index_cache
+    try:
+        mtime = os.stat(ARCHIVE_INDEX).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _index_cache[0] == mtime:
+        return _index_cache[1]
+    try:
+        with ARCHIVE_INDEX.open("r", encoding="utf-8") as file:
+            index = json.load(file).get("targets", {})
+    except (json.JSONDecodeError, OSError) as exc:
+        logger.warning("アーカイブ索引の読み込みに失敗しました: %s (%s)", ARCHIVE_INDEX, exc)
+        return {}
+    _index_cache = (mtime, index)
+    return index
+
+
+@lru_cache(maxsize=16)
+def _open_archive(path: Path, mtime: int) -> zipfile.ZipFile:
+    # 同じアーカイブを続けて読む場合に中央ディレクトリの解析を繰り返さない（更新時刻が変われば開き直す）
+    return zipfile.ZipFile(path)
+
+
+def read_archived(path: Path, member: str) -> bytes:
+    """アーカイブ内のファイルを読み込む。"""
+
+    return _open_archive(path, os.stat(path).st_mtime_ns).read(member)
+
+
+def find_archived(name: str, member: str) -> Optional[Path]:
+    """索引から ``member`` を含むアーカイブのパスを返す。アーカイブされていなければ None。"""
+
+    for part, members in load_archive_index().get(name, {}).items():
+        if member in members:
+            return archive_path(name, part)
+    return None
+
+
+def list_snapshots(target: str) -> List[SnapshotRef]:
+    """指定対象のスナップショットをキー（日時）昇順で返す（アーカイブ分を含む）。"""
+
+    source = SNAPSHOT_SOURCES.get(target)
+    if source is None:
+        raise KeyError(f"未知のスナップショット対象です: {target}")
+
+    directory, pattern = source
+    refs: Dict[str, SnapshotRef] = {}
+    for part, members in load_archive_index().get(target, {}).items():
+        path = archive_path(target, part)
+        for member in members:
+            if Path(member).match(pattern):
+                refs[member] = SnapshotRef(target, snapshot_key(Path(member)), path, member)
+    # アーカイブ後の削除前に中断した場合など、両方にあればホットを優先する
+    if directory.exists():
+        for path in directory.glob(pattern):
+            refs[path.name] = SnapshotRef(target=target, key=snapshot_key(path), path=path)
+
+    return sorted(refs.values(), key=lambda ref: (ref.key, ref.member or ref.path.name))
+
+
+def load_snapshot(ref: SnapshotRef) -> Optional[Snapshot]:
+    """スナップショットを読み込む。壊れたファイルは警告して ``None`` を返す。"""
+
+    try:
+        if ref.member is not None:
+            return loads(read_archived(ref.path, ref.member), ref.member)
+        return load_path(ref.path)
+    except (ValueError, OSError, KeyError, RuntimeError, zipfile.BadZipFile) as exc:
+        logger.warning(
+            "スナップショットの読み込みに失敗しました: %s%s (%s)",
+            ref.path,
+            f"!{ref.member}" if ref.member else "",
+            exc,
+        )
+        return None
+
+
+def iter_snapshots(
+    targets: Optional[Iterable[str]] = None,
+) -> Iterator[Tuple[SnapshotRef, Snapshot]]:
+    """対象ごとに日時昇順でスナップショットを読み込んで返す。"""
+
+    for target in targets or SNAPSHOT_SOURCES:
+        for ref in list_snapshots(target):
+            data = load_snapshot(ref)
+            if data is not None:
+                yield ref, data
+
+
+def snapshot_slot(data: Snapshot) -> Optional[str]:
+    """予定スロット時刻（HH:MM）を返す。旧形式の ``time_slot`` にも対応。"""
+
+    return data.get("slot_time") or data.get("time_slot")
+
+
+def snapshot_time(data: Snapshot, key: Optional[str] = None) -> Optional[datetime.datetime]:
+    """取得時刻を返す（``scraped_at`` 優先、なければ ``datetime`` / キーから復元）。"""
+
+    scraped_at = data.get("scraped_at")
+    if isinstance(scraped_at, str) and scraped_at:
+        try:
+            value = datetime.datetime.fromisoformat(scraped_at)
+            return value if value.tzinfo else value.replace(tzinfo=JST)
+        except ValueError:
+            pass
+
+    datetime_str = data.get("datetime") or key
+    if isinstance(datetime_str, str):
+        try:
+            return datetime.datetime.strptime(datetime_str, DATETIME_FORMAT).replace(tzinfo=JST)
+        except ValueError:
+            pass
+    return None
@@ -0,0 +1,251 @@
+"""
+ウォッチリスト（購読者別通知）モジュール
+
+購読者ごとに登録された銘柄コード・業種名に該当する行だけを、全体サマリーに添えて通知します。
+
+照合は「銘柄コード / 業種名 → 購読者」の転置インデックスで行うため、
+1スナップショットあたりの照合コストはランキング行数（＋該当件数）に比例し、
+購読者数には比例しません。同じ本文になる購読者（該当なしでサマリーのみ等）は
+まとめて LINE の multicast 1通で送信します。
+
+購読者定義ファイル（``SUBSCRIPTIONS_FILE``）の形式:
+    {
+      "subscribers": [
+        {"id": "U0123...", "name": "山田", "codes": ["9984", "285A"], "sectors": ["鉱業"]},
+        {"id": "U4567...", "codes": ["7203"], "summary": false}
+      ]
+    }
+
+``summary`` を false にした購読者には、該当がある場合のみ通知します。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from config import LINE_MULTICAST_LIMIT, SUBSCRIPTIONS_FILE
+from notification_outbox import RECIPIENT_SEPARATOR, NewMessage, fan_out, get_outbox
+from notify_channels import enabled_channels
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SUBSCRIPTIONS_ENV = "SCRAPER_SUBSCRIPTIONS"
+
+Row = Mapping[str, Any]
+
+
+@dataclass(frozen=True)
+class Subscriber:
+    """購読者1名分の設定。"""
+
+    id: str  # LINE ユーザーID
+    name: str = ""
+    codes: FrozenSet[str] = frozenset()
+    sectors: FrozenSet[str] = frozenset()
+    summary: bool = True
+
+
+def _normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+
+def _normalize_sector(sector: str) -> str:
+    return sector.strip()
+
+
+def subscriptions_path() -> Path:
+    """購読者定義ファイルのパスを返す（環境変数 SCRAPER_SUBSCRIPTIONS 優先）。"""
+
+    value = os.environ.get(SUBSCRIPTIONS_ENV, "").strip()
+    return Path(value) if value else BASE_DIR / SUBSCRIPTIONS_FILE
+
+
+def load_subscribers(path: Optional[Path] = None) -> List[Subscriber]:
+    """
+    購読者定義ファイルを読み込む。
+
+    ファイルがない場合は空リストを返す（従来どおりの一斉通知になる）。
+
+    Raises:
+        ValueError: ファイルの形式が不正な場合
+    """
+    path = path or subscriptions_path()
+    if not path.exists():
+        return []
+
+    with path.open("r", encoding="utf-8") as file:
+        data = json.load(file)
+
+    subscribers = []
+    for entry in data.get("subscribers", []):
+        if not isinstance(entry, dict) or not entry.get("id"):
+            raise ValueError(f"購読者定義に id がありません: {entry!r}")
+        subscribers.append(
+            Subscriber(
+                id=str(entry["id"]),
+                name=str(entry.get("name", "")),
+                codes=frozenset(_normalize_code(str(code)) for code in entry.get("codes", [])),
+                sectors=frozenset(
+                    _normalize_sector(str(sector)) for sector in entry.get("sectors", [])
+                ),
+                summary=bool(entry.get("summary", True)),
+            )
+        )
+    logger.info("購読者定義を読み込みました: %d名 (%s)", len(subscribers), path)
+    return subscribers
+
+
+class SubscriptionIndex:
+    """銘柄コード・業種名 → 購読者ID の転置インデックス。"""
+
+    def __init__(self, subscribers: Iterable[Subscriber]) -> None:
+        self.subscribers: Dict[str, Subscriber] = {}
+        by_code: Dict[str, List[str]] = defaultdict(list)
+        by_sector: Dict[str, List[str]] = defaultdict(list)
+        for subscriber in subscribers:
+            self.subscribers[subscriber.id] = subscriber
+            for code in subscriber.codes:
+                by_code[code].append(subscriber.id)
+            for sector in subscriber.sectors:
+                by_sector[sector].append(subscriber.id)
+        self._by_code: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in by_code.items()}
+        self._by_sector: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in by_sector.items()}
+
+    def __len__(self) -> int:
+        return len(self.subscribers)
+
+    def match(self, rows: Sequence[Row]) -> Dict[str, List[Row]]:
+        """
+        各行を転置インデックスで引き、購読者ID → 該当行のリストを返す。
+
+        Examples:
+            >>> index = SubscriptionIndex([Subscriber("U1", codes=frozenset({"9984"}))])
+            >>> index.match([{"rank": "1", "code": "9984"}, {"rank": "2", "code": "7203"}])
+            {'U1': [{'rank': '1', 'code': '9984'}]}
+        """
+        hits: Dict[str, List[Row]] = defaultdict(list)
+        for row in rows:
+            code = row.get("code")
+            if code:
+                for subscriber_id in self._by_code.get(_normalize_code(str(code)), ()):
+                    hits[subscriber_id].append(row)
+                # 銘柄の行に付いた業種（sector_attribution.py）は照合に使わない
+                continue
+            sector = row.get("sector")
+            if sector:
+                for subscriber_id in self._by_sector.get(_normalize_sector(str(sector)), ()):
+                    hits[subscriber_id].append(row)
+        return dict(hits)
+
+
+def format_watch_line(row: Row) -> str:
+    """ウォッチリスト該当行を1行に整形する（銘柄・業種の両形式に対応）。"""
+
+    rank = row.get("rank", "?")
+    if row.get("code"):
+        change = str(row.get("change_percent", "")).replace("株価変動率：", "").strip() or "-"
+        return f"{rank}位: [{row['code']}] {row.get('name', '不明')} {change}"
+    return f"{rank}位: {row.get('sector', '不明')} {row.get('change') or '-'}"
+
+
+def render_messages(
+    index: SubscriptionIndex, summary: str, rows: Sequence[Row]
+) -> Dict[str, List[str]]:
+    """
+    購読者別メッセージを作成し、本文 → 宛先リストにまとめて返す。
+
+    該当のない購読者はサマリーのみの同一本文になるため1グループに集約される。
+    """
+    hits = index.match(rows)
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for subscriber_id, subscriber in index.subscribers.items():
+        matched = hits.get(subscriber_id)
+        if not matched and not subscriber.summary:
+            continue
+
+        parts = [summary.rstrip("\n")]
+        if matched:
+            parts.append("")
+            parts.append("📌 ウォッチリスト該当")
+            parts.extend(format_watch_line(row) for row in matched)
+        groups["\n".join(parts)].append(subscriber_id)
+    return dict(groups)
+
+
+_default_index: Optional[SubscriptionIndex] = None
+
+
+def get_index() -> SubscriptionIndex:
+    """購読者定義ファイルから構築したインデックスを返す（プロセス内でキャッシュ）。"""
+
+    global _default_index
+    if _default_index is None:
+        _default_index = SubscriptionIndex(load_subscribers())
+    return _default_index
+
+
+def enqueue_for_subscribers(
+    message: str,
+    summary: str,
+    rows: Sequence[Row],
+    dedupe_key: str,
+    operator_note: Optional[str] = None,
+    index: Optional[SubscriptionIndex] = None,
+) -> int:
+    """
+    スナップショットの通知をアウトボックスへ登録し、登録件数を返す。
+
+    購読者がいなければ従来どおり ``message`` 全文を有効な各チャネルの既定の宛先へ登録する。
+    購読者がいれば LINE には ``summary`` ＋該当行の購読者別メッセージを、同一本文ごとに
+    ``LINE_MULTICAST_LIMIT`` 名単位でまとめて登録し、LINE 以外の有効なチャネルには
+    購読者がいない場合と同じ全文を登録する（いずれも1トランザクション）。
+
+    Args:
+        message: 全文メッセージ（購読者なしの場合と、LINE 以外のチャネルに使用）
+        summary: 購読者向けの全体サマリー
+        rows: 照合対象のランキング行（``code`` または ``sector`` を持つ）
+        dedupe_key: スロット単位の重複登録防止キー
+        operator_note: 運用者向けの追記（遅延アラート等）。各チャネルの既定の宛先にのみ送る
+        index: 購読者インデックス（省略時は ``get_index()``）
+    """
+    index = get_index() if index is None else index
+    outbox = get_outbox()
+
+    full_body = f"{message.rstrip()}\n{operator_note}" if operator_note else message
+    if not len(index):
+        return int(outbox.enqueue(full_body, dedupe_key))
+
+    batch: List[NewMessage] = []
+    for body, recipients in render_messages(index, summary, rows).items():
+        digest = hashlib.sha1(body.encode("utf-8")).hexdigest()[:12]
+        for start in range(0, len(recipients), LINE_MULTICAST_LIMIT):
+            chunk = recipients[start : start + LINE_MULTICAST_LIMIT]
+            batch.append(
+                NewMessage(
+                    body=body,
+                    dedupe_key=f"{dedupe_key}:watch:{digest}:{start}",
+                    channel="line",
+                    recipient=RECIPIENT_SEPARATOR.join(chunk),
+                )
+            )
+    # webhook / email / file は購読者別に送らないため、購読者がいない場合と同じ全文（同じ登録キー）を送る
+    batch.extend(message for message in fan_out(full_body, dedupe_key) if message.channel != "line")
+    if operator_note and "line" in enabled_channels():
+        batch.append(NewMessage(operator_note, f"{dedupe_key}:operator", "line"))
+
+    created = outbox.enqueue_many(batch)
+    logger.info(
+        "購読者別通知を登録しました: %d通（購読者 %d名、新規 %d通）",
+        len(batch),
+        len(index),
+        created,
+    )
+    return created
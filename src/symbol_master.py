@@ -0,0 +1,363 @@
+"""
+銘柄マスタ（コード → 銘柄名・市場区分・33業種）
+
+ランキングの銘柄セル（例: "ソフトバンクグループ9984 東P"）は毎回正規表現で分解していましたが、
+同じ銘柄が繰り返し現れるため、分解結果と銘柄の属性を銘柄マスタとして保持し、2回目以降は
+辞書の参照だけで済ませます。33業種区分を持たせることで、銘柄のランキングと業種別ランキング
+（data/sector）を1行あたり O(1) で突き合わせられます。
+
+- キャッシュは ``SYMBOL_MASTER_FILE``（pickle）に保存し、最初に参照した時点で読み込みます。
+- 取得したランキングの行（銘柄名・市場区分）を随時登録します（業種は持たない）。
+- ``SYMBOL_MASTER_CSV`` があれば一括で取り込みます（コード・銘柄名・市場区分・33業種区分）。
+  JPX の上場銘柄一覧（東証上場銘柄一覧）を CSV に変換したものはそのまま読めます。
+- ``SYMBOL_MASTER_TTL_DAYS`` を過ぎると CSV を取り込み直し、ランキングで確認した銘柄は確認日時を更新します。
+  CSV が更新された場合は期間内でも取り込み直します。
+
+業種名は取得元によって表記が異なるため（"ｶﾞﾗｽ土石製品" / "ガラス・土石製品" など）、突き合わせには
+``sector_key()`` で正規化した名前を使います。
+
+使い方:
+    python symbol_master.py import symbols.csv   # CSV を取り込む
+    python symbol_master.py show 9984 285A        # 登録内容を表示
+    python symbol_master.py stats                 # 件数・業種の登録状況
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import SYMBOL_MASTER_CSV, SYMBOL_MASTER_FILE, SYMBOL_MASTER_TTL_DAYS
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MASTER_VERSION = 1
+
+# 銘柄セル: 銘柄名 + (3-4桁の数字+英字 または 4桁の数字) + 市場区分
+_NAME_CELL_PATTERN = re.compile(r"^(.+?)([0-9]{3,4}[A-Z]?)\s+(.*)$")
+
+# CSV の列名 → 項目（英語の列名と JPX の上場銘柄一覧の列名）
+CSV_COLUMNS = {
+    "code": "code",
+    "コード": "code",
+    "name": "name",
+    "銘柄名": "name",
+    "market": "market",
+    "市場・商品区分": "market",
+    "sector": "sector",
+    "33業種区分": "sector",
+}
+
+# JPX の市場・商品区分 → ランキングの市場区分表記
+MARKET_ALIASES = {
+    "プライム": "東P",
+    "スタンダード": "東S",
+    "グロース": "東G",
+}
+
+# 正規化後も表記が異なる業種名
+SECTOR_KEY_ALIASES = {
+    "倉庫運輸関連業": "倉庫運輸関連",
+    "証券商品先物取引業": "証券商品先物",
+}
+
+
+class Symbol(NamedTuple):
+    """銘柄1件。不明な項目は空文字。"""
+
+    code: str
+    name: str
+    market: str
+    sector: str
+    updated_at: float  # 最後に取り込み・確認した時刻（UNIX 時刻）
+
+
+def sector_key(name: str) -> str:
+    """
+    取得元による表記の違いを吸収した業種名を返す。
+
+    Examples:
+        >>> sector_key("ｶﾞﾗｽ土石製品") == sector_key("ガラス・土石製品")
+        True
+        >>> sector_key("証券、商品先物取引業") == sector_key("証券商品先物")
+        True
+        >>> sector_key("情報･通信業")
+        '情報通信業'
+    """
+    key = re.sub(r"[・、\s]", "", unicodedata.normalize("NFKC", name or ""))
+    return SECTOR_KEY_ALIASES.get(key, key)
+
+
+def parse_name_cell(text: str) -> Tuple[str, str, str]:
+    """
+    銘柄セルを (銘柄名, コード, 市場区分) に分解する。コードがなければ全体を銘柄名とする。
+
+    Examples:
+        >>> parse_name_cell("キオクシアホールディングス285A 東P")
+        ('キオクシアホールディングス', '285A', '東P')
+        >>> parse_name_cell("不明な銘柄")
+        ('不明な銘柄', '', '')
+    """
+    match = _NAME_CELL_PATTERN.search(text)
+    if not match:
+        return text, "", ""
+    return match.group(1).strip(), match.group(2).strip(), match.group(3).strip()
+
+
+def _market_label(value: str) -> str:
+    for prefix, label in MARKET_ALIASES.items():
+        if value.startswith(prefix):
+            return label
+    return value
+
+
+def read_csv(path: Path) -> Iterator[Tuple[str, str, str, str]]:
+    """CSV から (コード, 銘柄名, 市場区分, 業種) を読み込む。UTF-8 / Shift_JIS に対応。"""
+
+    raw = path.read_bytes()
+    for encoding in ("utf-8-sig", "cp932"):
+        try:
+            text = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError(f"CSV の文字コードを判定できません: {path}")
+
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {
+        field: CSV_COLUMNS[field.strip()] for field in reader.fieldnames or [] if field.strip() in CSV_COLUMNS
+    }
+    if "code" not in columns.values():
+        raise ValueError(f"CSV にコード列（code / コード）がありません: {path}")
+    for row in reader:
+        values = {item: (row.get(field) or "").strip() for field, item in columns.items()}
+        if values.get("code"):
+            yield (
+                values["code"],
+                values.get("name", ""),
+                _market_label(values.get("market", "")),
+                # JPX の一覧は半角の "･" を使うため全角にそろえる
+                unicodedata.normalize("NFKC", values.get("sector", "")),
+            )
+
+
+class SymbolMaster:
+    """銘柄マスタ。最初の参照時にキャッシュを読み込み、変更があれば ``save()`` で書き戻す。"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        csv_path: Optional[Path] = None,
+        ttl_days: float = SYMBOL_MASTER_TTL_DAYS,
+    ) -> None:
+        self.path = path or BASE_DIR / SYMBOL_MASTER_FILE
+        self.csv_path = csv_path or BASE_DIR / SYMBOL_MASTER_CSV
+        self.ttl = ttl_days * 86400
+        self._symbols: Dict[str, Symbol] = {}
+        self._cells: Dict[str, Tuple[str, str, str]] = {}
+        self._csv_state: Dict[str, float] = {}
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with self.path.open("rb") as file:
+                    payload = pickle.load(file)
+                if payload.get("version") == MASTER_VERSION:
+                    self._symbols = {code: Symbol(*values) for code, values in payload["symbols"].items()}
+                    self._csv_state = dict(payload.get("csv", {}))
+            except FileNotFoundError:
+                pass
+            except (pickle.UnpicklingError, EOFError, KeyError, TypeError, AttributeError) as exc:
+                logger.warning("銘柄マスタのキャッシュを読み込めませんでした。作り直します: %s", exc)
+            self._cells = {_cell_text(symbol): symbol[:3] for symbol in self._symbols.values()}
+            self._loaded = True
+            self._refresh_csv()
+
+    def _refresh_csv(self) -> None:
+        """CSV が更新されたか、前回の取り込みから有効期間を過ぎていれば取り込み直す。"""
+
+        try:
+            mtime = self.csv_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        imported_at = self._csv_state.get("imported_at", 0.0)
+        if self._csv_state.get("mtime") == mtime and time.time() - imported_at < self.ttl:
+            return
+        try:
+            count = self.import_rows(read_csv(self.csv_path))
+        except (OSError, ValueError, csv.Error) as exc:
+            logger.warning("銘柄マスタの CSV を取り込めませんでした: %s", exc)
+            return
+        self._csv_state = {"mtime": mtime, "imported_at": time.time()}
+        logger.info("銘柄マスタに CSV を取り込みました: %s (%d件)", self.csv_path, count)
+        self.save()
+
+    def save(self) -> None:
+        """変更があればキャッシュを一時ファイル経由で書き込む。"""
+
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {
+                "version": MASTER_VERSION,
+                "symbols": {code: tuple(symbol) for code, symbol in self._symbols.items()},
+                "csv": self._csv_state,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with temp_path.open("wb") as file:
+                pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+            self._dirty = False
+
+    def import_rows(self, rows: Iterable[Tuple[str, str, str, str]]) -> int:
+        """(コード, 銘柄名, 市場区分, 業種) を登録する。空の項目は既存の値を残す。"""
+
+        self._ensure_loaded()
+        now = time.time()
+        count = 0
+        with self._lock:
+            for code, name, market, sector in rows:
+                current = self._symbols.get(code)
+                if current is not None:
+                    name, market, sector = name or current.name, market or current.market, sector or current.sector
+                self._put(Symbol(code, name, market, sector, now))
+                count += 1
+        return count
+
+    def _put(self, symbol: Symbol) -> None:
+        previous = self._symbols.get(symbol.code)
+        if previous is not None:
+            self._cells.pop(_cell_text(previous), None)
+        self._symbols[symbol.code] = symbol
+        self._cells[_cell_text(symbol)] = symbol[:3]
+        self._dirty = True
+
+    def observe(self, code: str, name: str, market: str) -> None:
+        """ランキングで見た銘柄を登録する。同じ内容で有効期間内なら何もしない。"""
+
+        if not code:
+            return
+        self._ensure_loaded()
+        current = self._symbols.get(code)
+        now = time.time()
+        if (
+            current is not None
+            and (current.name, current.market) == (name, market)
+            and now - current.updated_at < self.ttl
+        ):
+            return
+        with self._lock:
+            sector = current.sector if current is not None else ""
+            self._put(Symbol(code, name, market, sector, now))
+
+    def split_name_cell(self, text: str) -> Tuple[str, str, str]:
+        """
+        銘柄セルを (銘柄名, コード, 市場区分) に分解する。
+
+        登録済みのセルは辞書の参照だけで返し、未登録のものは分解して登録する。
+        """
+        self._ensure_loaded()
+        cached = self._cells.get(text)
+        if cached is not None:
+            code, name, market = cached
+            return name, code, market
+        name, code, market = parse_name_cell(text)
+        self.observe(code, name, market)
+        return name, code, market
+
+    def get(self, code: str) -> Optional[Symbol]:
+        self._ensure_loaded()
+        return self._symbols.get(code)
+
+    def sector(self, code: str) -> str:
+        """銘柄の33業種区分を返す。不明なら空文字。"""
+
+        symbol = self.get(code)
+        return symbol.sector if symbol is not None else ""
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._symbols)
+
+    def symbols(self) -> List[Symbol]:
+        self._ensure_loaded()
+        return sorted(self._symbols.values())
+
+
+def _cell_text(symbol: Symbol) -> str:
+    """ランキングの銘柄セルと同じ表記を返す（セルの参照用のキー）。"""
+
+    return f"{symbol.name}{symbol.code} {symbol.market}"
+
+
+_default_master: Optional[SymbolMaster] = None
+_default_lock = threading.Lock()
+
+
+def get_master() -> SymbolMaster:
+    """既定パスの銘柄マスタを返す（初回のみ生成、読み込みは最初の参照時）。"""
+
+    global _default_master
+    with _default_lock:
+        if _default_master is None:
+            _default_master = SymbolMaster()
+        return _default_master
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="銘柄マスタの管理")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="CSV を取り込む")
+    importer.add_argument("csv", type=Path)
+    show = commands.add_parser("show", help="登録内容を表示する")
+    show.add_argument("codes", nargs="+")
+    commands.add_parser("stats", help="件数と業種の登録状況を表示する")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    master = get_master()
+    if args.command == "import":
+        count = master.import_rows(read_csv(args.csv))
+        master.save()
+        print(f"{count} 件を取り込みました（登録 {len(master)} 件）")
+        return
+    if args.command == "show":
+        for code in args.codes:
+            symbol = master.get(code)
+            if symbol is None:
+                print(f"{code}: 未登録")
+                continue
+            print(f"{code}: {symbol.name} / {symbol.market or '-'} / {symbol.sector or '業種不明'}")
+        return
+
+    symbols = master.symbols()
+    with_sector = sum(1 for symbol in symbols if symbol.sector)
+    print(f"登録 {len(symbols)} 件（業種あり {with_sector} 件） / {master.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,6 @@ from scrape_rankings import (
     is_trading_day,
     format_success_message,
     format_error_message,
-    send_line_notify,
     URLS,
     TIME_SLOTS,
     logger,